@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Benchmark stock allocation under concurrent checkouts.
+
+Every checkout allocates stock for a few products, in random order, from a
+thread with its own database connection.  It's run once with the old
+read-modify-write allocation and once with the ``StockAllocator``, and
+reports the throughput, and how many units were oversold or lost to
+concurrent updates.
+
+Run it against a database which supports concurrent writes, eg:
+
+    ./benchmark_allocation.py --settings=settings_postgres --workers=32
+
+The products and stockrecords it creates are deleted afterwards.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+PRODUCT_TITLE = 'Allocation benchmark'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--settings', default='settings')
+    parser.add_argument('--workers', type=int, default=16,
+                        help="Number of concurrent checkouts")
+    parser.add_argument('--checkouts', type=int, default=2000,
+                        help="Number of checkouts per mode")
+    parser.add_argument('--products', type=int, default=3,
+                        help="Number of products in every checkout")
+    parser.add_argument('--stock', type=int, default=1000,
+                        help="Stock of every product")
+    parser.add_argument('--modes', default='naive,allocator')
+    return parser.parse_args()
+
+
+def naive_checkout(lines):
+    """
+    Allocate stock like Oscar used to: check the stock level in Python and
+    save the new allocation
+    """
+    from django.db import transaction
+    with transaction.atomic():
+        for stockrecord, quantity in lines:
+            stockrecord.refresh_from_db()
+            if stockrecord.net_stock_level < quantity:
+                transaction.set_rollback(True)
+                return False
+            stockrecord.num_allocated = (
+                stockrecord.num_allocated or 0) + quantity
+            stockrecord.save()
+    return True
+
+
+def allocator_checkout(lines):
+    from oscar.core.loading import get_class
+    StockAllocator = get_class('partner.allocation', 'StockAllocator')
+    return all(StockAllocator().allocate(lines))
+
+
+def run(mode, args, stockrecord_ids):
+    from django.db import connection
+    from oscar.core.loading import get_model
+    StockRecord = get_model('partner', 'StockRecord')
+
+    StockRecord.objects.filter(pk__in=stockrecord_ids).update(
+        num_in_stock=args.stock, num_allocated=0)
+    checkout = naive_checkout if mode == 'naive' else allocator_checkout
+    remaining = [args.checkouts]
+    counts = {'succeeded': 0, 'sold out': 0, 'errors': 0, 'units': 0}
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            with lock:
+                if not remaining[0]:
+                    break
+                remaining[0] -= 1
+            ids = random.sample(stockrecord_ids, args.products)
+            lines = [(StockRecord(pk=pk), 1) for pk in ids]
+            for stockrecord, __ in lines:
+                stockrecord.refresh_from_db()
+            try:
+                result = 'succeeded' if checkout(lines) else 'sold out'
+            except Exception:
+                result = 'errors'
+            with lock:
+                counts[result] += 1
+                if result == 'succeeded':
+                    counts['units'] += len(lines)
+        connection.close()
+
+    start = time.time()
+    threads = [threading.Thread(target=work) for __ in range(args.workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    allocated = sum(StockRecord.objects.filter(
+        pk__in=stockrecord_ids).values_list('num_allocated', flat=True))
+    oversold = sum(
+        max(0, num_allocated - num_in_stock)
+        for num_in_stock, num_allocated in StockRecord.objects.filter(
+            pk__in=stockrecord_ids).values_list(
+                'num_in_stock', 'num_allocated'))
+    print("%-10s %7.1f checkouts/s  succeeded %5d  sold out %5d  "
+          "errors %5d  lost units %5d  oversold units %5d" % (
+              mode, args.checkouts / elapsed, counts['succeeded'],
+              counts['sold out'], counts['errors'],
+              counts['units'] - allocated, oversold))
+
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.environ['DJANGO_SETTINGS_MODULE'] = args.settings
+    import django
+    django.setup()
+
+    from oscar.core.loading import get_model
+    from oscar.test import factories
+    Product = get_model('catalogue', 'Product')
+
+    # Enough products for the checkouts to overlap in different orders
+    products = [factories.create_product(title=PRODUCT_TITLE)
+                for __ in range(args.products * 2)]
+    stockrecord_ids = [
+        factories.create_stockrecord(product).pk for product in products]
+    try:
+        for mode in args.modes.split(','):
+            run(mode, args, stockrecord_ids)
+    finally:
+        Product.objects.filter(pk__in=[p.pk for p in products]).delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from oscar.core.compat import get_user_model, on_commit
+from oscar.core.loading import get_classes, get_model
+
+UserSearch, UserRecord, ProductRecord, UserProductView = get_classes(
+    'analytics.models', ['UserSearch', 'UserRecord', 'ProductRecord',
+                         'UserProductView'])
+Product = get_model('catalogue', 'Product')
+
+logger = logging.getLogger('oscar.analytics')
+
+
+def increment_records(model, key, increments, values=None):
+    """
+    Add to the counters of records in bulk, creating the missing records.
+
+    :param model: The model class of the recording model
+    :param key: The name of the field identifying a record, like
+                ``'product_id'``
+    :param increments: A dict mapping the values of ``key`` to dicts of
+                       counter field increments
+    :param values: Optional field values to set on all records
+    """
+    if not increments:
+        return
+    values = values or {}
+    existing = set(model._default_manager.filter(
+        **{'%s__in' % key: list(increments)}).order_by().values_list(
+            key, flat=True))
+
+    # Records with the same increments are updated together
+    groups = defaultdict(list)
+    for obj_id in existing:
+        groups[tuple(sorted(increments[obj_id].items()))].append(obj_id)
+    for fields, obj_ids in groups.items():
+        _update_records(model, {'%s__in' % key: obj_ids}, fields, values)
+
+    new_ids = [obj_id for obj_id in increments if obj_id not in existing]
+    if new_ids:
+        _create_records(model, key, new_ids, increments, values)
+
+
+def _update_records(model, lookup, fields, values):
+    """
+    Add the ``(field name, increment)`` pairs of ``fields`` to the matching
+    records, and return the number of updated records
+    """
+    changes = dict(values)
+    for name, increment in fields:
+        changes[name] = F(name) + increment
+    return model._default_manager.filter(**lookup).update(**changes)
+
+
+def _create_records(model, key, new_ids, increments, values):
+    """
+    Insert the records of ``new_ids`` in bulk, falling back to updating or
+    saving them one by one if some of them exist already
+    """
+    def build(obj_id):
+        fields = dict(values, **increments[obj_id])
+        fields[key] = obj_id
+        return model(**fields)
+
+    try:
+        with transaction.atomic():
+            model._default_manager.bulk_create(
+                [build(obj_id) for obj_id in new_ids])
+    except IntegrityError:
+        # Another process created some of the records in the meantime
+        for obj_id in new_ids:
+            updated = _update_records(
+                model, {key: obj_id}, increments[obj_id].items(), values)
+            if not updated:
+                build(obj_id).save()
+
+
+class EventBuffer(object):
+    """
+    Collects analytics events in memory and writes them to the database in
+    bulk, instead of running an ``UPDATE`` (or ``INSERT``) per event.
+
+    Counter increments are summed up per product and user, so a flush runs
+    one ``UPDATE`` per distinct set of increments and one bulk ``INSERT``
+    for new records.  Product views and searches of users are inserted in
+    bulk too (their creation dates are those of the flush).
+
+    The buffer is flushed by the first event after
+    ``OSCAR_ANALYTICS_FLUSH_INTERVAL`` seconds, once it holds
+    ``OSCAR_ANALYTICS_MAX_BUFFERED_EVENTS`` events, and when the process
+    exits.  Those settings bound how many events are lost if a process
+    dies.  The buffer is per process and thread-safe.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+        self.last_flush = time.time()
+        self.num_flushes = 0
+        self.num_flushed_events = 0
+        self.num_lost_events = 0
+        self.last_flush_duration = None
+
+    def reset(self):
+        # Map IDs to counters of field increments
+        self.product_counts = defaultdict(Counter)
+        self.user_counts = defaultdict(Counter)
+        # Lists of (user ID, product ID) and (user ID, query) tuples
+        self.product_views = []
+        self.searches = []
+        self.num_events = 0
+
+    # Recording
+
+    def record_product_view(self, product, user=None):
+        with self.lock:
+            self.product_counts[product.id]['num_views'] += 1
+            if user is not None:
+                self.user_counts[user.id]['num_product_views'] += 1
+                self.product_views.append((user.id, product.id))
+            self.num_events += 1
+        self.flush_if_due()
+
+    def record_basket_addition(self, product, user=None):
+        with self.lock:
+            self.product_counts[product.id]['num_basket_additions'] += 1
+            if user is not None:
+                self.user_counts[user.id]['num_basket_additions'] += 1
+            self.num_events += 1
+        self.flush_if_due()
+
+    def record_search(self, user, query):
+        with self.lock:
+            self.searches.append((user.id, query))
+            self.num_events += 1
+        self.flush_if_due()
+
+    # Flushing
+
+    def is_due(self):
+        return (
+            self.num_events >= settings.OSCAR_ANALYTICS_MAX_BUFFERED_EVENTS
+            or time.time() - self.last_flush >=
+            settings.OSCAR_ANALYTICS_FLUSH_INTERVAL)
+
+    def flush_if_due(self):
+        """
+        Flush the buffer once the current transaction is committed, if it's
+        due.  The flush doesn't run inside the transaction of a request, as
+        it writes the events of other requests too: if the request is rolled
+        back, the events are kept for the next flush.
+        """
+        if self.is_due():
+            on_commit(self.flush)
+
+    def flush(self):
+        """
+        Write all buffered events to the database.  Events of products and
+        users which have been deleted are dropped, and events which can't be
+        written are logged and dropped.
+        """
+        with self.lock:
+            product_counts = self.product_counts
+            user_counts = self.user_counts
+            product_views = self.product_views
+            searches = self.searches
+            num_events = self.num_events
+            self.reset()
+            self.last_flush = time.time()
+        if not num_events:
+            return
+
+        start = time.time()
+        try:
+            # Products and users deleted since their events were recorded
+            # would fail the whole flush with an integrity error
+            product_ids = self.get_existing_ids(Product, set(
+                product_counts).union(
+                    product_id for __, product_id in product_views))
+            user_ids = self.get_existing_ids(get_user_model(), set(
+                user_counts).union(
+                    user_id for user_id, __ in product_views + searches))
+            product_counts = dict(
+                (product_id, counts)
+                for product_id, counts in product_counts.items()
+                if product_id in product_ids)
+            user_counts = dict(
+                (user_id, counts) for user_id, counts in user_counts.items()
+                if user_id in user_ids)
+            product_views = [
+                (user_id, product_id) for user_id, product_id in product_views
+                if user_id in user_ids and product_id in product_ids]
+            searches = [(user_id, query) for user_id, query in searches
+                        if user_id in user_ids]
+
+            with transaction.atomic():
+                increment_records(ProductRecord, 'product_id', product_counts)
+                increment_records(UserRecord, 'user_id', user_counts)
+                UserProductView.objects.bulk_create([
+                    UserProductView(user_id=user_id, product_id=product_id)
+                    for user_id, product_id in product_views])
+                UserSearch.objects.bulk_create([
+                    UserSearch(user_id=user_id, query=query)
+                    for user_id, query in searches])
+        except Exception:
+            self.num_lost_events += num_events
+            logger.exception("Unable to write %d analytics events",
+                             num_events)
+            return
+        self.num_flushes += 1
+        self.num_flushed_events += num_events
+        self.last_flush_duration = time.time() - start
+        logger.debug("Wrote %d analytics events in %.3fs", num_events,
+                     self.last_flush_duration)
+
+    def get_existing_ids(self, model, ids):
+        if not ids:
+            return set()
+        return set(model._default_manager.filter(
+            pk__in=list(ids)).order_by().values_list('pk', flat=True))
+
+    # Monitoring
+
+    def get_metrics(self):
+        """
+        Return a dict of figures to monitor the buffer with
+        """
+        with self.lock:
+            return {
+                'buffered_events': self.num_events,
+                'seconds_since_flush': time.time() - self.last_flush,
+                'flushes': self.num_flushes,
+                'flushed_events': self.num_flushed_events,
+                'lost_events': self.num_lost_events,
+                'last_flush_duration': self.last_flush_duration,
+            }
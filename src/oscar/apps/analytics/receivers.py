@@ -1,73 +1,58 @@
-import logging
+import atexit
 
-from django.db import IntegrityError
-from django.db.models import F
+from django.db import transaction
+from django.db.models import Sum
 from django.dispatch import receiver
 
 from oscar.apps.search.signals import user_search
+from oscar.core.compat import on_commit
 from oscar.core.loading import get_class, get_classes
 
-UserSearch, UserRecord, ProductRecord, UserProductView = get_classes(
-    'analytics.models', ['UserSearch', 'UserRecord', 'ProductRecord',
-                         'UserProductView'])
+ProductRecord, UserRecord = get_classes(
+    'analytics.models', ['ProductRecord', 'UserRecord'])
+EventBuffer, increment_records = get_classes(
+    'analytics.buffer', ['EventBuffer', 'increment_records'])
 product_viewed = get_classes('catalogue.signals', ['product_viewed'])
 basket_addition = get_class('basket.signals', 'basket_addition')
 order_placed = get_class('order.signals', 'order_placed')
 
 # Helpers
 
-logger = logging.getLogger('oscar.analytics')
-
-
-def _update_counter(model, field_name, filter_kwargs, increment=1):
-    """
-    Efficiently updates a counter field by a given increment. Uses Django's
-    update() call to fetch and update in one query.
-
-    :param model: The model class of the recording model
-    :param field_name: The name of the field to update
-    :param filter_kwargs: Parameters to the ORM's filter() function to get the
-                          correct instance
-    """
-    try:
-        record = model.objects.filter(**filter_kwargs)
-        affected = record.update(**{field_name: F(field_name) + increment})
-        if not affected:
-            filter_kwargs[field_name] = increment
-            model.objects.create(**filter_kwargs)
-    except IntegrityError:
-        # get_or_create sometimes fails due to MySQL's weird transactions, fail
-        # silently
-        logger.error(
-            "IntegrityError when updating analytics counter for %s", model)
-
-
-def _record_products_in_order(order):
-    # surely there's a way to do this without causing a query for each line?
-    for line in order.lines.all():
-        _update_counter(
-            ProductRecord, 'num_purchases',
-            {'product': line.product}, line.quantity)
-
-
-def _record_user_order(user, order):
-    try:
-        record = UserRecord.objects.filter(user=user)
-        affected = record.update(
-            num_orders=F('num_orders') + 1,
-            num_order_lines=F('num_order_lines') + order.num_lines,
-            num_order_items=F('num_order_items') + order.num_items,
-            total_spent=F('total_spent') + order.total_incl_tax,
-            date_last_order=order.date_placed)
-        if not affected:
-            UserRecord.objects.create(
-                user=user, num_orders=1, num_order_lines=order.num_lines,
-                num_order_items=order.num_items,
-                total_spent=order.total_incl_tax,
-                date_last_order=order.date_placed)
-    except IntegrityError:
-        logger.error(
-            "IntegrityError in analytics when recording a user order.")
+#: Collects the events of this process, see ``EventBuffer``
+event_buffer = EventBuffer()
+
+
+def _flush_at_exit():
+    # Don't touch the database unless there is something to write, as it
+    # might not be available anymore (eg at the end of a test run).  Events
+    # which can't be written are logged and dropped by flush().
+    if event_buffer.get_metrics()['buffered_events']:
+        event_buffer.flush()
+
+
+atexit.register(_flush_at_exit)
+
+
+def _record_order(order, user):
+    quantities = dict(order.lines.exclude(product=None).order_by().values(
+        'product_id').annotate(quantity=Sum('quantity')).values_list(
+        'product_id', 'quantity'))
+    with transaction.atomic():
+        increment_records(ProductRecord, 'product_id', dict(
+            (product_id, {'num_purchases': quantity})
+            for product_id, quantity in quantities.items()))
+        if user:
+            increment_records(UserRecord, 'user_id', {user.id: {
+                'num_orders': 1,
+                'num_order_lines': order.num_lines,
+                'num_order_items': order.num_items,
+                'total_spent': order.total_incl_tax,
+            }}, values={'date_last_order': order.date_placed})
+
+
+def _get_user(user):
+    if user and user.is_authenticated():
+        return user
 
 
 # Receivers
@@ -76,32 +61,26 @@ def _record_user_order(user, order):
 def receive_product_view(sender, product, user, **kwargs):
     if kwargs.get('raw', False):
         return
-    _update_counter(ProductRecord, 'num_views', {'product': product})
-    if user and user.is_authenticated():
-        _update_counter(UserRecord, 'num_product_views', {'user': user})
-        UserProductView.objects.create(product=product, user=user)
+    event_buffer.record_product_view(product, _get_user(user))
 
 
 @receiver(user_search)
 def receive_product_search(sender, query, user, **kwargs):
-    if user and user.is_authenticated() and not kwargs.get('raw', False):
-        UserSearch._default_manager.create(user=user, query=query)
+    if _get_user(user) and not kwargs.get('raw', False):
+        event_buffer.record_search(user, query)
 
 
 @receiver(basket_addition)
 def receive_basket_addition(sender, product, user, **kwargs):
     if kwargs.get('raw', False):
         return
-    _update_counter(
-        ProductRecord, 'num_basket_additions', {'product': product})
-    if user and user.is_authenticated():
-        _update_counter(UserRecord, 'num_basket_additions', {'user': user})
+    event_buffer.record_basket_addition(product, _get_user(user))
 
 
 @receiver(order_placed)
 def receive_order_placed(sender, order, user, **kwargs):
     if kwargs.get('raw', False):
         return
-    _record_products_in_order(order)
-    if user and user.is_authenticated():
-        _record_user_order(user, order)
+    user = _get_user(user)
+    # Keep the checkout transaction short, however big the order is
+    on_commit(lambda: _record_order(order, user))
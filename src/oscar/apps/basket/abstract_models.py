@@ -119,16 +119,29 @@ class AbstractBasket(models.Model):
         This is important for offers as they alter the line models and you
         don't want to reload them from the DB as that information would be
         lost.
+
+        The lines are loaded together with everything needed to price them,
+        and if a strategy is assigned, their purchase info is fetched in
+        bulk.  That way the number of queries doesn't grow with the number of
+        lines.
         """
         if self.id is None:
             return self.lines.none()
         if self._lines is None:
             self._lines = (
                 self.lines
-                .select_related('product', 'stockrecord')
+                .select_related(
+                    'product', 'product__parent', 'product__product_class',
+                    'product__parent__product_class',
+                    'stockrecord', 'stockrecord__partner')
                 .prefetch_related(
-                    'attributes', 'product__images')
+                    'attributes', 'product__images', 'product__stockrecords')
                 .order_by(self._meta.pk.name))
+            if self.has_strategy:
+                lines = list(self._lines)
+                infos = self.strategy.fetch_for_lines(lines)
+                for line, info in zip(lines, infos):
+                    line._info = info
         return self._lines
 
     def is_quantity_allowed(self, qty):
@@ -8,6 +8,7 @@ from oscar.core.loading import get_class, get_model
 
 Applicator = get_class('offer.utils', 'Applicator')
 Basket = get_model('basket', 'basket')
+BasketSummary = get_class('basket.summary', 'BasketSummary')
 Selector = get_class('partner.strategy', 'Selector')
 
 selector = Selector()
@@ -52,10 +53,18 @@ class BasketMiddleware(object):
             if basket.id:
                 return self.get_basket_hash(basket.id)
 
+        def load_basket_summary():
+            """
+            Return a summary of the basket, which only loads the basket if no
+            cached summary is available.
+            """
+            return self.get_basket_summary(request)
+
         # Use Django's SimpleLazyObject to only perform the loading work
         # when the attribute is accessed.
         request.basket = SimpleLazyObject(load_full_basket)
         request.basket_hash = SimpleLazyObject(load_basket_hash)
+        request.basket_summary = SimpleLazyObject(load_basket_summary)
 
     def process_response(self, request, response):
         # Delete any surplus cookies
@@ -172,6 +181,49 @@ class BasketMiddleware(object):
 
         return basket
 
+    def get_basket_summary(self, request):
+        """
+        Return a summary of the open basket for this request.
+
+        The summary is read from the cache where possible, so that pages
+        which only show the mini-basket don't need to load the basket, apply
+        offers and fetch prices.  We fall back to loading the full basket
+        (and store its summary) when there's no up-to-date summary or when a
+        cookie basket needs to be merged into a user's basket.
+
+        If the view has already loaded the basket, it might also have changed
+        it, so the summary is built from the loaded basket but not stored.
+        """
+        if not (isinstance(request.basket, SimpleLazyObject)
+                and request.basket._wrapped is empty):
+            return BasketSummary.from_basket(request.basket)
+
+        summary = self.get_cached_basket_summary(request)
+        if summary is None:
+            summary = BasketSummary.from_basket(request.basket)
+            summary.store()
+        return summary
+
+    def get_cached_basket_summary(self, request):
+        """
+        Return the cached summary of the basket for this request without
+        loading the basket, or ``None`` if the basket needs to be loaded.
+        """
+        cookie_key = self.get_cookie_key(request)
+        if hasattr(request, 'user') and request.user.is_authenticated():
+            if cookie_key in request.COOKIES:
+                return None
+            return BasketSummary.get_cached(owner_id=request.user.id)
+
+        if cookie_key not in request.COOKIES:
+            # Anonymous users without a cookie have an empty basket
+            return BasketSummary()
+        try:
+            basket_id = int(Signer().unsign(request.COOKIES[cookie_key]))
+        except (BadSignature, ValueError):
+            return None
+        return BasketSummary.get_cached(basket_id=basket_id)
+
     def merge_baskets(self, master, slave):
         """
         Merge one basket into another.
@@ -0,0 +1,45 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from oscar.core.loading import get_class, get_model
+
+BasketSummary = get_class('basket.summary', 'BasketSummary')
+
+Basket = get_model('basket', 'Basket')
+Line = get_model('basket', 'Line')
+
+
+@receiver(post_save, sender=Basket)
+@receiver(post_delete, sender=Basket)
+def invalidate_basket_summary(sender, instance, **kwargs):
+    """
+    Discard the summary of a basket when it changes status (eg it gets
+    frozen, submitted or merged) or is deleted.
+    """
+    if kwargs.get('raw', False) or instance.id is None:
+        return
+    BasketSummary.invalidate(instance.id)
+
+
+@receiver(post_save, sender=Line)
+@receiver(post_delete, sender=Line)
+def invalidate_line_basket_summary(sender, instance, **kwargs):
+    if kwargs.get('raw', False):
+        return
+    BasketSummary.invalidate(instance.basket_id)
+
+
+@receiver(m2m_changed, sender=Basket.vouchers.through)
+def invalidate_voucher_basket_summary(sender, instance, action, reverse,
+                                      pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        BasketSummary.invalidate(instance.id)
+    elif pk_set:
+        for basket_id in pk_set:
+            BasketSummary.invalidate(basket_id)
+    else:
+        # A voucher was removed from all of its baskets
+        for basket_id in instance.basket_set.values_list('id', flat=True):
+            BasketSummary.invalidate(basket_id)
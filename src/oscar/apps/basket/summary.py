@@ -0,0 +1,145 @@
+from decimal import Decimal as D
+
+from django.conf import settings
+from django.core.cache import cache
+
+from oscar.core.loading import get_class
+
+SiteOfferSet = get_class('offer.cache', 'SiteOfferSet')
+
+offer_set = SiteOfferSet()
+
+
+class BasketSummaryLine(object):
+    """
+    The parts of a basket line that are shown in the mini-basket
+    """
+
+    def __init__(self, description, quantity, unit_price_excl_tax,
+                 product_url, product_title, image=None):
+        self.description = description
+        self.quantity = quantity
+        self.unit_price_excl_tax = unit_price_excl_tax
+        self.product_url = product_url
+        self.product_title = product_title
+        # The name of the product's primary image file
+        self.image = image
+
+    @classmethod
+    def from_line(cls, line):
+        product = line.product
+        image = product.primary_image()
+        if isinstance(image, dict):
+            image = image['original']
+        else:
+            image = image.original
+        return cls(
+            description=line.description,
+            quantity=line.quantity,
+            unit_price_excl_tax=line.unit_price_excl_tax,
+            product_url=product.get_absolute_url(),
+            product_title=product.get_title(),
+            image=image.name)
+
+
+class BasketSummary(object):
+    """
+    A denormalised snapshot of an open basket, holding what's needed to render
+    the mini-basket in the page header: line and item counts, totals and the
+    lines themselves.
+
+    Summaries are built from a fully loaded basket (offers applied) and stored
+    in Django's cache, keyed by basket ID.  For signed-in users a pointer from
+    the user to their basket is kept too, so the summary can be found without
+    looking the basket up.  Changes to the basket or its lines discard the
+    summary (see ``basket.receivers``), as does a change to the site offers.
+    """
+
+    def __init__(self, basket_id=None, owner_id=None, currency=None,
+                 num_lines=0, num_items=0, is_tax_known=True,
+                 total_excl_tax=D('0.00'), total_incl_tax=D('0.00'),
+                 lines=(), offers_version=None):
+        self.basket_id = basket_id
+        self.owner_id = owner_id
+        self.currency = currency
+        self.num_lines = num_lines
+        self.num_items = num_items
+        self.is_tax_known = is_tax_known
+        self.total_excl_tax = total_excl_tax
+        self.total_incl_tax = total_incl_tax
+        self.lines = list(lines)
+        self.offers_version = offers_version
+
+    def __repr__(self):
+        return "<BasketSummary basket=%s lines=%d items=%d>" % (
+            self.basket_id, self.num_lines, self.num_items)
+
+    @property
+    def is_empty(self):
+        return self.num_lines == 0
+
+    @classmethod
+    def from_basket(cls, basket):
+        """
+        Summarise a basket.  The basket should have its strategy assigned
+        and offers applied.
+        """
+        if basket.is_empty:
+            return cls(basket_id=basket.id, owner_id=basket.owner_id,
+                       offers_version=offer_set.get_version(''))
+        lines = basket.all_lines()
+        is_tax_known = basket.is_tax_known
+        return cls(
+            basket_id=basket.id,
+            owner_id=basket.owner_id,
+            currency=basket.currency,
+            num_lines=len(lines),
+            num_items=sum(line.quantity for line in lines),
+            is_tax_known=is_tax_known,
+            total_excl_tax=basket.total_excl_tax,
+            total_incl_tax=basket.total_incl_tax if is_tax_known else None,
+            lines=[BasketSummaryLine.from_line(line) for line in lines],
+            offers_version=offer_set.get_version(''))
+
+    # Cache handling
+
+    @staticmethod
+    def cache_key(basket_id):
+        return 'oscar-basket-summary-%s' % basket_id
+
+    @staticmethod
+    def owner_key(owner_id):
+        return 'oscar-basket-summary-owner-%s' % owner_id
+
+    @classmethod
+    def get_cached(cls, basket_id=None, owner_id=None):
+        """
+        Return the stored summary of a basket, or ``None`` if there isn't an
+        up-to-date one.  Pass ``owner_id`` to look up the open basket of a
+        user, and ``basket_id`` for an anonymous basket.
+        """
+        if basket_id is None:
+            basket_id = cache.get(cls.owner_key(owner_id))
+            if basket_id is None:
+                return None
+        offers_key = SiteOfferSet.version_key('')
+        found = cache.get_many([cls.cache_key(basket_id), offers_key])
+        summary = found.get(cls.cache_key(basket_id))
+        if summary is None or summary.owner_id != owner_id:
+            return None
+        if summary.offers_version != found.get(offers_key):
+            return None
+        return summary
+
+    def store(self):
+        timeout = settings.OSCAR_BASKET_SUMMARY_CACHE_TIMEOUT
+        if not timeout or self.basket_id is None:
+            return
+        data = {self.cache_key(self.basket_id): self}
+        if self.owner_id is not None:
+            data[self.owner_key(self.owner_id)] = self.basket_id
+        cache.set_many(data, timeout)
+
+    @classmethod
+    def invalidate(cls, basket_id):
+        cache.delete(cls.cache_key(basket_id))
@@ -13,6 +13,7 @@ from django.core.urlresolvers import reverse
 from django.core.validators import RegexValidator
 from django.db import models
 from django.db.models import Count, Sum
+from django.db.models.signals import post_save
 from django.utils import six
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.functional import cached_property
@@ -34,6 +35,8 @@ ProductManager, BrowsableProductManager = get_classes(
 ProductAttributesContainer = get_class(
     'catalogue.product_attributes', 'ProductAttributesContainer')
 Selector = get_class('partner.strategy', 'Selector')
+AttributeSchema, CategoryTree = get_classes(
+    'catalogue.cache', ['AttributeSchema', 'CategoryTree'])
 
 
 @python_2_unicode_compatible
@@ -67,6 +70,9 @@ class AbstractProductClass(models.Model):
     options = models.ManyToManyField(
         'catalogue.Option', blank=True, verbose_name=_("Options"))
 
+    # Shared copy of the attribute definitions
+    attribute_schema = AttributeSchema()
+
     class Meta:
         abstract = True
         app_label = 'catalogue'
@@ -79,7 +85,7 @@ class AbstractProductClass(models.Model):
 
     @property
     def has_attributes(self):
-        return self.attributes.exists()
+        return bool(self.attribute_schema.get_attributes(self))
 
 
 @python_2_unicode_compatible
@@ -99,6 +105,9 @@ class AbstractCategory(MP_Node):
     _slug_separator = '/'
     _full_name_separator = ' > '
 
+    # Shared copy of the tree, used to look up ancestors without a query
+    cached_tree = CategoryTree()
+
     def __str__(self):
         return self.full_name
 
@@ -171,13 +180,33 @@ class AbstractCategory(MP_Node):
             # update the slug and save again if necessary.
             self.ensure_slug_uniqueness()
 
+    def move(self, target, pos=None):
+        """
+        Moving a category updates the paths of it and its descendants without
+        saving them, so ``post_save`` is sent here.  That discards the cached
+        category tree, the compiled site offers and the product indexes of
+        the ranges which include categories.
+        """
+        super(AbstractCategory, self).move(target, pos)
+        post_save.send(
+            sender=self.__class__, instance=self, created=False,
+            update_fields=frozenset(['path', 'depth']), raw=False,
+            using=self._state.db)
+
     def get_ancestors_and_self(self):
         """
         Gets ancestors and includes itself. Use treebeard's get_ancestors
         if you don't want to include the category itself. It's a separate
         function as it's commonly used in templates.
+
+        The ancestors are read from the cached category tree, and only
+        queried for if the tree doesn't know them.  They're shared between
+        requests, so treat them as read-only.
         """
-        return list(self.get_ancestors()) + [self]
+        ancestors = self.cached_tree.get_ancestors(self)
+        if ancestors is None:
+            ancestors = list(self.get_ancestors())
+        return ancestors + [self]
 
     def get_descendants_and_self(self):
         """
@@ -856,8 +885,9 @@ class AbstractProductAttribute(models.Model):
                 _("Must be an AttributeOption model object instance"))
         if not value.pk:
             raise ValidationError(_("AttributeOption has not been saved yet"))
-        valid_values = self.option_group.options.values_list(
-            'option', flat=True)
+        # The options are prefetched for cached attributes
+        valid_values = [
+            option.option for option in self.option_group.options.all()]
         if value.option not in valid_values:
             raise ValidationError(
                 _("%(enum)s is not a valid choice for %(attr)s") %
@@ -0,0 +1,218 @@
+import bisect
+import pickle
+from collections import defaultdict
+
+from django.conf import settings
+
+from oscar.core.cache import VersionedCache
+from oscar.core.loading import get_model
+
+
+class CategoryTree(VersionedCache):
+    """
+    A cached, pre-ordered copy of the whole category tree, as used to render
+    navigation and to look up the ancestors of categories (for their full
+    names, slugs and URLs).
+
+    The categories are loaded in one query and pickled, so rendering a tree
+    doesn't hit the database until a category is saved, moved or deleted.
+    Optionally, each category is annotated with the number of products in it
+    and its descendants (as ``num_products``); that variant of the tree is
+    also discarded when products are added to or removed from categories.
+
+    The instances are shared between requests handled by the same process,
+    so they must be treated as read-only.
+    """
+    prefix = 'oscar-category-tree'
+
+    def __init__(self):
+        super(CategoryTree, self).__init__()
+        # Maps (version, max_depth, parent path) tuples to annotated lists
+        self._annotated = {}
+
+    def get_timeout(self):
+        return settings.OSCAR_CATEGORY_TREE_CACHE_TIMEOUT
+
+    @classmethod
+    def invalidate_tree(cls):
+        """
+        Discard both variants of the tree
+        """
+        cls.invalidate('')
+        cls.invalidate('counts')
+
+    def get_name(self, product_counts):
+        return 'counts' if product_counts else ''
+
+    def get_categories(self, product_counts=False):
+        """
+        Return all categories, in tree order
+        """
+        return self.get(self.get_name(product_counts))[0]
+
+    def get_descendants(self, parent, product_counts=False):
+        """
+        Return the descendants of a category, in tree order
+        """
+        categories, paths, __ = self.get(self.get_name(product_counts))
+        # Descendants directly follow their parent in tree order
+        start = bisect.bisect_right(paths, parent.path)
+        end = start
+        while end < len(paths) and paths[end].startswith(parent.path):
+            end += 1
+        return categories[start:end]
+
+    def get_ancestors(self, category):
+        """
+        Return the ancestors of a category, root first, or ``None`` if the
+        cached tree doesn't know all of them
+        """
+        return self.get_ancestries([category])[0]
+
+    def get_ancestries(self, categories):
+        """
+        Bulk variant of ``get_ancestors``, which reads the tree only once
+        """
+        by_path = self.get('')[2]
+        ancestries = []
+        for category in categories:
+            ancestors = []
+            path, steplen = category.path or '', category.steplen
+            for end in range(steplen, len(path), steplen):
+                ancestor = by_path.get(path[:end])
+                if ancestor is None:
+                    ancestors = None
+                    break
+                ancestors.append(ancestor)
+            ancestries.append(ancestors)
+        return ancestries
+
+    def get_annotated_list(self, max_depth=None, parent=None,
+                           product_counts=False):
+        """
+        Return a tree branch as a list of (category, info) tuples, as used
+        by the ``category_tree`` template tag.  The lists are kept in memory
+        for as long as the tree doesn't change.
+        """
+        name = self.get_name(product_counts)
+        key = (self.get_version(name), max_depth,
+               parent.path if parent else None)
+        if key not in self._annotated:
+            if parent:
+                categories = self.get_descendants(parent, product_counts)
+                if max_depth is not None:
+                    max_depth += parent.depth
+            else:
+                categories = self.get_categories(product_counts)
+            # Drop the lists of older tree versions
+            self._annotated = dict(
+                (k, v) for k, v in self._annotated.items() if k[0] == key[0])
+            self._annotated[key] = annotate(categories, max_depth)
+        return self._annotated[key]
+
+    def build(self, name):
+        Category = get_model('catalogue', 'Category')
+        categories = list(Category.get_tree())
+        if name == 'counts':
+            self.count_products(categories)
+        return pickle.dumps(categories, pickle.HIGHEST_PROTOCOL)
+
+    def load(self, payload):
+        categories = pickle.loads(payload)
+        paths = [category.path for category in categories]
+        return categories, paths, dict(zip(paths, categories))
+
+    def count_products(self, categories):
+        """
+        Annotate categories with the number of distinct products in them or
+        in their descendants
+        """
+        ProductCategory = get_model('catalogue', 'ProductCategory')
+        steplen = categories[0].steplen if categories else 0
+        product_ids = defaultdict(set)
+        for product_id, path in ProductCategory.objects.values_list(
+                'product_id', 'category__path').order_by().iterator():
+            for end in range(steplen, len(path) + 1, steplen):
+                product_ids[path[:end]].add(product_id)
+        for category in categories:
+            category.num_products = len(product_ids.get(category.path, ()))
+
+
+class AttributeSchema(VersionedCache):
+    """
+    A cached copy of the attribute definitions of all product classes, with
+    their option groups and options.
+
+    Validating and saving product attributes, and building the dashboard
+    product form, read the definitions from here instead of querying them
+    per product.  The copy is discarded when an attribute, option group or
+    option is saved or deleted.  The instances are shared between requests,
+    so they must be treated as read-only.
+    """
+    prefix = 'oscar-attribute-schema'
+
+    def get_timeout(self):
+        return settings.OSCAR_ATTRIBUTE_SCHEMA_CACHE_TIMEOUT
+
+    def get_attributes(self, product_class):
+        """
+        Return the attributes of a product class, ordered by code
+        """
+        return self.get()[0].get(product_class.pk, [])
+
+    def get_attribute(self, product_class, code):
+        """
+        Return the attribute of a product class with the given code, or
+        ``None``
+        """
+        return self.get()[1].get((product_class.pk, code))
+
+    def build(self, name):
+        ProductAttribute = get_model('catalogue', 'ProductAttribute')
+        attributes = list(
+            ProductAttribute.objects.select_related('option_group')
+            .prefetch_related('option_group__options'))
+        return pickle.dumps(attributes, pickle.HIGHEST_PROTOCOL)
+
+    def load(self, payload):
+        by_class = defaultdict(list)
+        by_code = {}
+        for attribute in pickle.loads(payload):
+            by_class[attribute.product_class_id].append(attribute)
+            by_code[(attribute.product_class_id, attribute.code)] = attribute
+        return dict(by_class), by_code
+
+
+def annotate(categories, max_depth=None):
+    """
+    Build an annotated list from categories in tree order.
+
+    Borrows heavily from treebeard's get_annotated_list
+    """
+    annotated_categories = []
+
+    start_depth, prev_depth = (None, None)
+    info = {}
+    for node in categories:
+        node_depth = node.depth
+        if start_depth is None:
+            start_depth = node_depth
+        if max_depth is not None and node_depth > max_depth:
+            continue
+
+        # Update previous node's info
+        info['has_children'] = prev_depth is None or node_depth > prev_depth
+        if prev_depth is not None and node_depth < prev_depth:
+            info['num_to_close'] = list(range(0, prev_depth - node_depth))
+
+        info = {'num_to_close': [],
+                'level': node_depth - start_depth}
+        annotated_categories.append((node, info,))
+        prev_depth = node_depth
+
+    if prev_depth is not None:
+        # close last leaf
+        info['num_to_close'] = list(range(0, prev_depth - start_depth))
+        info['has_children'] = prev_depth > prev_depth
+
+    return annotated_categories
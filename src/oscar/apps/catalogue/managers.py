@@ -1,5 +1,10 @@
 from django.db import models
 
+from oscar.core.loading import get_class
+
+get_attribute_value_lookups = get_class(
+    'catalogue.product_attributes', 'get_attribute_value_lookups')
+
 
 class ProductQuerySet(models.query.QuerySet):
 
@@ -22,6 +27,13 @@ class ProductQuerySet(models.query.QuerySet):
         """
         return self.filter(parent=None)
 
+    def with_attributes(self):
+        """
+        Loads the attribute values of all products in one query, so that
+        ``product.attr`` and ``attribute_summary`` don't query per product
+        """
+        return self.prefetch_related(*get_attribute_value_lookups())
+
 
 class ProductManager(models.Manager):
     """
@@ -40,6 +52,9 @@ class ProductManager(models.Manager):
     def base_queryset(self):
         return self.get_queryset().base_queryset()
 
+    def with_attributes(self):
+        return self.get_queryset().with_attributes()
+
 
 class BrowsableProductManager(ProductManager):
     """
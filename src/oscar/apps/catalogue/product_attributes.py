@@ -1,5 +1,36 @@
-from django.utils.translation import ugettext_lazy as _
 from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
+from django.db.models.query import prefetch_related_objects
+from django.utils.translation import ugettext_lazy as _
+
+from oscar.core.loading import get_model
+
+
+def get_attribute_value_lookups():
+    """
+    Return the prefetch lookups which load the attribute values of products,
+    along with their attributes and related values
+    """
+    ProductAttributeValue = get_model('catalogue', 'ProductAttributeValue')
+    return [
+        Prefetch('attribute_values',
+                 queryset=ProductAttributeValue.objects.select_related(
+                     'attribute', 'value_option')),
+        'attribute_values__value_entity']
+
+
+def prefetch_attribute_values(products):
+    """
+    Load the attribute values of a list of products in bulk, and populate
+    their attribute containers.  Use ``ProductQuerySet.with_attributes``
+    where the products are still a queryset.
+    """
+    products = [product for product in products
+                if 'attribute_values' not in getattr(
+                    product, '_prefetched_objects_cache', {})]
+    prefetch_related_objects(products, get_attribute_value_lookups())
+    for product in products:
+        product.attr.initiate_attributes()
 
 
 class ProductAttributesContainer(object):
@@ -20,7 +51,9 @@ class ProductAttributesContainer(object):
         self.initialised = False
 
     def initiate_attributes(self):
-        values = self.get_values().select_related('attribute')
+        values = self.get_values()
+        if not self.values_are_prefetched():
+            values = values.select_related('attribute')
         for v in values:
             setattr(self, v.attribute.code, v.value)
         self.initialised = True
@@ -52,14 +85,34 @@ class ProductAttributesContainer(object):
     def get_values(self):
         return self.product.attribute_values.all()
 
+    def values_are_prefetched(self):
+        return 'attribute_values' in getattr(
+            self.product, '_prefetched_objects_cache', {})
+
     def get_value_by_attribute(self, attribute):
         return self.get_values().get(attribute=attribute)
 
     def get_all_attributes(self):
-        return self.product.get_product_class().attributes.all()
+        """
+        Return the attributes of the product's class, as a list read from
+        the cached attribute schema
+        """
+        product_class = self.product.get_product_class()
+        if product_class is None:
+            return []
+        return product_class.attribute_schema.get_attributes(product_class)
 
     def get_attribute_by_code(self, code):
-        return self.get_all_attributes().get(code=code)
+        ProductAttribute = get_model('catalogue', 'ProductAttribute')
+        product_class = self.product.get_product_class()
+        attribute = None
+        if product_class is not None:
+            attribute = product_class.attribute_schema.get_attribute(
+                product_class, code)
+        if attribute is None:
+            raise ProductAttribute.DoesNotExist(
+                "%s has no attribute %r" % (product_class, code))
+        return attribute
 
     def __iter__(self):
         return iter(self.get_values())
@@ -69,3 +122,6 @@ class ProductAttributesContainer(object):
             if hasattr(self, attribute.code):
                 value = getattr(self, attribute.code)
                 attribute.save_value(self.product, value)
+        # Prefetched values are stale now
+        if self.values_are_prefetched():
+            del self.product._prefetched_objects_cache['attribute_values']
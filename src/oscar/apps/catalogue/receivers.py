@@ -1,19 +1,27 @@
 # -*- coding: utf-8 -*-
 
 from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
-if settings.OSCAR_DELETE_IMAGE_FILES:
+from oscar.core.loading import get_classes, get_model
+
+AttributeSchema, CategoryTree = get_classes(
+    'catalogue.cache', ['AttributeSchema', 'CategoryTree'])
+Category = get_model('catalogue', 'Category')
+ProductCategory = get_model('catalogue', 'ProductCategory')
+ProductAttribute = get_model('catalogue', 'ProductAttribute')
+AttributeOptionGroup = get_model('catalogue', 'AttributeOptionGroup')
+AttributeOption = get_model('catalogue', 'AttributeOption')
 
-    from oscar.core.loading import get_model
+if settings.OSCAR_DELETE_IMAGE_FILES:
 
     from django.db import models
-    from django.db.models.signals import post_delete
 
     from sorl import thumbnail
     from sorl.thumbnail.helpers import ThumbnailError
 
     ProductImage = get_model('catalogue', 'ProductImage')
-    Category = get_model('catalogue', 'Category')
 
     def delete_image_files(sender, instance, **kwargs):
         """
@@ -34,3 +42,31 @@ if settings.OSCAR_DELETE_IMAGE_FILES:
     models_with_images = [ProductImage, Category]
     for sender in models_with_images:
         post_delete.connect(delete_image_files, sender=sender)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, instance, **kwargs):
+    if kwargs.get('raw', False):
+        return
+    CategoryTree.invalidate_tree()
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def invalidate_category_product_counts(sender, instance, **kwargs):
+    if kwargs.get('raw', False):
+        return
+    CategoryTree.invalidate('counts')
+
+
+@receiver(post_save, sender=ProductAttribute)
+@receiver(post_delete, sender=ProductAttribute)
+@receiver(post_save, sender=AttributeOptionGroup)
+@receiver(post_delete, sender=AttributeOptionGroup)
+@receiver(post_save, sender=AttributeOption)
+@receiver(post_delete, sender=AttributeOption)
+def invalidate_attribute_schema(sender, instance, **kwargs):
+    if kwargs.get('raw', False):
+        return
+    AttributeSchema.invalidate()
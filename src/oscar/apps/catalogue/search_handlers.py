@@ -1,15 +1,18 @@
 from django.conf import settings
+from django.db.models import Q
 from django.utils.module_loading import import_string
 from django.views.generic.list import MultipleObjectMixin
 
 from oscar.core.decorators import deprecated
 from oscar.core.loading import get_class, get_model
+from oscar.views.generic import KeysetPaginationMixin
 
 BrowseCategoryForm = get_class('search.forms', 'BrowseCategoryForm')
 SearchHandler = get_class('search.search_handlers', 'SearchHandler')
 is_solr_supported = get_class('search.features', 'is_solr_supported')
 is_elasticsearch_supported = get_class('search.features', 'is_elasticsearch_supported')
 Product = get_model('catalogue', 'Product')
+ProductCategory = get_model('catalogue', 'ProductCategory')
 
 
 def get_product_search_handler_class():
@@ -82,11 +85,12 @@ class ESProductSearchHandler(SearchHandler):
         return sqs
 
 
-class SimpleProductSearchHandler(MultipleObjectMixin):
+class SimpleProductSearchHandler(KeysetPaginationMixin, MultipleObjectMixin):
     """
     A basic implementation of the full-featured SearchHandler that has no
     faceting support, but doesn't require a Haystack backend. It only
-    supports category browsing.
+    supports category browsing.  Set ``keyset_pagination`` to page through
+    the products with cursors instead of page numbers.
 
     Note that is meant as a replacement search handler and not as a view
     mixin; the mixin just does most of what we need it to do.
@@ -101,8 +105,28 @@ class SimpleProductSearchHandler(MultipleObjectMixin):
     def get_queryset(self):
         qs = Product.browsable.base_queryset()
         if self.categories:
-            qs = qs.filter(categories__in=self.categories).distinct()
-        return qs
+            qs = qs.filter(pk__in=self.get_category_product_ids())
+        # Order on unique keys, so that pages are stable
+        return qs.order_by('-date_created', '-id')
+
+    def get_category_product_ids(self):
+        """
+        Return a subquery for the IDs of the products in the categories or
+        their descendants.
+
+        Descendants are matched on the prefix of their materialised path,
+        so browsing a category needs neither a list of all its descendants
+        nor a DISTINCT over the products.
+        """
+        prefixes = []
+        for path in sorted(category.path for category in self.categories):
+            # Descendants of a category that is already matched are skipped
+            if not prefixes or not path.startswith(prefixes[-1]):
+                prefixes.append(path)
+        condition = Q()
+        for prefix in prefixes:
+            condition |= Q(category__path__startswith=prefix)
+        return ProductCategory.objects.filter(condition).values('product_id')
 
     def get_search_context_data(self, context_object_name):
         # Set the context_object_name instance property as it's needed
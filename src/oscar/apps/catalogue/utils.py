@@ -1,18 +1,23 @@
+import hashlib
+import multiprocessing
 import os
+import re
 import shutil
 import tarfile
 import tempfile
 import zipfile
 import zlib
+from collections import defaultdict
 
 from django.core.exceptions import FieldError
 from django.core.files import File
 from django.db.transaction import atomic
+from django.utils import six
 from django.utils.translation import ugettext_lazy as _
 from PIL import Image
 
 from oscar.apps.catalogue.exceptions import (
-    IdenticalImageError, ImageImportError, InvalidImageArchive)
+    ImageImportError, InvalidImageArchive)
 from oscar.core.loading import get_model
 
 Category = get_model('catalogue', 'category')
@@ -20,59 +25,199 @@ Product = get_model('catalogue', 'product')
 ProductImage = get_model('catalogue', 'productimage')
 
 
+def inspect_image(file_path):
+    """
+    Verify an image file and return a tuple of its path, the SHA-1 digest of
+    its contents and an error message (if it isn't a valid image).
+
+    This runs in the worker processes of the image importer, so it needs to
+    be a module-level function.
+    """
+    try:
+        Image.open(file_path).verify()
+        with open(file_path, 'rb') as image_file:
+            digest = hashlib.sha1(image_file.read()).hexdigest()
+    except (IOError, SyntaxError, ValueError) as e:
+        return file_path, None, six.text_type(e)
+    return file_path, digest, None
+
+
 # This is an old class only really intended to be used by the internal sandbox
 # site. It's not recommended to be used by your project.
 class Importer(object):
+    """
+    Imports product images from a folder or an archive, matching the file
+    names against a product field.
+
+    Images are verified and hashed by a pool of ``processes`` worker
+    processes, and the products are looked up in one query.  The content hash
+    is kept in the name of the stored file, so importing an image that a
+    product already has is skipped without reading any files.  Images are
+    saved in batches of ``batch_size``, each in its own transaction.
+    """
 
     allowed_extensions = ['.jpeg', '.jpg', '.gif', '.png']
 
-    def __init__(self, logger, field):
+    # Number of hex digits of the content hash kept in file names
+    digest_length = 16
+
+    def __init__(self, logger, field, processes=1, batch_size=500):
         self.logger = logger
         self._field = field
+        self._processes = processes
+        self._batch_size = batch_size
+        self._digest_re = re.compile(
+            r'-([0-9a-f]{%d})\.[^.]+$' % self.digest_length)
 
-    @atomic  # noqa (too complex (10))
     def handle(self, dirname):
         stats = {
             'num_processed': 0,
             'num_skipped': 0,
             'num_invalid': 0}
         image_dir, filenames = self._get_image_files(dirname)
-        if image_dir:
-            for filename in filenames:
-                try:
-                    lookup_value \
-                        = self._get_lookup_value_from_filename(filename)
-                    self._process_image(image_dir, filename, lookup_value)
-                    stats['num_processed'] += 1
-                except Product.MultipleObjectsReturned:
-                    self.logger.warning("Multiple products matching %s='%s',"
-                                        " skipping"
-                                        % (self._field, lookup_value))
-                    stats['num_skipped'] += 1
-                except Product.DoesNotExist:
-                    self.logger.warning("No item matching %s='%s'"
-                                        % (self._field, lookup_value))
-                    stats['num_skipped'] += 1
-                except IdenticalImageError:
-                    self.logger.warning("Identical image already exists for"
-                                        " %s='%s', skipping"
-                                        % (self._field, lookup_value))
-                    stats['num_skipped'] += 1
-                except IOError as e:
-                    stats['num_invalid'] += 1
-                    raise ImageImportError(_('%(filename)s is not a valid'
-                                             ' image (%(error)s)')
-                                           % {'filename': filename,
-                                              'error': e})
-                except FieldError as e:
-                    raise ImageImportError(e)
-            if image_dir != dirname:
-                shutil.rmtree(image_dir)
-        else:
+        if not image_dir:
             raise InvalidImageArchive(_('%s is not a valid image archive')
                                       % dirname)
+        try:
+            images = self._inspect_images(image_dir, filenames, stats)
+            products = self._fetch_products(images)
+            for start in range(0, len(images), self._batch_size):
+                self._import_batch(
+                    image_dir, images[start:start + self._batch_size],
+                    products, stats)
+        finally:
+            if image_dir != dirname:
+                shutil.rmtree(image_dir)
         self.logger.info("Finished image import: %(num_processed)d imported,"
-                         " %(num_skipped)d skipped" % stats)
+                         " %(num_skipped)d skipped, %(num_invalid)d invalid"
+                         % stats)
+        return stats
+
+    def _inspect_images(self, image_dir, filenames, stats):
+        """
+        Verify and hash the image files, in parallel if more than one
+        process is used.  Returns a list of (filename, digest) tuples for
+        the valid images.
+        """
+        paths = [os.path.join(image_dir, filename) for filename in filenames]
+        if self._processes > 1:
+            pool = multiprocessing.Pool(self._processes)
+            try:
+                results = pool.map(inspect_image, paths)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [inspect_image(path) for path in paths]
+
+        images = []
+        for filename, (__, digest, error) in zip(filenames, results):
+            if error is not None:
+                self.logger.error("%s is not a valid image (%s), skipping"
+                                  % (filename, error))
+                stats['num_invalid'] += 1
+            else:
+                images.append((filename, digest))
+        return images
+
+    def _fetch_products(self, images):
+        """
+        Return a dict mapping lookup values to lists of matching products
+        """
+        lookup_values = set(
+            self._get_lookup_value_from_filename(filename)
+            for filename, __ in images)
+        products = defaultdict(list)
+        try:
+            for product in Product._default_manager.filter(
+                    **{'%s__in' % self._field: lookup_values}):
+                products[six.text_type(
+                    getattr(product, self._field))].append(product)
+        except FieldError as e:
+            raise ImageImportError(e)
+        return products
+
+    def _get_stored_digest(self, image):
+        """
+        Return the content hash of an existing product image
+        """
+        match = self._digest_re.search(image.original.name)
+        if match:
+            return match.group(1)
+        # Imported before hashes were kept in the name
+        try:
+            image.original.open('rb')
+            try:
+                return hashlib.sha1(image.original.read()).hexdigest()[
+                    :self.digest_length]
+            finally:
+                image.original.close()
+        except IOError:
+            return None
+
+    def _import_batch(self, image_dir, images, products, stats):
+        matched = []
+        for filename, digest in images:
+            lookup_value = self._get_lookup_value_from_filename(filename)
+            matches = products.get(lookup_value, [])
+            if len(matches) > 1:
+                self.logger.warning("Multiple products matching %s='%s',"
+                                    " skipping"
+                                    % (self._field, lookup_value))
+                stats['num_skipped'] += 1
+            elif not matches:
+                self.logger.warning("No item matching %s='%s'"
+                                    % (self._field, lookup_value))
+                stats['num_skipped'] += 1
+            else:
+                matched.append((filename, digest, matches[0]))
+
+        new_images = []
+        try:
+            self._store_images(image_dir, matched, new_images, stats)
+            if new_images:
+                with atomic():
+                    ProductImage.objects.bulk_create(new_images)
+        except Exception:
+            # Don't leave the files of unrecorded images in the storage
+            for image in new_images:
+                image.original.delete(save=False)
+            raise
+        stats['num_processed'] += len(new_images)
+
+    def _store_images(self, image_dir, matched, new_images, stats):
+        """
+        Save the files of the matched images which their products don't have
+        yet, and append their (unsaved) product images to ``new_images``
+        """
+        product_ids = set(product.pk for __, __, product in matched)
+        stored_digests = defaultdict(set)
+        next_index = {}
+        for image in ProductImage.objects.filter(product_id__in=product_ids):
+            stored_digests[image.product_id].add(
+                self._get_stored_digest(image))
+            next_index[image.product_id] = max(
+                image.display_order, next_index.get(image.product_id, -1))
+
+        for filename, digest, product in matched:
+            digest = digest[:self.digest_length]
+            if digest in stored_digests[product.pk]:
+                self.logger.warning(
+                    "Identical image already exists for %s='%s', skipping"
+                    % (self._field,
+                       self._get_lookup_value_from_filename(filename)))
+                stats['num_skipped'] += 1
+                continue
+            stored_digests[product.pk].add(digest)
+            display_order = next_index.get(product.pk, -1) + 1
+            next_index[product.pk] = display_order
+            image = ProductImage(product=product, display_order=display_order)
+            name, ext = os.path.splitext(filename)
+            with open(os.path.join(image_dir, filename), 'rb') as image_file:
+                image.original.save('%s-%s%s' % (name, digest, ext),
+                                    File(image_file), save=False)
+            new_images.append(image)
+            self.logger.debug('Image added to "%s"' % product)
 
     def _get_image_files(self, dirname):
         filenames = []
@@ -118,34 +263,5 @@ class Importer(object):
         # unknown archive - perhaps this should be treated differently
         return ""
 
-    def _process_image(self, dirname, filename, lookup_value):
-        file_path = os.path.join(dirname, filename)
-        trial_image = Image.open(file_path)
-        trial_image.verify()
-
-        kwargs = {self._field: lookup_value}
-        item = Product._default_manager.get(**kwargs)
-
-        new_data = open(file_path, 'rb').read()
-        next_index = 0
-        for existing in item.images.all():
-            next_index = existing.display_order + 1
-            try:
-                if new_data == existing.original.read():
-                    raise IdenticalImageError()
-            except IOError:
-                # File probably doesn't exist
-                existing.delete()
-
-        new_file = File(open(file_path, 'rb'))
-        im = ProductImage(product=item, display_order=next_index)
-        im.original.save(filename, new_file, save=False)
-        im.save()
-        self.logger.debug('Image added to "%s"' % item)
-
-    def _fetch_item(self, filename):
-        kwargs = {self._field: self._get_lookup_value_from_filename(filename)}
-        return Product._default_manager.get(**kwargs)
-
     def _get_lookup_value_from_filename(self, filename):
         return os.path.splitext(filename)[0]
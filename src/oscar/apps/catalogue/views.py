@@ -216,9 +216,11 @@ class ProductCategoryView(TemplateView):
 
     def get_categories(self):
         """
-        Return a list of the current category and its ancestors
+        Return a list of the current category and its descendants.  They
+        are read from the cached category tree.
         """
-        return self.category.get_descendants_and_self()
+        return [self.category] + Category.cached_tree.get_descendants(
+            self.category)
 
     def get_context_data(self, **kwargs):
         context = super(ProductCategoryView, self).get_context_data(**kwargs)
@@ -121,8 +121,8 @@ class CheckoutSessionMixin(object):
         """
         messages = []
         strategy = request.strategy
-        for line in request.basket.all_lines():
-            result = strategy.fetch_for_line(line)
+        lines = list(request.basket.all_lines())
+        for line, result in zip(lines, strategy.fetch_for_lines(lines)):
             is_permitted, reason = result.availability.is_purchase_permitted(
                 line.quantity)
             if not is_permitted:
@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.db.models.signals import post_save
 
+from oscar.core.compat import on_commit
 from oscar.core.loading import get_model
 
 
@@ -8,7 +9,9 @@ def send_product_alerts(sender, instance, created, **kwargs):
     if kwargs.get('raw', False):
         return
     from oscar.apps.customer.alerts import utils
-    utils.send_product_alerts(instance.product)
+    product_id = instance.product_id
+    # Only let the worker look at the stockrecord once it's committed
+    on_commit(lambda: utils.alert_queue.put(product_id))
 
 
 if settings.OSCAR_EAGER_ALERTS:
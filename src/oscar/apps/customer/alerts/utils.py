@@ -1,31 +1,260 @@
 import logging
+import threading
+from collections import defaultdict
 
 from django.conf import settings
 from django.contrib.sites.models import Site
 from django.core import mail
-from django.db.models import Max
+from django.db import connections, transaction
+from django.db.models import Q
 from django.template import Context, loader
+from django.utils import timezone
+from django.utils.six.moves import queue
 
 from oscar.apps.customer.notifications import services
 from oscar.core.loading import get_class, get_model
 
 ProductAlert = get_model('customer', 'ProductAlert')
 Product = get_model('catalogue', 'Product')
+StockRecord = get_model('partner', 'StockRecord')
 Selector = get_class('partner.strategy', 'Selector')
+Dispatcher = get_class('customer.utils', 'Dispatcher')
 
 logger = logging.getLogger('oscar.alerts')
 
 
-def send_alerts():
+class AlertSender(object):
     """
-    Send out product alerts
+    Sends the alerts of products which are back in stock.
+
+    The candidate products (those with stockrecords and active alerts on
+    them or on their parent) are found in one query, and all of their
+    alerts in another.  The templates are loaded once per run and the parts
+    of the message which only depend on the product are rendered once per
+    product.  Emails go out through the ``Dispatcher`` over a single
+    connection, ``batch_size`` at a time; the alerts of each batch are
+    only closed and their site notifications created once the batch has
+    been sent, so alerts aren't lost if sending fails.
+
+    Set ``bulk_notifications`` to False if your ``Notification`` model
+    relies on ``save()`` or its save signals.
     """
-    products = Product.objects.filter(
-        productalert__status=ProductAlert.ACTIVE
-    ).distinct()
-    logger.info("Found %d products with active alerts", products.count())
-    for product in products:
-        send_product_alerts(product)
+    message_template = 'customer/alerts/message.html'
+    email_subject_template = 'customer/alerts/emails/alert_subject.txt'
+    email_body_template = 'customer/alerts/emails/alert_body.txt'
+    bulk_notifications = True
+
+    def __init__(self, batch_size=None, dispatcher=None):
+        self.batch_size = batch_size or settings.OSCAR_ALERT_EMAIL_BATCH_SIZE
+        self.dispatcher = dispatcher or Dispatcher(logger)
+        self.selector = Selector()
+        self.message_tpl = loader.get_template(self.message_template)
+        self.email_subject_tpl = loader.get_template(
+            self.email_subject_template)
+        self.email_body_tpl = loader.get_template(self.email_body_template)
+        self.num_notifications = 0
+
+    def get_products(self, product_ids=None):
+        """
+        Return the products which active alerts might be waiting for
+        """
+        alerted_ids = ProductAlert.objects.filter(
+            status=ProductAlert.ACTIVE).values('product_id')
+        products = Product.objects.filter(
+            Q(id__in=alerted_ids) | Q(parent_id__in=alerted_ids),
+            id__in=StockRecord.objects.values('product_id'))
+        if product_ids is not None:
+            products = products.filter(id__in=product_ids)
+        return products.select_related(
+            'product_class', 'parent__product_class').prefetch_related(
+            'stockrecords')
+
+    def get_alerts(self, products):
+        """
+        Return the active alerts of products and their parents, grouped by
+        product ID
+        """
+        products_by_id = {}
+        for product in products:
+            products_by_id[product.id] = product
+            if product.parent_id:
+                products_by_id[product.parent_id] = product.parent
+        alerts = defaultdict(list)
+        for alert in ProductAlert.objects.filter(
+                product_id__in=list(products_by_id),
+                status=ProductAlert.ACTIVE).select_related('user'):
+            alert.product = products_by_id[alert.product_id]
+            alerts[alert.product_id].append(alert)
+        return alerts
+
+    def is_hurry_mode(self, product, num_alerts):
+        """
+        Whether to add a 'hurry' note, because there are fewer items in
+        stock than alerts
+        """
+        stock_levels = [record.num_in_stock
+                        for record in product.stockrecords.all()
+                        if record.num_in_stock is not None]
+        return bool(stock_levels) and num_alerts < max(stock_levels)
+
+    def is_available_to(self, product, user):
+        strategy = self.selector.strategy(user=user)
+        info = strategy.fetch_for_product(product)
+        return info.availability.is_available_to_buy
+
+    def build_messages(self, products, alerts, site):
+        """
+        Yield an (alert, email, site notification) tuple for every alert
+        which can be sent now
+        """
+        closed = set()
+        for product in products:
+            product_alerts = [
+                alert for alert in
+                alerts[product.id] + alerts.get(product.parent_id, [])
+                if alert.pk not in closed]
+            if not product_alerts:
+                continue
+            logger.info("Sending alerts for '%s'", product)
+            hurry_mode = self.is_hurry_mode(product, len(product_alerts))
+
+            # The subject and site notification only depend on the product
+            # the alert was registered for
+            rendered = {}
+            for alert in product_alerts:
+                if not self.is_available_to(product, alert.user):
+                    continue
+                ctx = Context({
+                    'alert': alert,
+                    'site': site,
+                    'hurry': hurry_mode,
+                })
+                if alert.product_id not in rendered:
+                    rendered[alert.product_id] = (
+                        self.email_subject_tpl.render(ctx).strip(),
+                        self.message_tpl.render(ctx))
+                subject, message = rendered[alert.product_id]
+                email = mail.EmailMessage(
+                    subject,
+                    self.email_body_tpl.render(ctx),
+                    settings.OSCAR_FROM_EMAIL,
+                    [alert.get_email_address()],
+                )
+                closed.add(alert.pk)
+                yield alert, email, message if alert.user else None
+
+    def get_batches(self, messages):
+        """
+        Group messages into batches of emails.  The alerts of a batch are
+        closed and their users notified when the next batch is requested,
+        which the dispatcher only does once the batch has been sent.
+        """
+        batch = []
+        for message in messages:
+            batch.append(message)
+            if len(batch) >= self.batch_size:
+                yield [email for __, email, __ in batch]
+                self.close_batch(batch)
+                batch = []
+        if batch:
+            yield [email for __, email, __ in batch]
+            self.close_batch(batch)
+
+    def close_batch(self, batch):
+        notifications = defaultdict(list)
+        for alert, __, message in batch:
+            if message is not None:
+                notifications[message].append(alert.user)
+        with transaction.atomic():
+            ProductAlert.objects.filter(
+                pk__in=[alert.pk for alert, __, __ in batch]
+            ).update(status=ProductAlert.CLOSED, date_closed=timezone.now())
+            for message, users in notifications.items():
+                services.notify_users(
+                    users, message, bulk=self.bulk_notifications)
+                self.num_notifications += len(users)
+
+    def send(self, product_ids=None):
+        """
+        Send the alerts of all products which are back in stock, or only
+        of the given products.  Returns the number of emails sent.
+        """
+        products = list(self.get_products(product_ids))
+        logger.info("Found %d products with active alerts", len(products))
+        if not products:
+            return 0
+        alerts = self.get_alerts(products)
+        messages = self.build_messages(
+            products, alerts, Site.objects.get_current())
+        self.num_notifications = 0
+        num_emails = self.dispatcher.send_email_batches(
+            self.get_batches(messages))
+        logger.info("Sent %d notifications and %d emails",
+                    self.num_notifications, num_emails)
+        return num_emails
+
+
+class AlertQueue(object):
+    """
+    Collects the products whose stock has changed, and sends their alerts
+    from a worker thread, so saving a stockrecord doesn't wait for alerts
+    to be rendered and sent.  Products queued while the worker is busy are
+    handled together in its next run.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def put(self, product_id):
+        self.queue.put(product_id)
+        self.start()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='oscar-product-alerts')
+                self.thread.daemon = True
+                self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                self.process()
+            finally:
+                # The worker has its own database connections
+                connections.close_all()
+
+    def process(self):
+        """
+        Wait for queued products, and send the alerts of all products
+        queued by then
+        """
+        product_ids = [self.queue.get()]
+        while True:
+            try:
+                product_ids.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            send_alerts(set(product_ids))
+        except Exception:
+            logger.exception("Unable to send product alerts")
+        finally:
+            for __ in product_ids:
+                self.queue.task_done()
+
+
+alert_queue = AlertQueue()
+
+
+def send_alerts(product_ids=None):
+    """
+    Send out product alerts, optionally only for the given products
+    """
+    AlertSender().send(product_ids)
 
 
 def send_alert_confirmation(alert):
@@ -54,73 +283,4 @@ def send_product_alerts(product):
     if the product is back in stock. Add a little 'hurry' note if the
     amount of in-stock items is less then the number of notifications.
     """
-    stockrecords = product.stockrecords.all()
-    num_stockrecords = len(stockrecords)
-    if not num_stockrecords:
-        return
-
-    logger.info("Sending alerts for '%s'", product)
-    alerts = ProductAlert.objects.filter(
-        product_id__in=(product.id, product.parent_id),
-        status=ProductAlert.ACTIVE,
-    )
-
-    # Determine 'hurry mode'
-    num_alerts = alerts.count()
-    if num_stockrecords == 1:
-        num_in_stock = stockrecords[0].num_in_stock
-        # hurry_mode is false if num_in_stock is None
-        hurry_mode = num_in_stock is not None and num_alerts < num_in_stock
-    else:
-        result = stockrecords.aggregate(max_in_stock=Max('num_in_stock'))
-        hurry_mode = result['max_in_stock'] is not None and \
-            num_alerts < result['max_in_stock']
-
-    # Load templates
-    message_tpl = loader.get_template('customer/alerts/message.html')
-    email_subject_tpl = loader.get_template('customer/alerts/emails/'
-                                            'alert_subject.txt')
-    email_body_tpl = loader.get_template('customer/alerts/emails/'
-                                         'alert_body.txt')
-
-    emails = []
-    num_notifications = 0
-    selector = Selector()
-    for alert in alerts:
-        # Check if the product is available to this user
-        strategy = selector.strategy(user=alert.user)
-        data = strategy.fetch_for_product(product)
-        if not data.availability.is_available_to_buy:
-            continue
-
-        ctx = Context({
-            'alert': alert,
-            'site': Site.objects.get_current(),
-            'hurry': hurry_mode,
-        })
-        if alert.user:
-            # Send a site notification
-            num_notifications += 1
-            services.notify_user(alert.user, message_tpl.render(ctx))
-
-        # Build email and add to list
-        emails.append(
-            mail.EmailMessage(
-                email_subject_tpl.render(ctx).strip(),
-                email_body_tpl.render(ctx),
-                settings.OSCAR_FROM_EMAIL,
-                [alert.get_email_address()],
-            )
-        )
-        alert.close()
-
-    # Send all emails in one go to prevent multiple SMTP
-    # connections to be opened
-    if emails:
-        connection = mail.get_connection()
-        connection.open()
-        connection.send_messages(emails)
-        connection.close()
-
-    logger.info("Sent %d notifications and %d emails", num_notifications,
-                len(emails))
+    send_alerts([product.id])
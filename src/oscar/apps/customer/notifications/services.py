@@ -10,9 +10,18 @@ def notify_user(user, msg, **kwargs):
     Notification.objects.create(recipient=user, subject=msg, **kwargs)
 
 
-def notify_users(users, msg, **kwargs):
+def notify_users(users, msg, bulk=False, **kwargs):
     """
-    Send a simple notification to an iterable of users
+    Send a simple notification to an iterable of users.
+
+    With ``bulk=True`` the notifications are inserted with a single query,
+    which skips ``Notification.save()`` and the ``pre_save``/``post_save``
+    signals.
     """
-    for user in users:
-        notify_user(user, msg, **kwargs)
+    if not bulk:
+        for user in users:
+            notify_user(user, msg, **kwargs)
+        return
+    Notification.objects.bulk_create([
+        Notification(recipient=user, subject=msg, **kwargs)
+        for user in users])
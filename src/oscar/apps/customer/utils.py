@@ -2,7 +2,8 @@ import logging
 
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.core.mail import (
+    EmailMessage, EmailMultiAlternatives, get_connection)
 from django.core.urlresolvers import reverse
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
@@ -104,6 +105,29 @@ class Dispatcher(object):
 
         return email
 
+    def send_email_batches(self, batches):
+        """
+        Send batches of prepared email messages over a single connection,
+        which is only opened once there's something to send.  ``batches``
+        can be a generator, so messages can be built while earlier batches
+        are sent.  Returns the number of messages sent.
+        """
+        connection = None
+        num_sent = 0
+        try:
+            for emails in batches:
+                if not emails:
+                    continue
+                if connection is None:
+                    connection = get_connection()
+                    connection.open()
+                num_sent += connection.send_messages(emails) or 0
+                self.logger.info("Sent a batch of %d emails", len(emails))
+        finally:
+            if connection is not None:
+                connection.close()
+        return num_sent
+
     def send_text_message(self, user, event_type):
         raise NotImplementedError
 
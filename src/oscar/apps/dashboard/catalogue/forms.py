@@ -285,23 +285,26 @@ class ProductForm(forms.ModelForm):
         the product instance's attributes
         """
         instance = kwargs.get('instance')
-        if instance is None:
+        if instance is None or instance.pk is None:
             return
-        for attribute in product_class.attributes.all():
-            try:
-                value = instance.attribute_values.get(
-                    attribute=attribute).value
-            except exceptions.ObjectDoesNotExist:
-                pass
-            else:
-                kwargs['initial']['attr_%s' % attribute.code] = value
+        values = dict(
+            (value.attribute_id, value) for value in
+            instance.attribute_values.all())
+        for attribute in product_class.attribute_schema.get_attributes(
+                product_class):
+            if attribute.pk in values:
+                value = values[attribute.pk]
+                # The value needs the attribute to know its type
+                value.attribute = attribute
+                kwargs['initial']['attr_%s' % attribute.code] = value.value
 
     def add_attribute_fields(self, product_class, is_parent=False):
         """
         For each attribute specified by the product class, this method
         dynamically adds form fields to the product form.
         """
-        for attribute in product_class.attributes.all():
+        for attribute in product_class.attribute_schema.get_attributes(
+                product_class):
             field = self.get_attribute_field(attribute)
             if field:
                 self.fields['attr_%s' % attribute.code] = field
@@ -19,7 +19,7 @@ from oscar.core.compat import UnicodeCSVWriter
 from oscar.core.loading import get_class, get_model
 from oscar.core.utils import datetime_combine, format_datetime
 from oscar.views import sort_queryset
-from oscar.views.generic import BulkEditMixin
+from oscar.views.generic import BulkEditMixin, KeysetPaginationMixin
 
 Partner = get_model('partner', 'Partner')
 Transaction = get_model('payment', 'Transaction')
@@ -106,10 +106,11 @@ class OrderStatsView(FormView):
         return stats
 
 
-class OrderListView(BulkEditMixin, ListView):
+class OrderListView(BulkEditMixin, KeysetPaginationMixin, ListView):
     """
     Dashboard view for a list of orders.
-    Supports the permission-based dashboard.
+    Supports the permission-based dashboard, and keyset pagination (see
+    ``KeysetPaginationMixin``).
     """
     model = Order
     context_object_name = 'orders'
@@ -1,10 +1,12 @@
 from django import forms
+from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 
 from oscar.core.loading import get_model
 from oscar.forms import widgets
 
 Voucher = get_model('voucher', 'Voucher')
+VoucherSet = get_model('voucher', 'VoucherSet')
 Benefit = get_model('offer', 'Benefit')
 Range = get_model('offer', 'Range')
 
@@ -84,6 +86,62 @@ class VoucherForm(forms.Form):
         return cleaned_data
 
 
+class VoucherSetForm(forms.Form):
+    """
+    A form for generating a set of vouchers which share one offer
+    """
+    name = forms.CharField(label=_("Name"), max_length=100)
+    count = forms.IntegerField(label=_("Number of vouchers"), min_value=1)
+    code_length = forms.IntegerField(
+        label=_("Length of the codes"), initial=12, min_value=6,
+        max_value=128)
+
+    start_datetime = forms.DateTimeField(
+        widget=widgets.DateTimePickerInput(),
+        label=_("Start datetime"))
+    end_datetime = forms.DateTimeField(
+        label=_("End datetime"), widget=widgets.DateTimePickerInput())
+    usage = forms.ChoiceField(
+        choices=Voucher.USAGE_CHOICES, initial=Voucher.SINGLE_USE,
+        label=_("Usage"))
+
+    benefit_range = forms.ModelChoiceField(
+        label=_('Which products get a discount?'),
+        queryset=Range.objects.all(),
+    )
+    benefit_type = forms.ChoiceField(
+        choices=VoucherForm.type_choices,
+        label=_('Discount type'),
+    )
+    benefit_value = forms.DecimalField(
+        label=_('Discount value'))
+
+    def clean_name(self):
+        name = self.cleaned_data['name']
+        if VoucherSet.objects.filter(name=name).exists():
+            raise forms.ValidationError(_("The name '%s' is already in"
+                                          " use") % name)
+        return name
+
+    def clean_count(self):
+        count = self.cleaned_data['count']
+        max_count = settings.OSCAR_VOUCHER_SET_MAX_COUNT
+        if count > max_count:
+            raise forms.ValidationError(
+                _("A voucher set can't have more than %d vouchers")
+                % max_count)
+        return count
+
+    def clean(self):
+        cleaned_data = super(VoucherSetForm, self).clean()
+        start_datetime = cleaned_data.get('start_datetime')
+        end_datetime = cleaned_data.get('end_datetime')
+        if start_datetime and end_datetime and end_datetime < start_datetime:
+            raise forms.ValidationError(_("The start date must be before the"
+                                          " end date"))
+        return cleaned_data
+
+
 class VoucherSearchForm(forms.Form):
     name = forms.CharField(required=False, label=_("Name"))
     code = forms.CharField(required=False, label=_("Code"))
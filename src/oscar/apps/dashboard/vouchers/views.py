@@ -2,17 +2,22 @@ from django.conf import settings
 from django.contrib import messages
 from django.core.urlresolvers import reverse
 from django.db import transaction
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.text import slugify
 from django.utils.translation import ugettext_lazy as _
 from django.views import generic
 
-from oscar.core.loading import get_class, get_model
+from oscar.core.compat import UnicodeCSVWriter
+from oscar.core.loading import get_class, get_classes, get_model
 from oscar.views import sort_queryset
 
-VoucherForm = get_class('dashboard.vouchers.forms', 'VoucherForm')
-VoucherSearchForm = get_class('dashboard.vouchers.forms', 'VoucherSearchForm')
+VoucherForm, VoucherSetForm, VoucherSearchForm = get_classes(
+    'dashboard.vouchers.forms',
+    ['VoucherForm', 'VoucherSetForm', 'VoucherSearchForm'])
+VoucherGenerator = get_class('voucher.utils', 'VoucherGenerator')
 Voucher = get_model('voucher', 'Voucher')
+VoucherSet = get_model('voucher', 'VoucherSet')
 ConditionalOffer = get_model('offer', 'ConditionalOffer')
 Benefit = get_model('offer', 'Benefit')
 Condition = get_model('offer', 'Condition')
@@ -203,3 +208,110 @@ class VoucherDeleteView(generic.DeleteView):
     def get_success_url(self):
         messages.warning(self.request, _("Voucher deleted"))
         return reverse('dashboard:voucher-list')
+
+
+class VoucherSetListView(generic.ListView):
+    model = VoucherSet
+    context_object_name = 'voucher_sets'
+    template_name = 'dashboard/vouchers/voucher_set_list.html'
+    paginate_by = settings.OSCAR_DASHBOARD_ITEMS_PER_PAGE
+
+
+class VoucherSetCreateView(generic.FormView):
+    model = VoucherSet
+    template_name = 'dashboard/vouchers/voucher_set_form.html'
+    form_class = VoucherSetForm
+    generator_class = VoucherGenerator
+
+    @transaction.atomic()
+    def form_valid(self, form):
+        condition = Condition.objects.create(
+            range=form.cleaned_data['benefit_range'],
+            type=Condition.COUNT,
+            value=1
+        )
+        benefit = Benefit.objects.create(
+            range=form.cleaned_data['benefit_range'],
+            type=form.cleaned_data['benefit_type'],
+            value=form.cleaned_data['benefit_value']
+        )
+        name = form.cleaned_data['name']
+        offer = ConditionalOffer.objects.create(
+            name=_("Offer for voucher set '%s'") % name,
+            offer_type=ConditionalOffer.VOUCHER,
+            benefit=benefit,
+            condition=condition,
+        )
+        self.voucher_set = VoucherSet.objects.create(
+            name=name,
+            count=form.cleaned_data['count'],
+            code_length=form.cleaned_data['code_length'],
+            usage=form.cleaned_data['usage'],
+            start_datetime=form.cleaned_data['start_datetime'],
+            end_datetime=form.cleaned_data['end_datetime'],
+            offer=offer,
+        )
+        self.generator_class().generate(self.voucher_set)
+        return HttpResponseRedirect(self.get_success_url())
+
+    def get_success_url(self):
+        messages.success(self.request, _("Voucher set created"))
+        return reverse('dashboard:voucher-set-detail',
+                       kwargs={'pk': self.voucher_set.pk})
+
+
+class VoucherSetDetailView(generic.DetailView):
+    model = VoucherSet
+    template_name = 'dashboard/vouchers/voucher_set_detail.html'
+    context_object_name = 'voucher_set'
+
+    def get_context_data(self, **kwargs):
+        ctx = super(VoucherSetDetailView, self).get_context_data(**kwargs)
+        vouchers = self.object.vouchers.all()
+        ctx['num_vouchers'] = vouchers.count()
+        ctx['num_used_vouchers'] = vouchers.filter(num_orders__gt=0).count()
+        return ctx
+
+
+class CSVChunks(object):
+    """
+    Collects what a CSV writer writes, so it can be streamed in chunks
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def pop(self):
+        data, self.chunks = ''.join(self.chunks), []
+        return data
+
+
+class VoucherSetDownloadView(generic.DetailView):
+    """
+    Stream the codes of a voucher set as a CSV file, without loading the
+    whole set into memory
+    """
+    model = VoucherSet
+    rows_per_chunk = 1000
+
+    def render_to_response(self, context, **response_kwargs):
+        response = StreamingHttpResponse(
+            self.generate_csv(self.object), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="%s.csv"' % (
+            slugify(self.object.name) or 'vouchers')
+        return response
+
+    def generate_csv(self, voucher_set):
+        chunks = CSVChunks()
+        writer = UnicodeCSVWriter(open_file=chunks)
+        writer.writerow([_('Code')])
+        codes = voucher_set.vouchers.order_by('pk').values_list(
+            'code', flat=True)
+        for i, code in enumerate(codes.iterator(), 1):
+            writer.writerow([code])
+            if i % self.rows_per_chunk == 0:
+                yield chunks.pop()
+        yield chunks.pop()
@@ -1,3 +1,4 @@
+import functools
 import itertools
 import operator
 import os
@@ -8,7 +9,8 @@ from decimal import ROUND_DOWN
 from django.conf import settings
 from django.core import exceptions
 from django.core.urlresolvers import reverse
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.db.models.query import Q
 from django.template.defaultfilters import date as date_filter
 from django.utils.encoding import python_2_unicode_compatible
@@ -24,6 +26,7 @@ from oscar.models import fields
 from oscar.templatetags.currency_filters import currency
 
 BrowsableRangeManager = get_class('offer.managers', 'BrowsableRangeManager')
+RangeProductIndex = get_class('offer.cache', 'RangeProductIndex')
 
 
 @python_2_unicode_compatible
@@ -261,23 +264,79 @@ class AbstractConditionalOffer(models.Model):
                 max(0, self.max_global_applications - self.num_applications))
         return min(limits)
 
+    @cached_property
+    def num_user_applications(self):
+        """
+        Map user IDs to the number of times they have used this offer, for
+        the users that have been looked up through this instance
+        """
+        return {}
+
     def get_num_user_applications(self, user):
-        OrderDiscount = get_model('order', 'OrderDiscount')
-        aggregates = OrderDiscount.objects.filter(offer_id=self.id,
-                                                  order__user=user)\
-            .aggregate(total=models.Sum('frequency'))
-        return aggregates['total'] if aggregates['total'] is not None else 0
+        """
+        Return the number of times the user has used this offer.
+
+        The count is read from the ``UserOfferUsage`` counter maintained by
+        ``record_user_usage``, and memoised on this instance.
+        """
+        if user.pk is None:
+            return 0
+        if user.pk not in self.num_user_applications:
+            UserOfferUsage = get_model('offer', 'UserOfferUsage')
+            count = UserOfferUsage._default_manager.filter(
+                offer_id=self.id, user_id=user.pk).values_list(
+                    'num_applications', flat=True).first()
+            self.num_user_applications[user.pk] = count or 0
+        return self.num_user_applications[user.pk]
 
     def shipping_discount(self, charge):
         return self.benefit.proxy().shipping_discount(charge)
 
     def record_usage(self, discount):
-        self.num_applications += discount['freq']
-        self.total_discount += discount['discount']
-        self.num_orders += 1
-        self.save()
+        """
+        Record the use of this offer in an order.
+
+        The counters are incremented in the database instead of saving the
+        offer, so concurrent orders don't overwrite each other's usage, and
+        orders don't invalidate the compiled site offers.  Offers with a
+        global limit are the exception: their status is saved, as the
+        compiled offers need the new counters to enforce the limit.
+        """
+        counters = ['num_applications', 'total_discount', 'num_orders']
+        self.__class__._default_manager.filter(pk=self.pk).update(
+            num_applications=F('num_applications') + discount['freq'],
+            total_discount=F('total_discount') + discount['discount'],
+            num_orders=F('num_orders') + 1)
+        self.refresh_from_db(fields=counters)
+        if self.max_global_applications or self.max_discount:
+            self.save(update_fields=['status'])
     record_usage.alters_data = True
 
+    def record_user_usage(self, order, num_applications):
+        """
+        Add to the number of times the customer of an order has used this
+        offer.  Orders of anonymous customers aren't counted.
+        """
+        user_id = order.user_id
+        if user_id is None:
+            return
+        UserOfferUsage = get_model('offer', 'UserOfferUsage')
+        usages = UserOfferUsage._default_manager.filter(
+            offer_id=self.id, user_id=user_id)
+        changes = {'num_applications': F('num_applications') +
+                   num_applications}
+        if not usages.update(**changes):
+            try:
+                with transaction.atomic():
+                    UserOfferUsage._default_manager.create(
+                        offer_id=self.id, user_id=user_id,
+                        num_applications=num_applications)
+            except IntegrityError:
+                # Another order of this user created it in the meantime
+                usages.update(**changes)
+        self.num_user_applications.pop(user_id, None)
+    record_user_usage.alters_data = True
+
     def availability_description(self):
         """
         Return a description of when this offer is available
@@ -797,10 +856,15 @@ class AbstractRange(models.Model):
     __excluded_product_ids = None
     __class_ids = None
     __category_ids = None
+    __product_ids = None
+    __membership = None
 
     objects = models.Manager()
     browsable = BrowsableRangeManager()
 
+    # Shared by all ranges in this process
+    product_index = RangeProductIndex()
+
     class Meta:
         abstract = True
         app_label = 'offer'
@@ -844,7 +908,7 @@ class AbstractRange(models.Model):
         # re-added again, thus it returns back to the range product list.
         if product.id in self._excluded_product_ids():
             self.excluded_products.remove(product)
-            self.invalidate_cached_ids()
+        self.invalidate_cached_ids()
 
     def remove_product(self, product):
         """
@@ -860,36 +924,37 @@ class AbstractRange(models.Model):
         # Invalidating cached property value with list of IDs of already excluded products.
         self.invalidate_cached_ids()
 
-    def contains_product(self, product):  # noqa (too complex (12))
+    def contains_product(self, product):
         """
         Check whether the passed product is part of this range.
         """
+        membership = self.__membership
+        if membership is not None and product.id in membership:
+            return membership[product.id]
+        return self._test_product(product)
 
+    def _test_product(self, product):
         # Delegate to a proxy class if one is provided
         if self.proxy:
             return self.proxy.contains_product(product)
 
-        excluded_product_ids = self._excluded_product_ids()
-        if product.id in excluded_product_ids:
-            return False
         if self.includes_all_products:
-            return True
-        if product.get_product_class().id in self._class_ids():
-            return True
-        included_product_ids = self._included_product_ids()
-        # If the product's parent is in the range, the child is automatically included as well
-        if product.is_child and product.parent.id in included_product_ids:
-            return True
-        if product.id in included_product_ids:
-            return True
-        test_categories = self.included_categories.all()
-        if test_categories:
-            for category in product.get_categories().all():
-                for test_category in test_categories:
-                    if category == test_category \
-                            or category.is_descendant_of(test_category):
-                        return True
-        return False
+            return product.id not in self._excluded_product_ids()
+        return product.id in self._product_ids()
+
+    def prefetch_products(self, products):
+        """
+        Test the membership of several products at once and remember the
+        results on this instance.
+
+        This is used when applying offers, where the same products are
+        otherwise tested against the same ranges over and over again.
+        """
+        membership = dict(self.__membership or {})
+        for product in products:
+            if product.id not in membership:
+                membership[product.id] = self._test_product(product)
+        self.__membership = membership
 
     # Shorter alias
     contains = contains_product
@@ -931,21 +996,58 @@ class AbstractRange(models.Model):
 
     def _category_ids(self):
         if self.__category_ids is None:
-            category_ids_list = list(
-                self.included_categories.values_list('pk', flat=True))
-            for category in self.included_categories.all():
-                children_ids = category.get_descendants().values_list(
-                    'pk', flat=True)
-                category_ids_list.extend(list(children_ids))
-
-            self.__category_ids = category_ids_list
+            paths = [category.path
+                     for category in self.included_categories.all()]
+            if paths:
+                # Included categories and all their descendants
+                Category = get_model('catalogue', 'Category')
+                self.__category_ids = list(
+                    Category.objects.filter(functools.reduce(
+                        operator.or_, [Q(path__startswith=path)
+                                       for path in paths])
+                    ).values_list('pk', flat=True))
+            else:
+                self.__category_ids = []
 
         return self.__category_ids
 
+    def _product_ids(self):
+        if self.__product_ids is None:
+            self.__product_ids = self.product_index.get_product_ids(self)
+        return self.__product_ids
+
+    def compute_product_ids(self, product_ids=None):
+        """
+        Return the IDs of all products in this range, including child
+        products, without using the range's index.
+
+        If ``product_ids`` is passed, only these parent or stand-alone
+        products and their children are considered.
+        """
+        products = self.all_products().order_by()
+        if product_ids is not None:
+            products = products.filter(id__in=product_ids)
+        return (self.__get_pks_and_child_pks(products) -
+                set(self._excluded_product_ids()))
+
     def invalidate_cached_ids(self):
+        self.__class_ids = None
         self.__category_ids = None
         self.__included_product_ids = None
         self.__excluded_product_ids = None
+        self.__product_ids = None
+        self.__membership = None
+
+    def cache_membership(self):
+        """
+        Load the IDs that ranges keep on the instance up front, so the range
+        can be pickled and later used without hitting the database.  Product
+        membership itself is answered by the product index.
+        """
+        self._included_product_ids()
+        self._excluded_product_ids()
+        self.__class_ids = list(self._class_ids())
+        self._category_ids()
 
     def num_products(self):
         # Delegate to a proxy class if one is provided
@@ -971,11 +1073,18 @@ class AbstractRange(models.Model):
             # Filter out child products
             return Product.browsable.all()
 
+        # Included and excluded products (and their children) as well as
+        # product classes are passed as subqueries, so that this is a single
+        # query however large the range is.
+        included = self.included_products.values('pk')
+        excluded = self.excluded_products.values('pk')
         return Product.objects.filter(
-            Q(id__in=self._included_product_ids()) |
-            Q(product_class_id__in=self._class_ids()) |
+            Q(id__in=included) | Q(parent_id__in=included) |
+            Q(product_class_id__in=self.classes.values('pk')) |
             Q(productcategory__category_id__in=self._category_ids())
-        ).exclude(id__in=self._excluded_product_ids()).distinct()
+        ).exclude(
+            Q(id__in=excluded) | Q(parent_id__in=excluded)
+        ).distinct()
 
     @property
     def is_editable(self):
@@ -1007,6 +1116,30 @@ class AbstractRangeProduct(models.Model):
         unique_together = ('range', 'product')
 
 
+class AbstractUserOfferUsage(models.Model):
+    """
+    Counts how many times a user has used an offer.
+
+    It's a denormalisation of the order discounts, so the per-user limit of
+    an offer can be checked without aggregating the user's order history.
+    """
+    offer = models.ForeignKey(
+        'offer.ConditionalOffer', related_name='user_usages',
+        verbose_name=_("Offer"))
+    user = models.ForeignKey(
+        AUTH_USER_MODEL, related_name='offer_usages',
+        verbose_name=_("User"))
+    num_applications = models.PositiveIntegerField(
+        _("Number of applications"), default=0)
+
+    class Meta:
+        abstract = True
+        app_label = 'offer'
+        unique_together = ('offer', 'user')
+        verbose_name = _("User offer usage")
+        verbose_name_plural = _("User offer usages")
+
+
 class AbstractRangeProductFileUpload(models.Model):
     range = models.ForeignKey('offer.Range', related_name='file_uploads',
                               verbose_name=_("Range"))
@@ -1,11 +1,15 @@
+import hashlib
 import logging
 from itertools import chain
 
-from django.db.models import Q
-from django.utils.timezone import now
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.encoding import force_bytes
 
 from oscar.apps.offer import results
-from oscar.core.loading import get_model
+from oscar.core.loading import get_class, get_model
+
+SiteOfferSet = get_class('offer.cache', 'SiteOfferSet')
 
 logger = logging.getLogger('oscar.offers')
 
@@ -16,6 +20,10 @@ class OfferApplicationError(Exception):
 
 class Applicator(object):
 
+    # Shared by all applicators in this process so that the compiled site
+    # offers are only rebuilt when they have been invalidated.
+    site_offer_set = SiteOfferSet()
+
     def apply(self, basket, user=None, request=None):
         """
         Apply all relevant offers to the given basket.
@@ -24,16 +32,37 @@ class Applicator(object):
         are dependent on the user (eg session-based offers).
         """
         offers = self.get_offers(basket, user, request)
+        timeout = settings.OSCAR_OFFER_APPLICATION_CACHE_TIMEOUT
+        if not timeout:
+            self.apply_offers(basket, offers)
+            return
+
+        # The outcome of applying offers only depends on the basket contents
+        # and the offers, so it's memoised and replayed onto the lines when
+        # the same basket is seen again.
+        key = self.get_cache_key(basket, offers, user)
+        state = cache.get(key)
+        if state is not None:
+            self.restore_applications(basket, offers, state)
+            return
         self.apply_offers(basket, offers)
+        try:
+            cache.set(key, self.get_application_state(basket), timeout)
+        except Exception:
+            # Custom application results might not be picklable
+            logger.exception("Unable to cache offer applications")
 
     def apply_offers(self, basket, offers):
+        self.prepare_offers(basket, offers)
         applications = results.OfferApplications()
         for offer in offers:
             num_applications = 0
+            # The limit doesn't change while the offer is being applied
+            max_applications = offer.get_max_applications(basket.owner)
             # Keep applying the offer until either
             # (a) We reach the max number of applications for the offer.
             # (b) The benefit can't be applied successfully.
-            while num_applications < offer.get_max_applications(basket.owner):
+            while num_applications < max_applications:
                 result = offer.apply_benefit(basket)
                 num_applications += 1
                 if not result.is_successful:
@@ -46,6 +75,172 @@ class Applicator(object):
         # rendered in templates
         basket.offer_applications = applications
 
+    def prepare_offers(self, basket, offers):
+        """
+        Load everything needed to evaluate the offers against the basket in
+        bulk, rather than once per line and offer.
+
+        The product parents of the lines are fetched in one query, the
+        conditions and benefits are resolved to their proxies once, and the
+        line x range membership is computed once for every range involved.
+        The number of times the basket owner has used the offers is loaded in
+        one query too.
+        """
+        self.prefetch_user_applications(basket.owner, offers)
+        lines = list(basket.all_lines())
+        if not lines:
+            return
+        products = [line.product for line in lines]
+        self.prefetch_parents(products)
+
+        ranges = {}
+        for offer in offers:
+            self.site_offer_set.resolve_proxies(offer)
+            for rng in (offer.condition.range, offer.benefit.range):
+                if rng is not None:
+                    ranges[id(rng)] = rng
+        for rng in ranges.values():
+            rng.prefetch_products(products)
+
+    def prefetch_user_applications(self, user, offers):
+        """
+        Memoise how many times the user has used the offers which limit the
+        number of applications per user
+        """
+        if user is None or user.pk is None:
+            return
+        offers = [offer for offer in offers if offer.max_user_applications and
+                  user.pk not in offer.num_user_applications]
+        if not offers:
+            return
+        UserOfferUsage = get_model('offer', 'UserOfferUsage')
+        counts = dict(UserOfferUsage._default_manager.filter(
+            user_id=user.pk, offer_id__in=[offer.id for offer in offers])
+            .values_list('offer_id', 'num_applications'))
+        for offer in offers:
+            offer.num_user_applications[user.pk] = counts.get(offer.id, 0)
+
+    def prefetch_parents(self, products):
+        """
+        Assign the parents (and their product class) of child products,
+        which are needed to test whether they are discountable and which
+        class they belong to.
+        """
+        Product = get_model('catalogue', 'Product')
+        children = [product for product in products
+                    if product.parent_id and
+                    not Product.parent.is_cached(product)]
+        if not children:
+            return
+        parents = Product._default_manager.select_related(
+            'product_class').in_bulk(
+                set(product.parent_id for product in children))
+        for product in children:
+            product.parent = parents[product.parent_id]
+
+    def get_cache_key(self, basket, offers, user):
+        """
+        Return the key under which the offer applications for this basket
+        are memoised.
+
+        It's a digest of everything that the applications depend on: the
+        basket lines (product, stockrecord, quantity, options and price), the
+        offers and the vouchers they came from, the strategy, the user, the
+        number of times the basket owner has used offers with a per-user
+        limit, the version of the compiled offer set and the versions of the
+        product indexes of the ranges involved.  The offer set changes
+        whenever an offer or voucher is saved, which includes recording the
+        usage of offers with a global limit.  Range indexes change when
+        products join or leave the range.
+        """
+        lines = []
+        for line in basket.all_lines():
+            options = sorted((attr.option_id, attr.value)
+                             for attr in line.attributes.all())
+            lines.append((line.product_id, line.stockrecord_id, line.quantity,
+                          options, line.unit_effective_price))
+        owner = basket.owner
+        self.prefetch_user_applications(owner, offers)
+        offer_keys = [
+            (offer.id, getattr(offer.get_voucher(), 'id', None),
+             offer.get_num_user_applications(owner)
+             if owner and offer.max_user_applications else None)
+            for offer in offers]
+        parts = (lines, offer_keys, basket.owner_id,
+                 self.get_strategy_key(basket), self.get_user_key(user),
+                 self.site_offer_set.get_version(''),
+                 self.get_range_versions(offers))
+        digest = hashlib.md5(force_bytes(repr(parts))).hexdigest()
+        return 'oscar-offer-applications-%s' % digest
+
+    def get_range_versions(self, offers):
+        """
+        Return the versions of the product indexes of the ranges which the
+        offers' conditions and benefits point to, sorted by range
+        """
+        Range = get_model('offer', 'Range')
+        range_ids = set()
+        for offer in offers:
+            for rng in (offer.condition.range, offer.benefit.range):
+                # Other ranges don't use the index
+                if (rng is not None and not rng.includes_all_products and
+                        not rng.proxy_class):
+                    range_ids.add(rng.id)
+        if not range_ids:
+            return []
+        versions = Range.product_index.get_versions(range_ids)
+        return sorted(versions.items())
+
+    def get_strategy_key(self, basket):
+        strategy = basket.strategy
+        return '%s.%s' % (strategy.__module__, strategy.__class__.__name__)
+
+    def get_user_key(self, user):
+        """
+        Return what identifies the user for the purpose of applying offers.
+
+        Override this to share memoised applications between groups of users
+        (eg if user offers depend on a customer group) or to add more data.
+        """
+        return getattr(user, 'pk', None)
+
+    def get_application_state(self, basket):
+        """
+        Return the offer applications and the per-line discounts of the
+        basket in a form that can be cached
+        """
+        applications = [
+            (offer_id, application['result'], application['freq'],
+             application['discount'])
+            for offer_id, application in
+            basket.offer_applications.applications.items()]
+        lines = [(line._discount_excl_tax, line._discount_incl_tax,
+                  line._affected_quantity)
+                 for line in basket.all_lines()]
+        return applications, lines
+
+    def restore_applications(self, basket, offers, state):
+        """
+        Replay memoised offer applications onto the basket
+        """
+        applications, line_discounts = state
+        for line, discount in zip(basket.all_lines(), line_discounts):
+            discount_excl_tax, discount_incl_tax, affected_quantity = discount
+            line.clear_discount()
+            if discount_excl_tax:
+                line.discount(discount_excl_tax, 0, incl_tax=False)
+            if discount_incl_tax:
+                line.discount(discount_incl_tax, 0, incl_tax=True)
+            line.consume(affected_quantity)
+
+        offers = dict((offer.id, offer) for offer in offers)
+        basket.offer_applications = results.OfferApplications()
+        for offer_id, result, freq, discount in applications:
+            basket.offer_applications.add(offers[offer_id], result)
+            application = basket.offer_applications.applications[offer_id]
+            application['freq'] = freq
+            application['discount'] = discount
+
     def get_offers(self, basket, user=None, request=None):
         """
         Return all offers to apply to the basket.
@@ -67,23 +262,7 @@ class Applicator(object):
         """
         Return site offers that are available to all users
         """
-        cutoff = now()
-        date_based = Q(
-            Q(start_datetime__lte=cutoff),
-            Q(end_datetime__gte=cutoff) | Q(end_datetime=None),
-        )
-
-        nondate_based = Q(start_datetime=None, end_datetime=None)
-
-        ConditionalOffer = get_model('offer', 'ConditionalOffer')
-        qs = ConditionalOffer.objects.filter(
-            date_based | nondate_based,
-            offer_type=ConditionalOffer.SITE,
-            status=ConditionalOffer.OPEN)
-        # Using select_related with the condition/benefit ranges doesn't seem
-        # to work.  I think this is because both the related objects have the
-        # FK to range with the same name.
-        return qs.select_related('condition', 'benefit')
+        return self.site_offer_set.get_offers()
 
     def get_basket_offers(self, basket, user):
         """
@@ -0,0 +1,159 @@
+import pickle
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.timezone import now
+
+from oscar.core.cache import VersionedCache
+from oscar.core.loading import get_model
+
+
+class SiteOfferSet(VersionedCache):
+    """
+    A versioned, pre-compiled copy of the open site offers.
+
+    The offers are loaded together with their conditions and benefits,
+    the ranges they point to and the range membership data
+    (included/excluded product IDs, product class IDs and category IDs).  The
+    result is pickled, so fetching the offers doesn't hit the database until
+    the set gets invalidated.
+    """
+    prefix = 'oscar-site-offers'
+
+    def get_timeout(self):
+        return settings.OSCAR_OFFER_SET_CACHE_TIMEOUT
+
+    def get_offers(self, test_date=None):
+        """
+        Return the site offers that are available at ``test_date``.
+
+        Fresh instances are returned on every call, so callers are free to
+        annotate them (eg with a voucher) without affecting other requests.
+        """
+        if test_date is None:
+            test_date = now()
+        offers = pickle.loads(self.get())
+        return [self.resolve_proxies(offer) for offer in offers
+                if self.is_live(offer, test_date)]
+
+    def is_live(self, offer, test_date):
+        """
+        Mirror the date filtering which used to be done in the database:
+        offers need either no dates at all or a start date in the past and no
+        end date in the past.
+        """
+        if offer.start_datetime is None:
+            return offer.end_datetime is None
+        return (offer.start_datetime <= test_date and (
+            offer.end_datetime is None or offer.end_datetime >= test_date))
+
+    def build(self, name):
+        return pickle.dumps(self.compile(), pickle.HIGHEST_PROTOCOL)
+
+    def compile(self):
+        """
+        Load the open site offers which haven't expired yet, and resolve
+        everything that is needed to apply them.
+        """
+        ConditionalOffer = get_model('offer', 'ConditionalOffer')
+        Range = get_model('offer', 'Range')
+
+        offers = list(ConditionalOffer.objects.filter(
+            Q(end_datetime__gte=now()) | Q(end_datetime=None),
+            offer_type=ConditionalOffer.SITE,
+            status=ConditionalOffer.OPEN).select_related(
+                'condition', 'benefit'))
+
+        range_ids = set()
+        for offer in offers:
+            range_ids.update([offer.condition.range_id, offer.benefit.range_id])
+        range_ids.discard(None)
+        ranges = {}
+        for rng in Range.objects.filter(id__in=range_ids).prefetch_related(
+                'included_categories'):
+            rng.cache_membership()
+            ranges[rng.id] = rng
+
+        for offer in offers:
+            offer.condition.range = ranges.get(offer.condition.range_id)
+            offer.benefit.range = ranges.get(offer.benefit.range_id)
+        return offers
+
+    def resolve_proxies(self, offer):
+        """
+        Replace the condition and benefit of an offer with their proxies.
+
+        Custom proxy classes aren't necessarily registered models, so this
+        can't be done before pickling.  As calling proxy() on a proxy instance
+        returns itself, the proxies are only built once per offer instance.
+        """
+        condition = offer.condition.proxy()
+        condition.range = offer.condition.range
+        benefit = offer.benefit.proxy()
+        benefit.range = offer.benefit.range
+        offer.condition = condition
+        offer.benefit = benefit
+        return offer
+
+
+class RangeProductIndex(VersionedCache):
+    """
+    A materialised index of the products (including child products) that
+    belong to each range.
+
+    The IDs are stored as sorted integer arrays in the shared cache and as
+    a frozenset in each process, so membership tests are O(1).  Ranges are
+    indexed on first use.  Changes to their inclusions, to categories or to
+    products which they might include drop their entry, which is rebuilt
+    on its next use.
+
+    Large indexes are split into several cache items, as caches like
+    memcached don't store items above a size limit (1MB by default).
+    """
+    prefix = 'oscar-range-products'
+
+    #: Number of product IDs stored per cache item
+    chunk_size = 50000
+
+    def get_timeout(self):
+        return settings.OSCAR_RANGE_INDEX_CACHE_TIMEOUT
+
+    def get_product_ids(self, rng):
+        return self.get(rng.id, rng=rng)
+
+    def build(self, name, rng):
+        return array('l', sorted(rng.compute_product_ids()))
+
+    def load(self, payload):
+        return frozenset(payload)
+
+    def chunk_key(self, key, index):
+        return '%s-%d' % (key, index)
+
+    def get_payload(self, name, version):
+        key = self.payload_key(name, version)
+        num_chunks = cache.get(key)
+        if num_chunks is None:
+            return None
+        keys = [self.chunk_key(key, i) for i in range(num_chunks)]
+        chunks = cache.get_many(keys)
+        if len(chunks) < num_chunks:
+            # Some of the chunks have been evicted
+            return None
+        payload = array('l')
+        for chunk_key in keys:
+            payload.extend(chunks[chunk_key])
+        return payload
+
+    def set_payload(self, name, version, payload):
+        key = self.payload_key(name, version)
+        items = {}
+        for i, start in enumerate(range(0, len(payload), self.chunk_size)):
+            items[self.chunk_key(key, i)] = payload[
+                start:start + self.chunk_size]
+        # The number of chunks is stored last, so a reader never finds it
+        # without the chunks
+        cache.set_many(items, self.get_timeout())
+        cache.set(key, len(items), self.get_timeout())
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def count_user_applications(apps, schema_editor):
+    """
+    Fill the counters from the discounts of past orders
+    """
+    OrderDiscount = apps.get_model('order', 'OrderDiscount')
+    UserOfferUsage = apps.get_model('offer', 'UserOfferUsage')
+    counts = OrderDiscount.objects.filter(
+        offer_id__isnull=False, order__user__isnull=False).order_by().values(
+            'offer_id', 'order__user_id').annotate(total=Sum('frequency'))
+    ConditionalOffer = apps.get_model('offer', 'ConditionalOffer')
+    # Discounts of deleted offers are kept
+    offer_ids = set(ConditionalOffer.objects.values_list('pk', flat=True))
+    UserOfferUsage.objects.bulk_create([
+        UserOfferUsage(offer_id=count['offer_id'],
+                       user_id=count['order__user_id'],
+                       num_applications=count['total'])
+        for count in counts
+        if count['offer_id'] in offer_ids and count['total']])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('offer', '0002_auto_20151210_1053'),
+        ('order', '0005_update_email_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserOfferUsage',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('num_applications', models.PositiveIntegerField(default=0, verbose_name='Number of applications')),
+                ('offer', models.ForeignKey(related_name='user_usages', verbose_name='Offer', to='offer.ConditionalOffer')),
+                ('user', models.ForeignKey(related_name='offer_usages', verbose_name='User', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User offer usage',
+                'verbose_name_plural': 'User offer usages',
+                'abstract': False,
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='userofferusage',
+            unique_together=set([('offer', 'user')]),
+        ),
+        migrations.RunPython(count_user_applications,
+                             migrations.RunPython.noop),
+    ]
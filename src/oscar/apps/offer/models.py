@@ -1,6 +1,7 @@
 from oscar.apps.offer.abstract_models import (
     AbstractBenefit, AbstractCondition, AbstractConditionalOffer,
-    AbstractRange, AbstractRangeProduct, AbstractRangeProductFileUpload)
+    AbstractRange, AbstractRangeProduct, AbstractRangeProductFileUpload,
+    AbstractUserOfferUsage)
 from oscar.apps.offer.results import (
     SHIPPING_DISCOUNT, ZERO_DISCOUNT, BasketDiscount, PostOrderAction,
     ShippingDiscount)
@@ -54,6 +55,13 @@ if not is_model_registered('offer', 'RangeProductFileUpload'):
     __all__.append('RangeProductFileUpload')
 
 
+if not is_model_registered('offer', 'UserOfferUsage'):
+    class UserOfferUsage(AbstractUserOfferUsage):
+        pass
+
+    __all__.append('UserOfferUsage')
+
+
 # Import the benefits and the conditions. Required after initializing the
 # parent models to allow overriding them
 
@@ -0,0 +1,132 @@
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from oscar.core.loading import get_class, get_model
+
+SiteOfferSet = get_class('offer.cache', 'SiteOfferSet')
+RangeProductIndex = get_class('offer.cache', 'RangeProductIndex')
+
+ConditionalOffer = get_model('offer', 'ConditionalOffer')
+Condition = get_model('offer', 'Condition')
+Benefit = get_model('offer', 'Benefit')
+Range = get_model('offer', 'Range')
+RangeProduct = get_model('offer', 'RangeProduct')
+Voucher = get_model('voucher', 'Voucher')
+Category = get_model('catalogue', 'Category')
+Product = get_model('catalogue', 'Product')
+ProductCategory = get_model('catalogue', 'ProductCategory')
+
+# Saving a condition or benefit usually happens through one of their proxy
+# classes, so we can't simply connect to the concrete model as sender.
+OFFER_SET_MODELS = (ConditionalOffer, Condition, Benefit, Range, RangeProduct,
+                    Voucher, Category)
+RANGE_RELATIONS = (Range.excluded_products.through, Range.classes.through,
+                   Range.included_categories.through)
+OFFER_SET_RELATIONS = RANGE_RELATIONS + (Voucher.offers.through,)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_site_offers(sender, instance, **kwargs):
+    """
+    Discard the compiled site offers whenever something they are built from
+    changes.
+    """
+    if kwargs.get('raw', False):
+        return
+    if isinstance(instance, OFFER_SET_MODELS):
+        SiteOfferSet.invalidate()
+
+
+@receiver(m2m_changed)
+def invalidate_site_offers_on_relation_change(sender, action, **kwargs):
+    if sender in OFFER_SET_RELATIONS and action.startswith('post_'):
+        SiteOfferSet.invalidate()
+
+
+# Range product index
+
+def indexed_ranges():
+    return Range.objects.filter(includes_all_products=False, proxy_class=None)
+
+
+@receiver(post_save, sender=Range)
+@receiver(post_delete, sender=Range)
+def invalidate_range_index(sender, instance, **kwargs):
+    if not kwargs.get('raw', False):
+        RangeProductIndex.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=RangeProduct)
+@receiver(post_delete, sender=RangeProduct)
+def invalidate_range_index_on_inclusion(sender, instance, **kwargs):
+    if not kwargs.get('raw', False):
+        RangeProductIndex.invalidate(instance.range_id)
+
+
+@receiver(m2m_changed)
+def invalidate_range_index_on_relation_change(
+        sender, instance, action, reverse, pk_set, **kwargs):
+    if sender not in RANGE_RELATIONS or not action.startswith('post_'):
+        return
+    if not reverse:
+        range_ids = [instance.pk]
+    elif pk_set is not None:
+        range_ids = pk_set
+    else:
+        # A product, product class or category has been cleared from all
+        # ranges, which we don't know anymore.
+        range_ids = indexed_ranges().values_list('pk', flat=True)
+    for range_id in range_ids:
+        RangeProductIndex.invalidate(range_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_range_index_on_category_change(sender, instance, **kwargs):
+    """
+    Categories are matched with their descendants, so any change to the tree
+    can affect the ranges which include categories.
+    """
+    if kwargs.get('raw', False):
+        return
+    range_ids = indexed_ranges().filter(
+        included_categories__isnull=False).values_list('pk', flat=True)
+    for range_id in set(range_ids):
+        RangeProductIndex.invalidate(range_id)
+
+
+def invalidate_product_ranges(product):
+    """
+    Drop the indexes of the ranges which a product and its children might
+    join or leave: those which include product classes, and those which
+    include or exclude the product or its parent.
+    """
+    family_ids = [pk for pk in (product.pk, product.parent_id) if pk]
+    range_ids = indexed_ranges().filter(
+        Q(classes__isnull=False) |
+        Q(included_products__in=family_ids) |
+        Q(excluded_products__in=family_ids)).values_list('pk', flat=True)
+    for range_id in set(range_ids):
+        RangeProductIndex.invalidate(range_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_range_index_on_product_change(sender, instance, **kwargs):
+    if kwargs.get('raw', False):
+        return
+    invalidate_product_ranges(instance)
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def invalidate_range_index_on_product_category_change(
+        sender, instance, **kwargs):
+    if kwargs.get('raw', False):
+        return
+    range_ids = indexed_ranges().filter(
+        included_categories__isnull=False).values_list('pk', flat=True)
+    for range_id in set(range_ids):
+        RangeProductIndex.invalidate(range_id)
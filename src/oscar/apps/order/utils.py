@@ -1,7 +1,12 @@
+from collections import defaultdict
 from decimal import Decimal as D
 
 from django.conf import settings
 from django.contrib.sites.models import Site
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.db.models.query import prefetch_related_objects
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 from oscar.core.loading import get_class, get_model
@@ -10,7 +15,15 @@ from . import exceptions
 
 Order = get_model('order', 'Order')
 Line = get_model('order', 'Line')
+LinePrice = get_model('order', 'LinePrice')
+LineAttribute = get_model('order', 'LineAttribute')
 OrderDiscount = get_model('order', 'OrderDiscount')
+StockRecord = get_model('partner', 'StockRecord')
+StockAlert = get_model('partner', 'StockAlert')
+PurchaseInfoCache = get_class('partner.cache', 'PurchaseInfoCache')
+StockAllocator = get_class('partner.allocation', 'StockAllocator')
+invalidate_memoised_purchase_info = get_class(
+    'partner.strategy', 'invalidate_memoised_purchase_info')
 order_placed = get_class('order.signals', 'order_placed')
 
 
@@ -31,8 +44,26 @@ class OrderNumberGenerator(object):
 
 class OrderCreator(object):
     """
-    Places the order by writing out the various models
+    Places the order by writing out the various models.
+
+    With ``bulk_create_lines``, the lines of an order, their prices and
+    attributes are built in memory and written with a few bulk inserts, and
+    stock is allocated with set-based updates, so the number of queries
+    doesn't grow with the number of lines.  In that mode, the ``*_in_bulk``
+    variants of the line hooks are called instead of the per-line ones;
+    ``create_additional_line_models_in_bulk`` still calls
+    ``create_additional_line_models`` for every line by default.
+
+    With ``require_available_stock``, the stock of all lines is allocated
+    with the ``StockAllocator`` before the order is written, and only if
+    enough is available for every line.  Otherwise ``UnableToPlaceOrder``
+    is raised, naming the products which sold out.  The
+    ``update_stock_records*`` hooks aren't called in that mode.  It's off
+    by default, as the checkout takes payment before placing the order,
+    and strategies may allow backorders.
     """
+    bulk_create_lines = False
+    require_available_stock = False
 
     def place_order(self, basket, total,  # noqa (too complex (12))
                     shipping_method, shipping_charge, user=None,
@@ -57,13 +88,23 @@ class OrderCreator(object):
             raise ValueError(_("There is already an order with number %s")
                              % order_number)
 
+        basket_lines = list(basket.all_lines())
+        if self.require_available_stock:
+            self.allocate_available_stock(basket_lines)
+
         # Ok - everything seems to be in order, let's place the order
         order = self.create_order_model(
             user, basket, shipping_address, shipping_method, shipping_charge,
             billing_address, total, order_number, status, **kwargs)
-        for line in basket.all_lines():
-            self.create_line_models(order, line)
-            self.update_stock_records(line)
+        if self.bulk_create_lines:
+            self.create_line_models_in_bulk(order, basket_lines)
+            if not self.require_available_stock:
+                self.update_stock_records_in_bulk(basket_lines)
+        else:
+            for line in basket_lines:
+                self.create_line_models(order, line)
+                if not self.require_available_stock:
+                    self.update_stock_records(line)
 
         # Record any discounts associated with this order
         for application in basket.offer_applications:
@@ -84,6 +125,7 @@ class OrderCreator(object):
                 application['discount'] = shipping_discount
             self.create_discount_model(order, application)
             self.record_discount(application)
+            self.record_user_discount(order, application)
 
         for voucher in basket.vouchers.all():
             self.record_voucher_usage(order, voucher, user)
@@ -131,6 +173,18 @@ class OrderCreator(object):
         You can set extra fields by passing a dictionary as the
         extra_line_fields value
         """
+        line_data = self.get_line_data(order, basket_line, extra_line_fields)
+        order_line = Line._default_manager.create(**line_data)
+        self.create_line_price_models(order, order_line, basket_line)
+        self.create_line_attributes(order, order_line, basket_line)
+        self.create_additional_line_models(order, order_line, basket_line)
+
+        return order_line
+
+    def get_line_data(self, order, basket_line, extra_line_fields=None):
+        """
+        Return the field values of the order line for a basket line
+        """
         product = basket_line.product
         stockrecord = basket_line.stockrecord
         if not stockrecord:
@@ -174,13 +228,30 @@ class OrderCreator(object):
                     settings, 'OSCAR_INITIAL_LINE_STATUS')
         if extra_line_fields:
             line_data.update(extra_line_fields)
+        return line_data
 
-        order_line = Line._default_manager.create(**line_data)
-        self.create_line_price_models(order, order_line, basket_line)
-        self.create_line_attributes(order, order_line, basket_line)
-        self.create_additional_line_models(order, order_line, basket_line)
+    def create_line_models_in_bulk(self, order, basket_lines,
+                                   extra_line_fields=None):
+        """
+        Create the order lines of many basket lines, with their prices,
+        attributes and additional models, and return them
+        """
+        order_lines = [
+            Line(**self.get_line_data(order, basket_line, extra_line_fields))
+            for basket_line in basket_lines]
+        Line._default_manager.bulk_create(order_lines)
+        if order_lines and order_lines[0].pk is None:
+            # Not all databases return the IDs of inserted rows, but the
+            # lines of a new order are exactly the ones just inserted
+            ids = order.lines.order_by('pk').values_list('pk', flat=True)
+            for order_line, pk in zip(order_lines, ids):
+                order_line.pk = pk
 
-        return order_line
+        pairs = list(zip(order_lines, basket_lines))
+        self.create_line_price_models_in_bulk(order, pairs)
+        self.create_line_attributes_in_bulk(order, pairs)
+        self.create_additional_line_models_in_bulk(order, pairs)
+        return order_lines
 
     def update_stock_records(self, line):
         """
@@ -189,6 +260,81 @@ class OrderCreator(object):
         if line.product.get_product_class().track_stock:
             line.stockrecord.allocate(line.quantity)
 
+    def allocate_available_stock(self, basket_lines):
+        """
+        Allocate the stock of all basket lines, or none of it if some lines
+        can't be allocated, and raise ``UnableToPlaceOrder`` then
+        """
+        quantities = defaultdict(int)
+        stockrecords, titles = {}, {}
+        for line in basket_lines:
+            if line.stockrecord and \
+                    line.product.get_product_class().track_stock:
+                quantities[line.stockrecord_id] += line.quantity
+                stockrecords[line.stockrecord_id] = line.stockrecord
+                titles[line.stockrecord_id] = line.product.get_title()
+        if not quantities:
+            return
+
+        stockrecord_ids = sorted(quantities)
+        results = StockAllocator().allocate(
+            [(stockrecords[pk], quantities[pk]) for pk in stockrecord_ids])
+        sold_out = [titles[pk] for pk, allocated
+                    in zip(stockrecord_ids, results) if not allocated]
+        if sold_out:
+            raise exceptions.UnableToPlaceOrder(
+                _("Not enough stock is available for %s")
+                % ", ".join(sold_out))
+
+    def update_stock_records_in_bulk(self, basket_lines):
+        """
+        Allocate the stock of many basket lines, with one UPDATE per
+        distinct quantity.
+
+        Bulk updates don't send model signals, so low-stock alerts are
+        raised and cached purchase info is discarded here.
+        """
+        quantities = defaultdict(int)
+        product_ids = set()
+        for line in basket_lines:
+            if line.product.get_product_class().track_stock:
+                quantities[line.stockrecord_id] += line.quantity
+                product_ids.update([line.product_id, line.product.parent_id])
+        if not quantities:
+            return
+
+        stockrecord_ids = defaultdict(list)
+        for stockrecord_id, quantity in quantities.items():
+            stockrecord_ids[quantity].append(stockrecord_id)
+        now = timezone.now()
+        for quantity, ids in stockrecord_ids.items():
+            StockRecord._default_manager.filter(pk__in=ids).update(
+                num_allocated=Coalesce(F('num_allocated'), 0) + quantity,
+                date_updated=now)
+
+        # Keep the stockrecords of the basket lines up to date
+        stockrecords = StockRecord._default_manager.in_bulk(list(quantities))
+        for line in basket_lines:
+            if line.stockrecord_id in quantities:
+                fresh = stockrecords[line.stockrecord_id]
+                for name in StockRecord.STOCK_FIELDS:
+                    setattr(line.stockrecord, name, getattr(fresh, name))
+
+        # Allocating stock can only take stockrecords below their threshold
+        alerted_ids = set(StockAlert._default_manager.filter(
+            stockrecord_id__in=list(quantities),
+            status=StockAlert.OPEN).values_list('stockrecord_id', flat=True))
+        StockAlert._default_manager.bulk_create([
+            StockAlert(stockrecord=stockrecord,
+                       threshold=stockrecord.low_stock_threshold)
+            for stockrecord in stockrecords.values()
+            if stockrecord.is_below_threshold
+            and stockrecord.pk not in alerted_ids])
+
+        product_ids.discard(None)
+        PurchaseInfoCache.invalidate(product_ids, stock_only=True)
+        invalidate_memoised_purchase_info()
+
     def create_additional_line_models(self, order, order_line, basket_line):
         """
         Empty method designed to be overridden.
@@ -221,6 +367,41 @@ class OrderCreator(object):
                 type=attr.option.code,
                 value=attr.value)
 
+    def create_additional_line_models_in_bulk(self, order, lines):
+        """
+        Create additional models for many lines, given as (order line,
+        basket line) pairs.  Calls ``create_additional_line_models`` for
+        every line, unless overridden.
+        """
+        for order_line, basket_line in lines:
+            self.create_additional_line_models(order, order_line, basket_line)
+
+    def create_line_price_models_in_bulk(self, order, lines):
+        """
+        Creates the line price models of many (order line, basket line)
+        pairs
+        """
+        LinePrice._default_manager.bulk_create([
+            LinePrice(order=order, line=order_line, quantity=quantity,
+                      price_incl_tax=price_incl_tax,
+                      price_excl_tax=price_excl_tax)
+            for order_line, basket_line in lines
+            for price_incl_tax, price_excl_tax, quantity
+            in basket_line.get_price_breakdown()])
+
+    def create_line_attributes_in_bulk(self, order, lines):
+        """
+        Creates the line attributes of many (order line, basket line) pairs
+        """
+        attributes = [(order_line, attr) for order_line, basket_line in lines
+                      for attr in basket_line.attributes.all()]
+        prefetch_related_objects(
+            [attr for __, attr in attributes], ['option'])
+        LineAttribute._default_manager.bulk_create([
+            LineAttribute(line=order_line, option=attr.option,
+                          type=attr.option.code, value=attr.value)
+            for order_line, attr in attributes])
+
     def create_discount_model(self, order, discount):
 
         """
@@ -249,6 +430,13 @@ class OrderCreator(object):
         if 'voucher' in discount and discount['voucher']:
             discount['voucher'].record_discount(discount)
 
+    def record_user_discount(self, order, discount):
+        """
+        Count the offer application against the customer of the order, which
+        per-user offer limits are checked against
+        """
+        discount['offer'].record_user_usage(order, discount['freq'])
+
     def record_voucher_usage(self, order, voucher, user):
         """
         Updates the models that care about this voucher.
@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
@@ -179,6 +182,35 @@ class AbstractStockRecord(models.Model):
 
     # 2-stage stock management model
 
+    #: The fields which change when stock is allocated, consumed or cancelled
+    STOCK_FIELDS = ['num_in_stock', 'num_allocated', 'date_updated']
+
+    def adjust_stock(self, condition=None, **changes):
+        """
+        Apply changes to the stock fields in a single ``UPDATE``, and return
+        whether the stockrecord was updated.
+
+        The changes are expressions on the stored values (like
+        ``num_allocated=F('num_allocated') + 1``), so concurrent adjustments
+        can't overwrite each other.  With a ``condition`` (a ``Q`` object),
+        the stockrecord is only updated if it matches.  The stock fields of
+        the instance are reloaded, and ``post_save`` is sent, as when
+        saving them.
+        """
+        changes['date_updated'] = now()
+        queryset = self.__class__._default_manager.filter(pk=self.pk)
+        if condition is not None:
+            queryset = queryset.filter(condition)
+        if not queryset.update(**changes):
+            return False
+        self.refresh_from_db(fields=self.STOCK_FIELDS)
+        post_save.send(
+            sender=self.__class__, instance=self, created=False,
+            update_fields=frozenset(self.STOCK_FIELDS), raw=False,
+            using=self._state.db)
+        return True
+    adjust_stock.alters_data = True
+
     def allocate(self, quantity):
         """
         Record a stock allocation.
@@ -186,12 +218,26 @@ class AbstractStockRecord(models.Model):
         This normally happens when a product is bought at checkout.  When the
         product is actually shipped, then we 'consume' the allocation.
         """
-        if self.num_allocated is None:
-            self.num_allocated = 0
-        self.num_allocated += quantity
-        self.save()
+        if not self.adjust_stock(
+                num_allocated=Coalesce(F('num_allocated'), 0) + quantity):
+            # There's no row to update, as the stockrecord hasn't been saved
+            # yet (or has been deleted), so save it with the allocation.
+            self.num_allocated = (self.num_allocated or 0) + quantity
+            self.save()
     allocate.alters_data = True
 
+    def allocate_if_available(self, quantity):
+        """
+        Record a stock allocation only if enough stock is available, and
+        return whether it was.  The check and the allocation happen in one
+        statement, so concurrent checkouts can't oversell.
+        """
+        return self.adjust_stock(
+            models.Q(num_in_stock__gte=Coalesce(F('num_allocated'), 0) +
+                     quantity),
+            num_allocated=Coalesce(F('num_allocated'), 0) + quantity)
+    allocate_if_available.alters_data = True
+
     def is_allocation_consumption_possible(self, quantity):
         """
         Test if a proposed stock consumption is permitted
@@ -205,19 +251,27 @@ class AbstractStockRecord(models.Model):
         This is used when an item is shipped.  We remove the original
         allocation and adjust the number in stock accordingly
         """
-        if not self.is_allocation_consumption_possible(quantity):
+        if not self.is_allocation_consumption_possible(quantity) or \
+                not self.adjust_stock(
+                    models.Q(num_allocated__gte=quantity,
+                             num_in_stock__gte=quantity),
+                    num_allocated=F('num_allocated') - quantity,
+                    num_in_stock=F('num_in_stock') - quantity):
             raise InvalidStockAdjustment(
                 _('Invalid stock consumption request'))
-        self.num_allocated -= quantity
-        self.num_in_stock -= quantity
-        self.save()
     consume_allocation.alters_data = True
 
     def cancel_allocation(self, quantity):
         # We ignore requests that request a cancellation of more than the
-        # amount already allocated.
-        self.num_allocated -= min(self.num_allocated, quantity)
-        self.save()
+        # amount already allocated.  (Greatest() isn't available on
+        # Django 1.8.)
+        if not self.adjust_stock(num_allocated=Case(
+                When(num_allocated__gt=quantity,
+                     then=F('num_allocated') - quantity),
+                default=Value(0), output_field=models.IntegerField())):
+            # As in allocate(), there's no row to update
+            self.num_allocated = max((self.num_allocated or 0) - quantity, 0)
+            self.save()
     cancel_allocation.alters_data = True
 
     @property
@@ -0,0 +1,53 @@
+from django.db import transaction
+
+from oscar.core.loading import get_model
+
+StockRecord = get_model('partner', 'StockRecord')
+
+
+class StockAllocator(object):
+    """
+    Allocates stock for several lines at once, as for a multi-line order.
+
+    The stockrecords are locked up front (``SELECT ... FOR UPDATE``, where
+    the database supports it) in the order of their primary keys, so
+    concurrent checkouts queue up behind each other instead of
+    deadlocking.  Each line is then allocated with a conditional
+    ``UPDATE``, which only succeeds if enough stock is available.  The
+    result tells which lines could be allocated, so checkout can fail fast
+    and name the products that sold out.
+    """
+
+    def allocate(self, lines, all_or_nothing=True):
+        """
+        Allocate stock for a list of (stockrecord, quantity) pairs.
+
+        Returns a list of booleans, telling for every line whether enough
+        stock was available.  With ``all_or_nothing``, no stock is allocated
+        unless all lines can be.
+        """
+        results = [False] * len(lines)
+        indexes = sorted(range(len(lines)), key=lambda i: lines[i][0].pk)
+        with transaction.atomic():
+            self.lock([lines[i][0].pk for i in indexes])
+            for i in indexes:
+                stockrecord, quantity = lines[i]
+                results[i] = stockrecord.allocate_if_available(quantity)
+            rollback = all_or_nothing and not all(results)
+            if rollback:
+                transaction.set_rollback(True)
+        if rollback:
+            # The instances were updated with the allocations rolled back
+            for (stockrecord, __), allocated in zip(lines, results):
+                if allocated:
+                    stockrecord.refresh_from_db(
+                        fields=StockRecord.STOCK_FIELDS)
+        return results
+
+    def lock(self, stockrecord_ids):
+        """
+        Lock stockrecords until the end of the transaction
+        """
+        list(StockRecord._default_manager.select_for_update().filter(
+            pk__in=stockrecord_ids).order_by('pk').values_list(
+                'pk', flat=True))
@@ -0,0 +1,142 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class PurchaseInfoCache(object):
+    """
+    Shares ``PurchaseInfo`` instances between requests (and processes) using
+    Django's cache.
+
+    Entries are grouped by a namespace (normally the strategy class and
+    currency) and keyed by product and variant (the stockrecord ID, or
+    ``'children'`` for parent products).  Every product has two version
+    tokens, which are checked against the ones an entry was stored with:
+
+    - The price version changes when a stockrecord of the product (or of one
+      of its children) is edited.  Entries with an older price version are
+      never used.
+    - The stock version changes when stock is allocated, consumed or
+      cancelled.  Entries with an older stock version can still be used
+      within a staleness budget, which is how product listings avoid
+      recomputing availability after every order.
+    """
+    prefix = 'oscar-purchase-info'
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    def get_timeout(self):
+        return settings.OSCAR_PURCHASE_INFO_CACHE_TIMEOUT
+
+    @classmethod
+    def price_version_key(cls, product_id):
+        return '%s-price-%s' % (cls.prefix, product_id)
+
+    @classmethod
+    def stock_version_key(cls, product_id):
+        return '%s-stock-%s' % (cls.prefix, product_id)
+
+    def entry_key(self, product_id, variant):
+        return '%s-%s-%s-%s' % (
+            self.prefix, self.namespace, product_id, variant)
+
+    @classmethod
+    def invalidate(cls, product_ids, stock_only=False):
+        """
+        Discard the entries of some products.  If only their stock levels
+        have changed, entries remain usable within the staleness budget.
+        """
+        keys = [cls.stock_version_key(product_id)
+                for product_id in product_ids]
+        if not stock_only:
+            keys.extend(cls.price_version_key(product_id)
+                        for product_id in product_ids)
+        cache.delete_many(keys)
+
+    def get_many(self, entries, staleness=0):
+        """
+        Look up a list of (product ID, variant) pairs in one go, and return
+        a dict mapping the pairs that were found to their ``PurchaseInfo``.
+
+        ``staleness`` is the age (in seconds) up to which an entry can be
+        used although the stock levels of its product have changed.
+        """
+        keys = []
+        for product_id, variant in entries:
+            keys.extend([self.price_version_key(product_id),
+                         self.stock_version_key(product_id),
+                         self.entry_key(product_id, variant)])
+        found = cache.get_many(keys)
+
+        now = time.time()
+        infos = {}
+        for product_id, variant in entries:
+            payload = found.get(self.entry_key(product_id, variant))
+            if payload is None:
+                continue
+            price_version, stock_version, timestamp, info = payload
+            if price_version != found.get(
+                    self.price_version_key(product_id)):
+                continue
+            if (stock_version != found.get(self.stock_version_key(product_id))
+                    and now - timestamp > staleness):
+                continue
+            infos[(product_id, variant)] = info
+        return infos
+
+    def get(self, product_id, variant, staleness=0):
+        return self.get_many([(product_id, variant)], staleness).get(
+            (product_id, variant))
+
+    def set_many(self, infos):
+        """
+        Store a dict mapping (product ID, variant) pairs to ``PurchaseInfo``
+        instances
+        """
+        product_ids = set(product_id for product_id, __ in infos)
+        keys = [self.price_version_key(product_id)
+                for product_id in product_ids]
+        keys.extend(self.stock_version_key(product_id)
+                    for product_id in product_ids)
+        versions = cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                versions[key] = self.get_version(key)
+
+        now = time.time()
+        data = {}
+        for (product_id, variant), info in infos.items():
+            data[self.entry_key(product_id, variant)] = (
+                versions[self.price_version_key(product_id)],
+                versions[self.stock_version_key(product_id)],
+                now, self.detach(info))
+        cache.set_many(data, self.get_timeout())
+
+    def set(self, product_id, variant, info):
+        self.set_many({(product_id, variant): info})
+
+    def get_version(self, key):
+        version = cache.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(key, version, self.get_timeout()):
+                version = cache.get(key, version)
+        return version
+
+    def detach(self, info):
+        """
+        Replace the stockrecord of a ``PurchaseInfo`` with a copy which
+        doesn't carry the objects cached on it (like its product), to keep
+        the stored entry small.
+        """
+        stockrecord = info.stockrecord
+        if stockrecord is None:
+            return info
+        fields = [field.attname for field in stockrecord._meta.concrete_fields]
+        copy = type(stockrecord).from_db(
+            stockrecord._state.db, fields,
+            [getattr(stockrecord, name) for name in fields])
+        return info._replace(stockrecord=copy)
@@ -1,33 +1,59 @@
+import operator
 import os
+import time
+from collections import OrderedDict
 from decimal import Decimal as D
+from functools import reduce
 
+from django.conf import settings
+from django.db.models import Q
 from django.db.transaction import atomic
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
-from oscar.apps.catalogue.categories import create_from_breadcrumbs
-from oscar.core.compat import UnicodeCSVReader
-from oscar.core.loading import get_class, get_classes
+from oscar.apps.catalogue.categories import create_from_sequence
+from oscar.core.compat import UnicodeCSVReader, on_commit
+from oscar.core.loading import get_class, get_classes, get_model
+from oscar.core.utils import slugify
 
 ImportingError = get_class('partner.exceptions', 'ImportingError')
-Partner, StockRecord = get_classes('partner.models', ['Partner',
-                                                      'StockRecord'])
+Partner, StockRecord, StockAlert = get_classes(
+    'partner.models', ['Partner', 'StockRecord', 'StockAlert'])
 ProductClass, Product, Category, ProductCategory = get_classes(
     'catalogue.models', ('ProductClass', 'Product', 'Category',
                          'ProductCategory'))
+Range = get_model('offer', 'Range')
+CategoryTree = get_class('catalogue.cache', 'CategoryTree')
+RangeProductIndex = get_class('offer.cache', 'RangeProductIndex')
+PurchaseInfoCache = get_class('partner.cache', 'PurchaseInfoCache')
+invalidate_memoised_purchase_info = get_class(
+    'partner.strategy', 'invalidate_memoised_purchase_info')
+update_stock_alerts = get_class('partner.receivers', 'update_stock_alerts')
+alert_queue = get_class('customer.alerts.utils', 'alert_queue')
 
 
 class CatalogueImporter(object):
     """
     CSV product importer used to built sandbox. Might not work very well
     for anything else.
+
+    Rows are read in chunks of ``chunk_size``.  Product classes, categories
+    and partners are resolved through in-memory maps, and the products and
+    stockrecords of a chunk are upserted with a few bulk queries, in one
+    transaction per chunk.  Only rows that differ from the stored data are
+    written.  With ``dry_run``, nothing is written and the importer only
+    reports what would change.
     """
 
     _flush = False
 
-    def __init__(self, logger, delimiter=",", flush=False):
+    def __init__(self, logger, delimiter=",", flush=False, chunk_size=1000,
+                 dry_run=False):
         self.logger = logger
         self._delimiter = delimiter
         self._flush = flush
+        self._chunk_size = chunk_size
+        self._dry_run = dry_run
 
     def handle(self, file_path=None):
         u"""Handles the actual import process"""
@@ -35,9 +61,12 @@ class CatalogueImporter(object):
             raise ImportingError(_("No file path supplied"))
         Validator().validate(file_path)
         if self._flush is True:
-            self.logger.info(" - Flushing product data before import")
-            self._flush_product_data()
-        self._import(file_path)
+            if self._dry_run:
+                self.logger.info(" - Not flushing product data (dry run)")
+            else:
+                self.logger.info(" - Flushing product data before import")
+                self._flush_product_data()
+        return self._import(file_path)
 
     def _flush_product_data(self):
         u"""Flush out product and stock models"""
@@ -46,75 +75,285 @@ class CatalogueImporter(object):
         Partner.objects.all().delete()
         StockRecord.objects.all().delete()
 
-    @atomic
     def _import(self, file_path):
         u"""Imports given file"""
-        stats = {'new_items': 0,
-                 'updated_items': 0}
+        stats = dict.fromkeys(
+            ['new_items', 'updated_items', 'unchanged_items',
+             'new_stockrecords', 'updated_stockrecords'], 0)
+        self._load_maps()
         row_number = 0
+        chunk = []
         with UnicodeCSVReader(
                 file_path, delimiter=self._delimiter,
                 quotechar='"', escapechar='\\') as reader:
             for row in reader:
                 row_number += 1
-                self._import_row(row_number, row, stats)
-        msg = "New items: %d, updated items: %d" % (stats['new_items'],
-                                                    stats['updated_items'])
+                if len(row) != 5 and len(row) != 9:
+                    self.logger.error(
+                        "Row number %d has an invalid number of fields"
+                        " (%d), skipping..." % (row_number, len(row)))
+                    continue
+                chunk.append(row)
+                if len(chunk) >= self._chunk_size:
+                    self._import_chunk(chunk, stats)
+                    chunk = []
+        if chunk:
+            self._import_chunk(chunk, stats)
+        msg = ("New items: %d, updated items: %d, unchanged items: %d, "
+               "new stockrecords: %d, updated stockrecords: %d") % (
+            stats['new_items'], stats['updated_items'],
+            stats['unchanged_items'], stats['new_stockrecords'],
+            stats['updated_stockrecords'])
+        if self._dry_run:
+            msg = "Dry run, nothing was written. " + msg
         self.logger.info(msg)
+        return stats
+
+    # Lookups
+
+    def _load_maps(self):
+        u"""Load product classes, partners and categories into memory"""
+        self._product_classes = dict(
+            (product_class.name, product_class)
+            for product_class in ProductClass.objects.all())
+        self._partners = dict(
+            (partner.name, partner) for partner in Partner.objects.all())
+        # Map tuples of category names (from the root) to categories
+        self._categories = {}
+        names = {}
+        for category in Category.get_tree():
+            parent_path = category.path[:-category.steplen]
+            names[category.path] = names.get(parent_path, ()) + (
+                category.name,)
+            self._categories.setdefault(names[category.path], category)
+
+    def _get_product_class(self, name):
+        if name not in self._product_classes and not self._dry_run:
+            self._product_classes[name] = ProductClass.objects.create(
+                name=name)
+        return self._product_classes.get(name)
+
+    def _get_partner(self, name):
+        if name not in self._partners and not self._dry_run:
+            self._partners[name] = Partner.objects.create(name=name)
+        return self._partners.get(name)
+
+    def _get_category(self, breadcrumbs):
+        names = tuple(name.strip() for name in breadcrumbs.split('>'))
+        if names not in self._categories and not self._dry_run:
+            categories = create_from_sequence(names)
+            for depth, category in enumerate(categories, 1):
+                self._categories.setdefault(names[:depth], category)
+        return self._categories.get(names)
+
+    # Writing
+
+    def _import_chunk(self, rows, stats):
+        started = time.time()
+        # The last row for a UPC wins
+        items = OrderedDict((row[2], row) for row in rows)
+        with atomic():
+            product_ids, reclassified = self._upsert_products(items, stats)
+            categorised = self._categorise_products(items, product_ids)
+            stock_product_ids, restocked_ids = self._upsert_stockrecords(
+                items, product_ids, stats)
+            if not self._dry_run:
+                self._invalidate_caches(
+                    stock_product_ids, reclassified, categorised)
+                self._queue_product_alerts(restocked_ids)
+        elapsed = time.time() - started
+        self.logger.info(
+            " - Imported %d rows in %.2fs (%d rows/s)" % (
+                len(rows), elapsed, len(rows) / max(elapsed, 0.001)))
+
+    def _upsert_products(self, items, stats):
+        u"""
+        Create and update the products of a chunk.  Return a dict mapping
+        their UPCs to their IDs, and whether any product was created or moved
+        to another product class.
+        """
+        existing = dict(
+            (product.upc, product)
+            for product in Product.objects.filter(upc__in=list(items)))
+        new_products, changed = [], []
+        reclassified = False
+        for upc, row in items.items():
+            product_class_name, __, __, title, description = row[:5]
+            # Ignore any entries that are NULL
+            if description == 'NULL':
+                description = ''
+            product_class = self._get_product_class(product_class_name)
+            values = {
+                'title': title,
+                'description': description,
+                'product_class_id': product_class.pk if product_class
+                else None}
+            product = existing.get(upc)
+            if product is None:
+                new_products.append(
+                    Product(upc=upc, slug=slugify(title), **values))
+                stats['new_items'] += 1
+                continue
+            changes = dict(
+                (name, value) for name, value in values.items()
+                if getattr(product, name) != value)
+            if changes:
+                changed.append((product, changes))
+                reclassified |= 'product_class_id' in changes
+                stats['updated_items'] += 1
+            else:
+                stats['unchanged_items'] += 1
+
+        if self._dry_run:
+            return dict(
+                (upc, product.pk) for upc, product in existing.items()), False
+        Product.objects.bulk_create(new_products)
+        now = timezone.now()
+        for product, changes in changed:
+            Product.objects.filter(pk=product.pk).update(
+                date_updated=now, **changes)
+        if not new_products:
+            return dict(
+                (upc, product.pk)
+                for upc, product in existing.items()), reclassified
+        # Not every database returns the IDs of bulk-created rows
+        return dict(Product.objects.filter(
+            upc__in=list(items)).values_list('upc', 'pk')), True
 
-    def _import_row(self, row_number, row, stats):
-        if len(row) != 5 and len(row) != 9:
-            self.logger.error("Row number %d has an invalid number of fields"
-                              " (%d), skipping..." % (row_number, len(row)))
+    def _categorise_products(self, items, product_ids):
+        u"""
+        Add products to the categories they're listed in, and return whether
+        any link was added
+        """
+        existing = set(ProductCategory.objects.filter(
+            product_id__in=product_ids.values()).values_list(
+                'product_id', 'category_id'))
+        new_links = []
+        for upc, row in items.items():
+            category = self._get_category(row[1])
+            if category is None or upc not in product_ids:
+                continue
+            link = (product_ids[upc], category.pk)
+            if link not in existing:
+                existing.add(link)
+                new_links.append(ProductCategory(
+                    product_id=link[0], category_id=link[1]))
+        if not new_links or self._dry_run:
+            return False
+        ProductCategory.objects.bulk_create(new_links)
+        CategoryTree.invalidate('counts')
+        return True
+
+    def _upsert_stockrecords(self, items, product_ids, stats):
+        u"""
+        Create and update the stockrecords of a chunk.  Return the IDs of the
+        products whose stockrecords changed, and of those whose stock levels
+        changed.
+        """
+        rows = [row for row in items.values() if len(row) == 9]
+        existing = dict(
+            ((stockrecord.partner_id, stockrecord.partner_sku), stockrecord)
+            for stockrecord in StockRecord.objects.filter(
+                partner_sku__in=[row[6] for row in rows]))
+        new_stockrecords, changed = [], []
+        for row in rows:
+            upc = row[2]
+            partner_name, partner_sku, price_excl_tax, num_in_stock = row[5:9]
+            partner = self._get_partner(partner_name)
+            values = {
+                'product_id': product_ids.get(upc),
+                'price_excl_tax': D(price_excl_tax),
+                'num_in_stock': int(num_in_stock)}
+            stockrecord = existing.get(
+                (partner.pk if partner else None, partner_sku))
+            if stockrecord is None:
+                stats['new_stockrecords'] += 1
+                if not self._dry_run:
+                    new_stockrecords.append(StockRecord(
+                        partner=partner, partner_sku=partner_sku, **values))
+                continue
+            changes = dict(
+                (name, value) for name, value in values.items()
+                if getattr(stockrecord, name) != value)
+            if changes:
+                changed.append((stockrecord, changes))
+                stats['updated_stockrecords'] += 1
+
+        if self._dry_run:
+            return set(), set()
+        product_ids = set(
+            stockrecord.product_id for stockrecord in new_stockrecords)
+        restocked_ids = set(product_ids)
+        StockRecord.objects.bulk_create(new_stockrecords)
+        self._create_stock_alerts(new_stockrecords)
+        now = timezone.now()
+        for stockrecord, changes in changed:
+            product_ids.add(stockrecord.product_id)
+            StockRecord.objects.filter(pk=stockrecord.pk).update(
+                date_updated=now, **changes)
+            for name, value in changes.items():
+                setattr(stockrecord, name, value)
+            if 'num_in_stock' in changes:
+                restocked_ids.add(stockrecord.product_id)
+                update_stock_alerts(
+                    sender=StockRecord, instance=stockrecord, created=False)
+        return product_ids, restocked_ids
+
+    def _create_stock_alerts(self, new_stockrecords):
+        u"""
+        Open low-stock alerts for the new stockrecords below their threshold
+        """
+        keys = set(
+            (stockrecord.partner_id, stockrecord.partner_sku)
+            for stockrecord in new_stockrecords
+            if stockrecord.is_below_threshold)
+        if not keys:
             return
-        item = self._create_item(*row[:5], stats=stats)
-        if len(row) == 9:
-            # With stock data
-            self._create_stockrecord(item, *row[5:9], stats=stats)
-
-    def _create_item(self, product_class, category_str, upc, title,
-                     description, stats):
-        # Ignore any entries that are NULL
-        if description == 'NULL':
-            description = ''
-
-        # Create item class and item
-        product_class, __ \
-            = ProductClass.objects.get_or_create(name=product_class)
-        try:
-            item = Product.objects.get(upc=upc)
-            stats['updated_items'] += 1
-        except Product.DoesNotExist:
-            item = Product()
-            stats['new_items'] += 1
-        item.upc = upc
-        item.title = title
-        item.description = description
-        item.product_class = product_class
-        item.save()
-
-        # Category
-        cat = create_from_breadcrumbs(category_str)
-        ProductCategory.objects.update_or_create(product=item, category=cat)
-
-        return item
-
-    def _create_stockrecord(self, item, partner_name, partner_sku,
-                            price_excl_tax, num_in_stock, stats):
-        # Create partner and stock record
-        partner, _ = Partner.objects.get_or_create(
-            name=partner_name)
-        try:
-            stock = StockRecord.objects.get(partner_sku=partner_sku)
-        except StockRecord.DoesNotExist:
-            stock = StockRecord()
-
-        stock.product = item
-        stock.partner = partner
-        stock.partner_sku = partner_sku
-        stock.price_excl_tax = D(price_excl_tax)
-        stock.num_in_stock = num_in_stock
-        stock.save()
+        # Not every database returns the IDs of bulk-created rows
+        stockrecords = StockRecord.objects.filter(
+            partner_sku__in=[partner_sku for __, partner_sku in keys])
+        StockAlert.objects.bulk_create([
+            StockAlert(stockrecord=stockrecord,
+                       threshold=stockrecord.low_stock_threshold)
+            for stockrecord in stockrecords
+            if (stockrecord.partner_id, stockrecord.partner_sku) in keys])
+
+    def _queue_product_alerts(self, product_ids):
+        u"""
+        Saving stockrecords queues the customer alerts of their products, but
+        bulk writes don't send the signal, so that's done here.  The worker
+        only looks at the products once the chunk is committed.
+        """
+        if not product_ids or not settings.OSCAR_EAGER_ALERTS:
+            return
+
+        def queue_alerts():
+            for product_id in product_ids:
+                alert_queue.put(product_id)
+        on_commit(queue_alerts)
+
+    def _invalidate_caches(self, stock_product_ids, reclassified,
+                           categorised):
+        u"""
+        Bulk writes don't send model signals, so the caches which listen to
+        them are invalidated here.  Range indexes are only dropped when
+        products may have joined a range through their class or categories.
+        """
+        if stock_product_ids:
+            PurchaseInfoCache.invalidate(stock_product_ids)
+            invalidate_memoised_purchase_info()
+        lookups = []
+        if reclassified:
+            lookups.append(Q(classes__isnull=False))
+        if categorised:
+            lookups.append(Q(included_categories__isnull=False))
+        if not lookups:
+            return
+        range_ids = Range.objects.filter(
+            reduce(operator.or_, lookups), includes_all_products=False,
+            proxy_class=None).values_list('pk', flat=True)
+        for range_id in set(range_ids):
+            RangeProductIndex.invalidate(range_id)
 
 
 class Validator(object):
@@ -1,10 +1,47 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from oscar.core.loading import get_classes
+from oscar.core.loading import get_class, get_classes, get_model
 
 StockRecord, StockAlert = get_classes('partner.models', ['StockRecord',
                                                          'StockAlert'])
+Product = get_model('catalogue', 'Product')
+invalidate_memoised_purchase_info = get_class(
+    'partner.strategy', 'invalidate_memoised_purchase_info')
+PurchaseInfoCache = get_class('partner.cache', 'PurchaseInfoCache')
+
+
+@receiver(post_save, sender=StockRecord)
+def invalidate_purchase_info(sender, instance, **kwargs):
+    """
+    Discard the purchase info memoised by strategies when stock levels or
+    prices change, eg when stock is allocated to an order
+    """
+    invalidate_memoised_purchase_info()
+
+
+@receiver(post_save, sender=StockRecord)
+@receiver(post_delete, sender=StockRecord)
+def invalidate_shared_purchase_info(sender, instance, **kwargs):
+    """
+    Discard the purchase info shared between requests for the product of a
+    stockrecord, and for its parent as parent products are priced from their
+    children.
+    """
+    if kwargs.get('raw', False):
+        return
+    update_fields = kwargs.get('update_fields')
+    stock_only = bool(update_fields) and set(update_fields).issubset(
+        StockRecord.STOCK_FIELDS)
+    product_ids = [instance.product_id]
+    if StockRecord.product.is_cached(instance):
+        parent_id = instance.product.parent_id
+    else:
+        parent_id = Product.objects.filter(
+            pk=instance.product_id).values_list('parent_id', flat=True).first()
+    if parent_id:
+        product_ids.append(parent_id)
+    PurchaseInfoCache.invalidate(product_ids, stock_only=stock_only)
 
 
 @receiver(post_save, sender=StockRecord)
@@ -1,5 +1,10 @@
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
 from decimal import Decimal as D
+
+from django.conf import settings
+from django.db.models.query import prefetch_related_objects
+from django.utils.functional import cached_property
+
 from oscar.core.loading import get_class
 
 Unavailable = get_class('partner.availability', 'Unavailable')
@@ -8,11 +13,32 @@ StockRequiredAvailability = get_class('partner.availability', 'StockRequired')
 UnavailablePrice = get_class('partner.prices', 'Unavailable')
 FixedPrice = get_class('partner.prices', 'FixedPrice')
 TaxInclusiveFixedPrice = get_class('partner.prices', 'TaxInclusiveFixedPrice')
+PurchaseInfoCache = get_class('partner.cache', 'PurchaseInfoCache')
 
 # A container for policies
 PurchaseInfo = namedtuple(
     'PurchaseInfo', ['price', 'availability', 'stockrecord'])
 
+# Bumped whenever a stockrecord changes (eg stock is allocated), which
+# discards the purchase info memoised by the strategies in this process
+_stock_generation = 0
+
+
+def invalidate_memoised_purchase_info():
+    global _stock_generation
+    _stock_generation += 1
+
+
+def _not_prefetched(instances, relation):
+    """
+    Return the instances for which a reverse relation hasn't been prefetched.
+
+    Django doesn't notice when such a relation has been prefetched already,
+    and would load it again.
+    """
+    return [instance for instance in instances if relation not in
+            getattr(instance, '_prefetched_objects_cache', {})]
+
 
 class Selector(object):
     """
@@ -52,13 +78,48 @@ class Base(object):
     - The appropriate stockrecord for this customer
     - A pricing policy instance
     - An availability policy instance
+
+    Strategies normally live for a single request, and memoise the
+    ``PurchaseInfo`` instances they return so that the same product isn't
+    priced over and over again.  The memo holds at most ``memo_size``
+    entries, and is discarded whenever a stockrecord changes.
     """
+    #: The maximum number of ``PurchaseInfo`` instances to memoise
+    memo_size = 1000
 
     def __init__(self, request=None):
         self.request = request
         self.user = None
         if request and request.user.is_authenticated():
             self.user = request.user
+        #: Counters of memo lookups, to measure how much work is saved
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self.clear_memo()
+
+    def clear_memo(self):
+        self._memo = OrderedDict()
+        self._memo_generation = _stock_generation
+
+    def memoise(self, key, fetch):
+        """
+        Return the memoised ``PurchaseInfo`` for ``key``, calling ``fetch``
+        to create it if needed.
+        """
+        if self._memo_generation != _stock_generation:
+            self.clear_memo()
+        try:
+            info = self._memo[key]
+        except KeyError:
+            self.memo_misses += 1
+        else:
+            self.memo_hits += 1
+            return info
+        info = fetch()
+        if len(self._memo) >= self.memo_size:
+            self._memo.popitem(last=False)
+        self._memo[key] = info
+        return info
 
     def fetch_for_product(self, product, stockrecord=None):
         """
@@ -103,6 +164,35 @@ class Base(object):
         # do with them within Oscar - that's up to your project to implement.
         return self.fetch_for_product(line.product)
 
+    def fetch_for_lines(self, lines):
+        """
+        Given a list of basket lines, return a list of ``PurchaseInfo``
+        instances (one per line, in the same order).
+
+        This defaults to calling ``fetch_for_line`` for each line.  Strategies
+        which can look up stock and prices for many lines at once should
+        override it.
+        """
+        return [self.fetch_for_line(line, line.stockrecord) for line in lines]
+
+    def fetch_for_products(self, products):
+        """
+        Given a list of products, return a dict mapping their IDs to
+        ``PurchaseInfo`` instances.
+
+        Parent products get the info returned by ``fetch_for_parent``, other
+        products the info returned by ``fetch_for_product``.  This is meant
+        for pages which list many products, and strategies which can look up
+        stock and prices for many products at once should override it.
+        """
+        infos = {}
+        for product in products:
+            if product.is_parent:
+                infos[product.id] = self.fetch_for_parent(product)
+            else:
+                infos[product.id] = self.fetch_for_product(product)
+        return infos
+
 
 class Structured(Base):
     """
@@ -120,6 +210,13 @@ class Structured(Base):
 
         This method is not intended to be overridden.
         """
+        if product.id is None:
+            return self._fetch_for_product(product, stockrecord)
+        return self.memoise(
+            (product.id, stockrecord.id if stockrecord else None),
+            lambda: self._fetch_for_product(product, stockrecord))
+
+    def _fetch_for_product(self, product, stockrecord):
         if stockrecord is None:
             stockrecord = self.select_stockrecord(product)
         return PurchaseInfo(
@@ -127,7 +224,65 @@ class Structured(Base):
             availability=self.availability_policy(product, stockrecord),
             stockrecord=stockrecord)
 
+    def fetch_for_lines(self, lines):
+        """
+        Return the ``PurchaseInfo`` instances for a list of basket lines.
+
+        The products, product classes and stockrecords of the lines are loaded
+        in bulk first (relations which are already loaded are left alone), so
+        that selecting stockrecords and policies doesn't query per line.
+        """
+        lines = list(lines)
+        self.prefetch_for_lines(lines)
+        return super(Structured, self).fetch_for_lines(lines)
+
+    def prefetch_for_lines(self, lines):
+        """
+        Load the related objects needed to pick stockrecords and policies for
+        basket lines
+        """
+        prefetch_related_objects(lines, ['stockrecord', 'product'])
+        self.prefetch_for_products([line.product for line in lines])
+
+    def fetch_for_products(self, products):
+        """
+        Return a dict mapping product IDs to ``PurchaseInfo`` instances.
+
+        The stockrecords of the products (and of the children of parent
+        products) are loaded in one query, along with product classes and
+        the children themselves.  Relations which are already loaded are left
+        alone.
+        """
+        products = list(products)
+        self.prefetch_for_products(products)
+        return super(Structured, self).fetch_for_products(products)
+
+    def prefetch_for_products(self, products):
+        """
+        Load the related objects needed to pick stockrecords and policies for
+        products
+        """
+        prefetch_related_objects(
+            [product for product in products if product.product_class_id],
+            ['product_class'])
+        prefetch_related_objects(
+            [product for product in products if product.parent_id],
+            ['parent__product_class'])
+        parents = [product for product in products if product.is_parent]
+        prefetch_related_objects(
+            _not_prefetched(parents, 'children'), ['children'])
+        stocked = [product for product in products if not product.is_parent]
+        for parent in parents:
+            stocked.extend(parent.children.all())
+        prefetch_related_objects(
+            _not_prefetched(stocked, 'stockrecords'), ['stockrecords'])
+
     def fetch_for_parent(self, product):
+        return self.memoise(
+            (product.id, 'children'),
+            lambda: self._fetch_for_parent(product))
+
+    def _fetch_for_parent(self, product):
         # Select children and associated stockrecords
         children_stock = self.select_children_stockrecords(product)
         return PurchaseInfo(
@@ -336,6 +491,98 @@ class DeferredTax(object):
             excl_tax=stockrecord.price_excl_tax)
 
 
+class UseSharedCache(object):
+    """
+    Mixin for use with the ``Structured`` base strategy, which shares purchase
+    info between requests using Django's cache.  Only use it for strategies
+    whose prices and availability are the same for every customer (eg for
+    anonymous users), and put it before the other mixins::
+
+        class CachedDefault(UseSharedCache, Default):
+            pass
+
+    Entries are keyed by strategy class, currency and product, and are
+    discarded when a stockrecord of the product changes.  Product listings
+    (``fetch_for_products``) also accept entries whose availability is out of
+    date by up to ``OSCAR_PURCHASE_INFO_STALENESS`` seconds after stock was
+    allocated, consumed or cancelled.
+    """
+
+    @cached_property
+    def purchase_info_cache(self):
+        return PurchaseInfoCache(self.get_purchase_info_cache_namespace())
+
+    def get_currency(self):
+        """
+        Return the currency prices are given in.  Strategies which price
+        products in different currencies (eg depending on the request) need
+        to override this.
+        """
+        return settings.OSCAR_DEFAULT_CURRENCY
+
+    def get_purchase_info_cache_namespace(self):
+        cls = type(self)
+        return '%s.%s-%s' % (cls.__module__, cls.__name__, self.get_currency())
+
+    def fetch_for_products(self, products):
+        products = list(products)
+        cached = self.purchase_info_cache.get_many(
+            [self._cache_entry(product) for product in products],
+            staleness=settings.OSCAR_PURCHASE_INFO_STALENESS)
+
+        infos = {}
+        missing = []
+        for product in products:
+            info = cached.get(self._cache_entry(product))
+            if info is None:
+                missing.append(product)
+            else:
+                info = self._attach(info, product)
+                infos[product.id] = self.memoise(
+                    self._cache_entry(product), lambda: info)
+
+        # No need to look the missing products up again one by one
+        self._known_misses = set(product.id for product in missing)
+        try:
+            infos.update(
+                super(UseSharedCache, self).fetch_for_products(missing))
+        finally:
+            self._known_misses = set()
+        return infos
+
+    def _fetch_for_product(self, product, stockrecord):
+        return self._fetch_shared(
+            product, stockrecord.id if stockrecord else None,
+            lambda: super(UseSharedCache, self)._fetch_for_product(
+                product, stockrecord))
+
+    def _fetch_for_parent(self, product):
+        return self._fetch_shared(
+            product, 'children',
+            lambda: super(UseSharedCache, self)._fetch_for_parent(product))
+
+    def _fetch_shared(self, product, variant, fetch):
+        if product.id is None:
+            return fetch()
+        info = None
+        if product.id not in getattr(self, '_known_misses', ()):
+            info = self.purchase_info_cache.get(product.id, variant)
+        if info is None:
+            info = fetch()
+            self.purchase_info_cache.set(product.id, variant, info)
+            return info
+        return self._attach(info, product)
+
+    def _cache_entry(self, product):
+        return (product.id, 'children' if product.is_parent else None)
+
+    def _attach(self, info, product):
+        # Stockrecords are stored without their product
+        if info.stockrecord is not None:
+            info.stockrecord.product = product
+        return info
+
+
 # Example strategy composed of above mixins.  For real projects, it's likely
 # you'll want to use a different pricing mixin as you'll probably want to
 # charge tax!
@@ -1,9 +1,11 @@
 from decimal import Decimal
 
 from django.core import exceptions
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
+from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as _
 
 from oscar.core.compat import AUTH_USER_MODEL
@@ -20,7 +22,10 @@ class AbstractVoucher(models.Model):
     (c) Once per customer
 
     Oscar enforces those modes by creating VoucherApplication
-    instances when a voucher is used for an order.
+    instances when a voucher is used for an order.  To check them without
+    going through all the applications of a popular voucher, single use
+    vouchers look at ``num_orders`` and once per customer vouchers at the
+    UserVoucherUsage markers of their users.
     """
     name = models.CharField(_("Name"), max_length=128,
                             help_text=_("This will be shown in the checkout"
@@ -46,7 +51,13 @@ class AbstractVoucher(models.Model):
     start_datetime = models.DateTimeField(_('Start datetime'))
     end_datetime = models.DateTimeField(_('End datetime'))
 
-    # Reporting information. Not used to enforce any consumption limits.
+    # Vouchers with generated codes belong to the set they were generated for
+    voucher_set = models.ForeignKey(
+        'voucher.VoucherSet', null=True, blank=True, related_name='vouchers',
+        verbose_name=_("Voucher set"))
+
+    # Reporting information.  Only num_orders is used to enforce a
+    # consumption limit, that of single use vouchers.
     num_basket_additions = models.PositiveIntegerField(
         _("Times added to basket"), default=0)
     num_orders = models.PositiveIntegerField(_("Times on orders"), default=0)
@@ -90,16 +101,31 @@ class AbstractVoucher(models.Model):
         now = timezone.now()
         return self.end_datetime < now
 
+    @cached_property
+    def availability(self):
+        """
+        Map user IDs to the outcome of ``is_available_to_user``, for the
+        users that have been checked through this instance
+        """
+        return {}
+
     def is_available_to_user(self, user=None):
         """
         Test whether this voucher is available to the passed user.
 
         Returns a tuple of a boolean for whether it is successful, and a
-        availability message.
+        availability message.  The outcome is memoised on this instance.
         """
+        user_id = getattr(user, 'pk', None)
+        if user_id not in self.availability:
+            self.availability[user_id] = self.check_availability_to_user(
+                user)
+        return self.availability[user_id]
+
+    def check_availability_to_user(self, user):
         is_available, message = False, ''
         if self.usage == self.SINGLE_USE:
-            is_available = not self.applications.exists()
+            is_available = not self.num_orders
             if not is_available:
                 message = _("This voucher has already been used")
         elif self.usage == self.MULTI_USE:
@@ -110,8 +136,8 @@ class AbstractVoucher(models.Model):
                 message = _(
                     "This voucher is only available to signed in users")
             else:
-                is_available = not self.applications.filter(
-                    voucher=self, user=user).exists()
+                is_available = not self.user_usages.filter(
+                    user_id=user.pk).exists()
                 if not is_available:
                     message = _("You have already used this voucher in "
                                 "a previous order")
@@ -120,23 +146,49 @@ class AbstractVoucher(models.Model):
     def record_usage(self, order, user):
         """
         Records a usage of this voucher in an order.
+
+        The counters are incremented in the database rather than saving the
+        voucher, so concurrent orders don't overwrite each other's usage.
         """
         if user.is_authenticated():
             self.applications.create(voucher=self, order=order, user=user)
+            self.record_user_usage(user)
         else:
             self.applications.create(voucher=self, order=order)
-        self.num_orders += 1
-        self.save()
+        self.increment(num_orders=1)
+        self.availability.clear()
     record_usage.alters_data = True
 
+    def record_user_usage(self, user):
+        """
+        Mark the voucher as used by the user
+        """
+        if self.user_usages.filter(user_id=user.pk).exists():
+            return
+        try:
+            with transaction.atomic():
+                self.user_usages.create(user=user)
+        except IntegrityError:
+            # Another order of this user marked it in the meantime
+            pass
+    record_user_usage.alters_data = True
+
     def record_discount(self, discount):
         """
         Record a discount that this offer has given
         """
-        self.total_discount += discount['discount']
-        self.save()
+        self.increment(total_discount=discount['discount'])
     record_discount.alters_data = True
 
+    def increment(self, **increments):
+        """
+        Add to the counters of this voucher in the database, and reload them
+        """
+        self.__class__._default_manager.filter(pk=self.pk).update(**dict(
+            (name, F(name) + value) for name, value in increments.items()))
+        self.refresh_from_db(fields=list(increments))
+    increment.alters_data = True
+
     @property
     def benefit(self):
         """
@@ -148,6 +200,41 @@ class AbstractVoucher(models.Model):
         return self.offers.all()[0].benefit
 
 
+@python_2_unicode_compatible
+class AbstractVoucherSet(models.Model):
+    """
+    A batch of vouchers with generated codes, which share one offer.
+
+    Campaigns hand out many single use codes, so the vouchers of a set are
+    created in bulk by the VoucherGenerator.  Their codes can be exported
+    from the dashboard.
+    """
+    name = models.CharField(_("Name"), max_length=100, unique=True)
+    count = models.PositiveIntegerField(_("Number of vouchers"))
+    code_length = models.PositiveIntegerField(
+        _("Length of the codes"), default=12)
+    usage = models.CharField(
+        _("Usage"), max_length=128, choices=AbstractVoucher.USAGE_CHOICES,
+        default=AbstractVoucher.SINGLE_USE)
+    start_datetime = models.DateTimeField(_('Start datetime'))
+    end_datetime = models.DateTimeField(_('End datetime'))
+    offer = models.ForeignKey(
+        'offer.ConditionalOffer', related_name='voucher_sets',
+        verbose_name=_("Offer"))
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+        app_label = 'voucher'
+        get_latest_by = 'date_created'
+        ordering = ['-date_created']
+        verbose_name = _("Voucher set")
+        verbose_name_plural = _("Voucher sets")
+
+    def __str__(self):
+        return self.name
+
+
 @python_2_unicode_compatible
 class AbstractVoucherApplication(models.Model):
     """
@@ -177,3 +264,27 @@ class AbstractVoucherApplication(models.Model):
         return _("'%(voucher)s' used by '%(user)s'") % {
             'voucher': self.voucher,
             'user': self.user}
+
+
+class AbstractUserVoucherUsage(models.Model):
+    """
+    Marks a voucher as used by a user.
+
+    There is one marker per voucher and user, however many orders the user
+    has used the voucher for, so once per customer vouchers can be checked
+    with a unique index lookup.  Created in Voucher.record_usage.
+    """
+    voucher = models.ForeignKey(
+        'voucher.Voucher', related_name='user_usages',
+        verbose_name=_("Voucher"))
+    user = models.ForeignKey(
+        AUTH_USER_MODEL, related_name='voucher_usages',
+        verbose_name=_("User"))
+    date_created = models.DateTimeField(_("Date Created"), auto_now_add=True)
+
+    class Meta:
+        abstract = True
+        app_label = 'voucher'
+        unique_together = ('voucher', 'user')
+        verbose_name = _("User voucher usage")
+        verbose_name_plural = _("User voucher usages")
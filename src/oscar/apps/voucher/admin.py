@@ -4,6 +4,7 @@ from oscar.core.loading import get_model
 
 Voucher = get_model('voucher', 'Voucher')
 VoucherApplication = get_model('voucher', 'VoucherApplication')
+VoucherSet = get_model('voucher', 'VoucherSet')
 
 
 class VoucherAdmin(admin.ModelAdmin):
@@ -27,5 +28,11 @@ class VoucherApplicationAdmin(admin.ModelAdmin):
     readonly_fields = ('voucher', 'user', 'order')
 
 
+class VoucherSetAdmin(admin.ModelAdmin):
+    list_display = ('name', 'count', 'usage', 'offer', 'date_created')
+    readonly_fields = ('count', 'code_length')
+
+
 admin.site.register(Voucher, VoucherAdmin)
 admin.site.register(VoucherApplication, VoucherApplicationAdmin)
+admin.site.register(VoucherSet, VoucherSetAdmin)
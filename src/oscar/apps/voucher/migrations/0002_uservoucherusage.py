@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def mark_user_usages(apps, schema_editor):
+    """
+    Create the usage markers, and make sure single use vouchers count their
+    orders, from the applications of the vouchers
+    """
+    Voucher = apps.get_model('voucher', 'Voucher')
+    VoucherApplication = apps.get_model('voucher', 'VoucherApplication')
+    UserVoucherUsage = apps.get_model('voucher', 'UserVoucherUsage')
+    pairs = VoucherApplication.objects.filter(
+        user__isnull=False).order_by().values_list(
+            'voucher_id', 'user_id').distinct()
+    UserVoucherUsage.objects.bulk_create([
+        UserVoucherUsage(voucher_id=voucher_id, user_id=user_id)
+        for voucher_id, user_id in pairs])
+
+    counts = VoucherApplication.objects.filter(
+        voucher__usage='Single use', voucher__num_orders=0).order_by().values(
+            'voucher_id').annotate(total=Count('id'))
+    for count in counts:
+        Voucher.objects.filter(pk=count['voucher_id']).update(
+            num_orders=count['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('voucher', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserVoucherUsage',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Date Created')),
+                ('user', models.ForeignKey(related_name='voucher_usages', verbose_name='User', to=settings.AUTH_USER_MODEL)),
+                ('voucher', models.ForeignKey(related_name='user_usages', verbose_name='Voucher', to='voucher.Voucher')),
+            ],
+            options={
+                'verbose_name': 'User voucher usage',
+                'verbose_name_plural': 'User voucher usages',
+                'abstract': False,
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='uservoucherusage',
+            unique_together=set([('voucher', 'user')]),
+        ),
+        migrations.RunPython(mark_user_usages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offer', '0003_userofferusage'),
+        ('voucher', '0002_uservoucherusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoucherSet',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Name')),
+                ('count', models.PositiveIntegerField(verbose_name='Number of vouchers')),
+                ('code_length', models.PositiveIntegerField(default=12, verbose_name='Length of the codes')),
+                ('usage', models.CharField(choices=[('Single use', 'Can be used once by one customer'), ('Multi-use', 'Can be used multiple times by multiple customers'), ('Once per customer', 'Can only be used once per customer')], default='Single use', max_length=128, verbose_name='Usage')),
+                ('start_datetime', models.DateTimeField(verbose_name='Start datetime')),
+                ('end_datetime', models.DateTimeField(verbose_name='End datetime')),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('offer', models.ForeignKey(related_name='voucher_sets', verbose_name='Offer', to='offer.ConditionalOffer')),
+            ],
+            options={
+                'verbose_name': 'Voucher set',
+                'verbose_name_plural': 'Voucher sets',
+                'ordering': ['-date_created'],
+                'get_latest_by': 'date_created',
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='voucher',
+            name='voucher_set',
+            field=models.ForeignKey(related_name='vouchers', blank=True, null=True, verbose_name='Voucher set', to='voucher.VoucherSet'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from oscar.apps.voucher.abstract_models import (
-    AbstractVoucher, AbstractVoucherApplication)
+    AbstractUserVoucherUsage, AbstractVoucher, AbstractVoucherApplication,
+    AbstractVoucherSet)
 from oscar.core.loading import is_model_registered
 
 __all__ = []
@@ -12,8 +13,22 @@ if not is_model_registered('voucher', 'Voucher'):
     __all__.append('Voucher')
 
 
+if not is_model_registered('voucher', 'VoucherSet'):
+    class VoucherSet(AbstractVoucherSet):
+        pass
+
+    __all__.append('VoucherSet')
+
+
 if not is_model_registered('voucher', 'VoucherApplication'):
     class VoucherApplication(AbstractVoucherApplication):
         pass
 
     __all__.append('VoucherApplication')
+
+
+if not is_model_registered('voucher', 'UserVoucherUsage'):
+    class UserVoucherUsage(AbstractUserVoucherUsage):
+        pass
+
+    __all__.append('UserVoucherUsage')
@@ -0,0 +1,80 @@
+import random
+
+from django.db import IntegrityError, transaction
+
+from oscar.core.loading import get_model
+
+Voucher = get_model('voucher', 'Voucher')
+
+
+class VoucherGenerator(object):
+    """
+    Creates the vouchers of a voucher set in bulk.
+
+    The codes are drawn at random from an alphabet without easily confused
+    characters, so they can't be guessed from one another.  Codes which are
+    already taken are discarded before inserting, and the vouchers and
+    their links to the offer of the set are inserted one chunk at a time
+    with ``bulk_create``.
+    """
+    chars = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+
+    #: Number of vouchers created per query.  It also bounds the size of
+    #: the ``IN`` lookups, which some databases limit.
+    chunk_size = 500
+
+    def __init__(self):
+        self.random = random.SystemRandom()
+
+    def generate(self, voucher_set):
+        """
+        Create the missing vouchers of the set
+        """
+        remaining = voucher_set.count - voucher_set.vouchers.count()
+        while remaining > 0:
+            codes = self.get_unused_codes(
+                min(remaining, self.chunk_size), voucher_set.code_length)
+            try:
+                with transaction.atomic():
+                    self.create_vouchers(voucher_set, codes)
+            except IntegrityError:
+                # Another process took some of the codes in the meantime
+                continue
+            remaining -= len(codes)
+
+    def generate_code(self, length):
+        return ''.join(self.random.choice(self.chars) for __ in range(length))
+
+    def get_unused_codes(self, count, length):
+        """
+        Return a set of random codes which no voucher uses yet
+        """
+        codes = set()
+        while len(codes) < count:
+            candidates = set()
+            while len(codes) + len(candidates) < count:
+                code = self.generate_code(length)
+                if code not in codes:
+                    candidates.add(code)
+            taken = Voucher._default_manager.filter(
+                code__in=candidates).values_list('code', flat=True)
+            codes.update(candidates.difference(taken))
+        return codes
+
+    def create_vouchers(self, voucher_set, codes):
+        # The codes are upper case already, as save() isn't called
+        Voucher._default_manager.bulk_create([
+            Voucher(name=voucher_set.name, code=code, voucher_set=voucher_set,
+                    usage=voucher_set.usage,
+                    start_datetime=voucher_set.start_datetime,
+                    end_datetime=voucher_set.end_datetime)
+            for code in codes])
+        # bulk_create doesn't return the primary keys on all databases
+        voucher_ids = Voucher._default_manager.filter(
+            code__in=codes).values_list('pk', flat=True)
+        field = Voucher.offers.field
+        Link = Voucher.offers.through
+        Link._default_manager.bulk_create([
+            Link(**{field.m2m_column_name(): voucher_id,
+                    field.m2m_reverse_name(): voucher_set.offer_id})
+            for voucher_id in voucher_ids])
@@ -0,0 +1,109 @@
+import uuid
+
+from django.core.cache import cache
+
+from oscar.core.compat import on_commit
+
+
+class VersionedCache(object):
+    """
+    Base class for data which is expensive to build and read on most requests.
+
+    Each entry is stored in Django's cache under a version token, and the
+    token itself lives in the shared cache too.  Every process keeps a copy of
+    the last version it has seen, so in the steady state reading an entry
+    costs a single cache lookup (for the token).  Changing the token makes
+    every process rebuild or reload the entry on its next use.
+    """
+    prefix = None
+
+    def __init__(self):
+        # Maps entry names to (version, data) tuples
+        self._local = {}
+
+    def get_timeout(self):
+        return None
+
+    @classmethod
+    def version_key(cls, name):
+        return '%s-version-%s' % (cls.prefix, name)
+
+    @classmethod
+    def payload_key(cls, name, version):
+        return '%s-%s-%s' % (cls.prefix, name, version)
+
+    @classmethod
+    def invalidate(cls, name=''):
+        """
+        Discard an entry, in every process.
+
+        The entry is discarded right away, so the current transaction sees
+        its own changes, and again once the transaction is committed.
+        Otherwise a concurrent request could rebuild it from the rows as
+        they were before the commit, and the stale entry would be kept
+        until it expires.
+        """
+        key = cls.version_key(name)
+        cache.delete(key)
+        on_commit(lambda: cache.delete(key))
+
+    def get_version(self, name):
+        key = self.version_key(name)
+        version = cache.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            # The token expires with the payload, so that processes don't
+            # hold on to their local copy forever
+            if not cache.add(key, version, self.get_timeout()):
+                version = cache.get(key, version)
+        return version
+
+    def get_versions(self, names):
+        """
+        Return a dict mapping the names of several entries to their versions,
+        looked up with a single cache query when they all have one
+        """
+        keys = dict((self.version_key(name), name) for name in names)
+        versions = dict((keys[key], version)
+                        for key, version in cache.get_many(list(keys)).items())
+        for name in names:
+            if name not in versions:
+                versions[name] = self.get_version(name)
+        return versions
+
+    def get(self, name='', **kwargs):
+        """
+        Return the data of an entry, building it if needed.  Keyword arguments
+        are passed on to ``build``.
+        """
+        version = self.get_version(name)
+        local_version, data = self._local.get(name, (None, None))
+        if local_version == version:
+            return data
+
+        payload = self.get_payload(name, version)
+        if payload is None:
+            payload = self.build(name, **kwargs)
+            self.set_payload(name, version, payload)
+        data = self.load(payload)
+        self._local[name] = (version, data)
+        return data
+
+    def get_payload(self, name, version):
+        return cache.get(self.payload_key(name, version))
+
+    def set_payload(self, name, version, payload):
+        cache.set(self.payload_key(name, version), payload,
+                  self.get_timeout())
+
+    def build(self, name, **kwargs):
+        """
+        Return the payload to store in the shared cache
+        """
+        raise NotImplementedError
+
+    def load(self, payload):
+        """
+        Turn a payload into the data kept in the process
+        """
+        return payload
@@ -4,6 +4,7 @@ import sys
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 from django.utils import six
 
 from oscar.core.loading import get_model
@@ -69,6 +70,17 @@ def existing_user_fields(fields):
     return [field for field in fields if field in user_field_names]
 
 
+def on_commit(func):
+    """
+    Run a function once the current transaction is committed.  Django 1.8
+    doesn't support that, so the function runs right away there.
+    """
+    if hasattr(transaction, 'on_commit'):
+        transaction.on_commit(func)
+    else:
+        func()
+
+
 # Python3 compatibility layer
 
 """
@@ -0,0 +1,229 @@
+import datetime
+import json
+from math import ceil
+
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.paginator import EmptyPage, InvalidPage, Page
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils import six
+from django.utils.functional import cached_property
+from django.utils.translation import ugettext_lazy as _
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    Keeps the microseconds of datetimes, which DjangoJSONEncoder drops, as
+    cursors must match sort keys exactly
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super(CursorEncoder, self).default(o)
+
+
+class CursorSerializer(object):
+
+    def dumps(self, obj):
+        return json.dumps(
+            obj, cls=CursorEncoder, separators=(',', ':')).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+
+class KeysetPage(Page):
+    """
+    A page of a ``KeysetPaginator``.  The "page numbers" of the neighbouring
+    pages are cursor tokens, so templates can build links to them just like
+    for numbered pages.
+    """
+
+    def __init__(self, object_list, number, paginator, has_previous,
+                 has_next):
+        super(KeysetPage, self).__init__(object_list, number, paginator)
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_page_number(self):
+        if not self._has_next:
+            raise EmptyPage(_('That page contains no results'))
+        return self.paginator.get_cursor(
+            self.number + 1, self.object_list[-1], forwards=True)
+
+    def previous_page_number(self):
+        if not self._has_previous:
+            raise EmptyPage(_('That page number is less than 1'))
+        return self.paginator.get_cursor(
+            self.number - 1, self.object_list[0], forwards=False)
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
+
+
+class KeysetPaginator(object):
+    """
+    Paginates a queryset by seeking past the sort keys of the neighbouring
+    page ("keyset" or "seek" pagination), instead of using an ``OFFSET``.
+    The cost of a page doesn't depend on how deep it is, and no ``COUNT``
+    is needed to tell whether there's a next page.
+
+    The queryset must be ordered by non-null fields of its model; the
+    primary key is added as a tie-breaker if none of them are unique.
+    Pages are requested with signed cursor tokens, as handed out by
+    ``KeysetPage.next_page_number`` and ``previous_page_number``.  Plain
+    page numbers still work (using an offset), so existing links don't
+    break.
+
+    Counting is only needed to display the number of pages or results.
+    Pass ``count_limit`` to stop counting at that many rows, in which case
+    ``count`` is a lower bound.  Templates can check ``is_keyset`` to leave
+    the totals out instead.
+    """
+    salt = 'oscar.core.pagination.KeysetPaginator'
+    is_keyset = True
+
+    def __init__(self, object_list, per_page, count_limit=None):
+        self.per_page = int(per_page)
+        self.count_limit = count_limit
+        self.keys = self.get_keys(object_list)
+        self.object_list = object_list.order_by(*[
+            ('-' if descending else '') + field.attname
+            for field, descending in self.keys])
+
+    def get_keys(self, queryset):
+        """
+        Return the sort keys of a queryset, as (field, descending) pairs
+        """
+        opts = queryset.model._meta
+        ordering = queryset.query.order_by
+        if not ordering and queryset.query.default_ordering:
+            ordering = opts.ordering
+        keys = []
+        for item in ordering:
+            if not isinstance(item, six.string_types) or item == '?':
+                raise ImproperlyConfigured(
+                    "Keyset pagination can't order by %r" % (item,))
+            name = item.lstrip('-')
+            if LOOKUP_SEP not in name:
+                field = opts.pk if name == 'pk' else opts.get_field(name)
+            if LOOKUP_SEP in name or field.is_relation:
+                raise ImproperlyConfigured(
+                    "Keyset pagination can only order by fields of %s, not "
+                    "by %r" % (opts.object_name, item))
+            keys.append((field, item.startswith('-')))
+        if not any(field.unique for field, __ in keys):
+            keys.append((opts.pk, keys[0][1] if keys else False))
+        return keys
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        if self.count_limit is not None:
+            queryset = queryset[:self.count_limit]
+        return queryset.count()
+
+    @property
+    def count_is_exact(self):
+        return self.count_limit is None or self.count < self.count_limit
+
+    @cached_property
+    def num_pages(self):
+        return max(1, int(ceil(self.count / float(self.per_page))))
+
+    @property
+    def page_range(self):
+        return six.moves.range(1, self.num_pages + 1)
+
+    # Cursors
+
+    def get_cursor(self, number, obj, forwards):
+        """
+        Return the token for the page before or after an object
+        """
+        values = [getattr(obj, field.attname) for field, __ in self.keys]
+        return signing.dumps([number, forwards, values], salt=self.salt,
+                             serializer=CursorSerializer, compress=True)
+
+    def load_cursor(self, token):
+        try:
+            number, forwards, values = signing.loads(
+                token, salt=self.salt, serializer=CursorSerializer)
+            if len(values) != len(self.keys):
+                raise ValueError
+            values = [field.to_python(value)
+                      for (field, __), value in zip(self.keys, values)]
+        except (signing.BadSignature, ValidationError, TypeError, ValueError):
+            raise InvalidPage(_('The given page is invalid.'))
+        return number, forwards, values
+
+    def seek(self, values, forwards):
+        """
+        Return the condition for the rows after (or before) the given keys
+        """
+        condition = Q()
+        for i, (field, descending) in enumerate(self.keys):
+            lookup = 'lt' if descending == forwards else 'gt'
+            step = Q(**{'%s__%s' % (field.attname, lookup): values[i]})
+            for (previous, __), value in zip(self.keys[:i], values):
+                step &= Q(**{previous.attname: value})
+            condition |= step
+        return condition
+
+    # Pages
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise InvalidPage(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        """
+        Return a page, given a cursor token or a page number
+        """
+        if isinstance(number, six.string_types) and not number.isdigit():
+            return self.seek_page(*self.load_cursor(number))
+
+        number = self.validate_number(number)
+        offset = (number - 1) * self.per_page
+        rows = list(self.object_list[offset:offset + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        return KeysetPage(rows[:self.per_page], number, self,
+                          has_previous=number > 1,
+                          has_next=len(rows) > self.per_page)
+
+    def seek_page(self, number, forwards, values):
+        queryset = self.object_list.filter(self.seek(values, forwards))
+        if not forwards:
+            queryset = queryset.reverse()
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not rows:
+            raise EmptyPage(_('That page contains no results'))
+        if forwards:
+            return KeysetPage(rows, number, self,
+                              has_previous=True, has_next=has_more)
+        rows.reverse()
+        # Seeking backwards finds out whether this is the first page
+        return KeysetPage(rows, number if has_more else 1, self,
+                          has_previous=has_more, has_next=True)
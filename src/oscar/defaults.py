@@ -12,6 +12,7 @@ OSCAR_BASKET_COOKIE_LIFETIME = 7 * 24 * 60 * 60
 OSCAR_BASKET_COOKIE_OPEN = 'oscar_open_basket'
 OSCAR_BASKET_COOKIE_SECURE = False
 OSCAR_MAX_BASKET_QUANTITY_THRESHOLD = 10000
+OSCAR_BASKET_SUMMARY_CACHE_TIMEOUT = 5 * 60
 
 # Recently-viewed products
 OSCAR_RECENTLY_VIEWED_COOKIE_LIFETIME = 7 * 24 * 60 * 60
@@ -22,6 +23,11 @@ OSCAR_RECENTLY_VIEWED_PRODUCTS = 20
 # Currency
 OSCAR_DEFAULT_CURRENCY = 'GBP'
 
+# Purchase info shared between requests by strategies using the UseSharedCache
+# mixin
+OSCAR_PURCHASE_INFO_CACHE_TIMEOUT = 60 * 60
+OSCAR_PURCHASE_INFO_STALENESS = 0
+
 # Paths
 OSCAR_IMAGE_FOLDER = 'images/products/%Y/%m/'
 OSCAR_PROMOTION_FOLDER = 'images/promotions/'
@@ -51,6 +57,18 @@ OSCAR_DASHBOARD_ITEMS_PER_PAGE = 20
 # Checkout
 OSCAR_ALLOW_ANON_CHECKOUT = False
 
+# Catalogue
+OSCAR_CATEGORY_TREE_CACHE_TIMEOUT = 24 * 60 * 60
+OSCAR_ATTRIBUTE_SCHEMA_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Offers
+OSCAR_OFFER_SET_CACHE_TIMEOUT = 60 * 60
+OSCAR_RANGE_INDEX_CACHE_TIMEOUT = 24 * 60 * 60
+OSCAR_OFFER_APPLICATION_CACHE_TIMEOUT = None
+
+# Voucher sets are generated within the request which creates them
+OSCAR_VOUCHER_SET_MAX_COUNT = 10000
+
 # Promotions
 COUNTDOWN, LIST, SINGLE_PRODUCT, TABBED_BLOCK = (
     'Countdown', 'List', 'SingleProduct', 'TabbedBlock')
@@ -68,6 +86,12 @@ OSCAR_PROMOTION_POSITIONS = (('page', 'Page'),
 OSCAR_ALLOW_ANON_REVIEWS = True
 OSCAR_MODERATE_REVIEWS = False
 
+# Analytics events are buffered per process and written in bulk, at most
+# this many seconds apart or once this many events are buffered.  Both bound
+# the number of events which are lost if a process dies.
+OSCAR_ANALYTICS_FLUSH_INTERVAL = 10
+OSCAR_ANALYTICS_MAX_BUFFERED_EVENTS = 1000
+
 # Accounts
 OSCAR_ACCOUNTS_REDIRECT_URL = 'customer:profile-view'
 
@@ -79,6 +103,9 @@ OSCAR_ACCOUNTS_REDIRECT_URL = 'customer:profile-view'
 # disabled.
 OSCAR_EAGER_ALERTS = True
 
+# The number of product alert emails which are sent in one go
+OSCAR_ALERT_EMAIL_BATCH_SIZE = 100
+
 # Registration
 OSCAR_SEND_REGISTRATION_EMAIL = True
 OSCAR_FROM_EMAIL = 'oscar@example.com'
@@ -180,6 +207,10 @@ OSCAR_DASHBOARD_NAVIGATION = [
                 'label': _('Vouchers'),
                 'url_name': 'dashboard:voucher-list',
             },
+            {
+                'label': _('Voucher sets'),
+                'url_name': 'dashboard:voucher-set-list',
+            },
         ],
     },
     {
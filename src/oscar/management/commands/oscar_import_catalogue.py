@@ -19,7 +19,12 @@ class Command(BaseCommand):
         make_option('--flush', action='store_true', dest='flush',
                     default=False, help='Flush tables before importing'),
         make_option('--delimiter', dest='delimiter', default=",",
-                    help='Delimiter used within CSV file(s)'))
+                    help='Delimiter used within CSV file(s)'),
+        make_option('--chunk-size', dest='chunk_size', type='int',
+                    default=1000, help='Number of rows imported at once'),
+        make_option('--dry-run', action='store_true', dest='dry_run',
+                    default=False,
+                    help='Report the changes without writing them'))
 
     def handle(self, *args, **options):
         if not args:
@@ -28,7 +33,8 @@ class Command(BaseCommand):
         logger.info("Starting catalogue import")
         importer = CatalogueImporter(
             logger, delimiter=options.get('delimiter'),
-            flush=options.get('flush'))
+            flush=options.get('flush'), chunk_size=options.get('chunk_size'),
+            dry_run=options.get('dry_run'))
         for file_path in args:
             logger.info(" - Importing records from '%s'" % file_path)
             try:
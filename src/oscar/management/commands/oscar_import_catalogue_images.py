@@ -19,6 +19,11 @@ class Command(BaseCommand):
                     dest='filename',
                     default='upc',
                     help='Product field to lookup from image filename'),
+        make_option('--processes', dest='processes', type='int', default=1,
+                    help='Number of processes verifying the images'),
+        make_option('--batch-size', dest='batch_size', type='int',
+                    default=500,
+                    help='Number of images saved per transaction'),
     )
 
     def handle(self, *args, **options):
@@ -27,5 +32,7 @@ class Command(BaseCommand):
 
         logger.info("Starting image import")
         dirname = args[0]
-        importer = Importer(logger, field=options.get('filename'))
+        importer = Importer(logger, field=options.get('filename'),
+                            processes=options.get('processes'),
+                            batch_size=options.get('batch_size'))
         importer.handle(dirname)
@@ -3,6 +3,19 @@ from django import template
 register = template.Library()
 
 
+@register.simple_tag
+def prefetch_purchase_info(request, products):
+    """
+    Fetch the purchase info for a list of products in bulk.  The strategy
+    memoises it, so rendering each of them with ``purchase_info_for_product``
+    doesn't need to query the database.  Search results are accepted too.
+    """
+    products = [getattr(product, 'object', product) for product in products]
+    request.strategy.fetch_for_products(
+        [product for product in products if product is not None])
+    return ''
+
+
 @register.assignment_tag
 def purchase_info_for_product(request, product):
     if product.is_parent:
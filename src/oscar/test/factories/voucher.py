@@ -5,7 +5,7 @@ from django.utils.timezone import now
 
 from oscar.core.loading import get_model
 
-__all__ = ['VoucherFactory']
+__all__ = ['VoucherFactory', 'VoucherSetFactory']
 
 
 class VoucherFactory(factory.DjangoModelFactory):
@@ -17,3 +17,15 @@ class VoucherFactory(factory.DjangoModelFactory):
 
     class Meta:
         model = get_model('voucher', 'Voucher')
+
+
+class VoucherSetFactory(factory.DjangoModelFactory):
+    name = factory.Sequence(lambda n: 'Voucher set %d' % n)
+    count = 10
+    code_length = 12
+
+    start_datetime = now() - datetime.timedelta(days=1)
+    end_datetime = now() + datetime.timedelta(days=10)
+
+    class Meta:
+        model = get_model('voucher', 'VoucherSet')
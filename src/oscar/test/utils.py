@@ -3,12 +3,14 @@ from django.contrib.messages.storage.fallback import FallbackStorage
 from django.contrib.sessions.backends.db import SessionStore
 from django.core.signing import Signer
 from django.test import RequestFactory as BaseRequestFactory
+from django.utils.functional import SimpleLazyObject
 
 from oscar.core.loading import get_class, get_model
 
 
 class RequestFactory(BaseRequestFactory):
     Basket = get_model('basket', 'basket')
+    BasketSummary = get_class('basket.summary', 'BasketSummary')
     selector = get_class('partner.strategy', 'Selector')()
 
     def request(self, user=None, basket=None, **request):
@@ -23,6 +25,8 @@ class RequestFactory(BaseRequestFactory):
         request.basket = basket or self.Basket()
         request.basket.strategy = request.strategy
         request.basket_hash = Signer().sign(basket.pk) if basket else None
+        request.basket_summary = SimpleLazyObject(
+            lambda: self.BasketSummary.from_basket(request.basket))
         request.cookies_to_delete = []
 
         return request
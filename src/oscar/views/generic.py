@@ -5,7 +5,8 @@ from django import forms
 from django.contrib import messages
 from django.core import validators
 from django.core.exceptions import ValidationError
-from django.http import HttpResponse
+from django.core.paginator import InvalidPage
+from django.http import Http404, HttpResponse
 from django.shortcuts import redirect
 from django.utils import six
 from django.utils.encoding import smart_str
@@ -13,6 +14,7 @@ from django.utils.six.moves import map
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic.base import View
 
+from oscar.core.pagination import KeysetPaginator
 from oscar.core.phonenumber import PhoneNumber
 from oscar.core.utils import safe_referrer
 
@@ -39,6 +41,42 @@ class PostActionMixin(object):
         return super(PostActionMixin, self).post(request, *args, **kwargs)
 
 
+class KeysetPaginationMixin(object):
+    """
+    Mixin for list views (and anything else using Django's
+    MultipleObjectMixin) to paginate with a ``KeysetPaginator``, so that
+    deep pages are as cheap as the first one.  It's opt-in: set
+    ``keyset_pagination`` to ``True``.
+
+    The page parameter then carries cursor tokens.  Set
+    ``keyset_count_limit`` to only count the results up to that number.
+    """
+    keyset_pagination = False
+    keyset_count_limit = None
+
+    def get_paginator(self, queryset, per_page, *args, **kwargs):
+        if not self.keyset_pagination:
+            return super(KeysetPaginationMixin, self).get_paginator(
+                queryset, per_page, *args, **kwargs)
+        return KeysetPaginator(
+            queryset, per_page, count_limit=self.keyset_count_limit)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.keyset_pagination:
+            return super(KeysetPaginationMixin, self).paginate_queryset(
+                queryset, page_size)
+        paginator = self.get_paginator(queryset, page_size)
+        page_kwarg = self.page_kwarg
+        page = (self.kwargs.get(page_kwarg)
+                or self.request.GET.get(page_kwarg) or 1)
+        try:
+            page = paginator.page(page)
+        except InvalidPage as e:
+            raise Http404(_('Invalid page (%(page)s): %(message)s') % {
+                'page': page, 'message': six.text_type(e)})
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+
 class BulkEditMixin(object):
     """
     Mixin for views that have a bulk editing facility.  This is normally in the
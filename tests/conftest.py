@@ -2,6 +2,8 @@ import os
 import warnings
 
 import django
+import pytest
+from django.core.cache import cache
 
 
 def pytest_addoption(parser):
@@ -31,3 +33,20 @@ def pytest_configure(config):
         os.environ['DATABASE_NAME'] = 'oscar'
 
     django.setup()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Cached data (eg the compiled site offers) must not leak between tests
+    # as the database gets rolled back.
+    cache.clear()
+
+
+@pytest.yield_fixture(autouse=True)
+def reset_analytics_buffer():
+    # Buffered analytics events must not be carried into the next test, nor
+    # be written when the test run exits
+    from oscar.apps.analytics.receivers import event_buffer
+    event_buffer.reset()
+    yield
+    event_buffer.reset()
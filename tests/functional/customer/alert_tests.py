@@ -1,7 +1,9 @@
+import mock
 from django_webtest import WebTest
 from django.core.urlresolvers import reverse
 from django.core import mail
 
+from oscar.apps.customer.alerts.utils import AlertQueue
 from oscar.apps.customer.models import ProductAlert
 from oscar.test.factories import create_product, create_stockrecord
 from oscar.test.factories import UserFactory
@@ -34,6 +36,13 @@ class TestAUserWithAnActiveStockAlert(WebTest):
         form = product_page.forms['alert_form']
         form.submit()
 
+    def save_stockrecord(self):
+        # Commit right away, and send the queued alerts in this thread
+        with mock.patch('django.db.transaction.on_commit',
+                        lambda func: func(), create=True), \
+                mock.patch.object(AlertQueue, 'start', AlertQueue.process):
+            self.stockrecord.save()
+
     def test_can_cancel_it(self):
         alerts = ProductAlert.objects.filter(user=self.user)
         self.assertEqual(1, len(alerts))
@@ -51,17 +60,17 @@ class TestAUserWithAnActiveStockAlert(WebTest):
 
     def test_gets_notified_when_it_is_back_in_stock(self):
         self.stockrecord.num_in_stock = 10
-        self.stockrecord.save()
+        self.save_stockrecord()
         self.assertEqual(1, self.user.notifications.all().count())
 
     def test_gets_emailed_when_it_is_back_in_stock(self):
         self.stockrecord.num_in_stock = 10
-        self.stockrecord.save()
+        self.save_stockrecord()
         self.assertEqual(1, len(mail.outbox))
 
     def test_does_not_get_emailed_when_it_is_saved_but_still_zero_stock(self):
         self.stockrecord.num_in_stock = 0
-        self.stockrecord.save()
+        self.save_stockrecord()
         self.assertEqual(0, len(mail.outbox))
 
 
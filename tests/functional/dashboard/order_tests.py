@@ -1,7 +1,9 @@
+import mock
 from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.utils.six.moves import http_client
 
+from oscar.apps.dashboard.orders.views import OrderListView
 from oscar.core.loading import get_model
 from oscar.apps.order.models import (
     Order, OrderNote, PaymentEvent, PaymentEventType)
@@ -41,6 +43,24 @@ class TestOrderListDashboard(WebTestCase):
         form['order_number'] = '+'
         form.submit()
 
+    @mock.patch.object(OrderListView, 'paginate_by', 2)
+    @mock.patch.object(OrderListView, 'keyset_pagination', True)
+    def test_pages_through_orders_with_keyset_pagination(self):
+        orders = [create_order() for __ in range(3)]
+        page = self.get(reverse('dashboard:order-list'))
+        self.assertEqual(orders[:0:-1], list(page.context['orders']))
+        self.assertContains(page, 'Page 1')
+        self.assertNotContains(page, 'Page 1 of')
+        # The results aren't counted
+        paginator = page.context['paginator']
+        self.assertNotIn('count', paginator.__dict__)
+        self.assertNotIn('num_pages', paginator.__dict__)
+
+        page = page.click(description='next')
+        self.assertEqual([orders[0]], list(page.context['orders']))
+        page = page.click(description='previous')
+        self.assertEqual(orders[:0:-1], list(page.context['orders']))
+
 
 class PermissionBasedDashboardOrderTestsBase(WebTestCase):
     permissions = ['partner.dashboard_access', ]
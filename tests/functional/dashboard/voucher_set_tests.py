@@ -0,0 +1,48 @@
+from decimal import Decimal as D
+
+from django.core.urlresolvers import reverse
+
+from oscar.apps.offer.models import Range
+from oscar.apps.voucher.models import VoucherSet
+from oscar.apps.voucher.utils import VoucherGenerator
+from oscar.test import testcases
+from oscar.test.factories import VoucherSetFactory, create_offer
+
+
+class TestVoucherSetDashboard(testcases.WebTestCase):
+    is_staff = True
+
+    def test_can_create_a_voucher_set(self):
+        rng = Range.objects.create(
+            name="All products", includes_all_products=True)
+        list_page = self.get(reverse('dashboard:voucher-set-list'))
+        form = list_page.click('Create new voucher set').form
+        form['name'] = "Spring campaign"
+        form['count'] = 20
+        form['start_datetime'] = '2016-01-01 00:00'
+        form['end_datetime'] = '2016-02-01 00:00'
+        form['benefit_range'] = rng.id
+        form['benefit_type'] = "Percentage"
+        form['benefit_value'] = D('10')
+        detail_page = form.submit().follow()
+
+        voucher_set = VoucherSet.objects.get()
+        self.assertEqual(20, voucher_set.vouchers.count())
+        self.assertEqual(
+            20, voucher_set.offer.vouchers.filter(usage='Single use').count())
+        self.assertContains(detail_page, "Spring campaign")
+
+    def test_can_download_the_codes_of_a_voucher_set(self):
+        voucher_set = VoucherSetFactory(
+            name="Spring campaign", offer=create_offer(offer_type='Voucher'))
+        VoucherGenerator().generate(voucher_set)
+        response = self.get(reverse('dashboard:voucher-set-download',
+                                    kwargs={'pk': voucher_set.pk}))
+        self.assertEqual('text/csv', response.content_type)
+        self.assertIn('spring-campaign.csv',
+                      response.headers['Content-Disposition'])
+        rows = response.text.splitlines()
+        self.assertEqual('Code', rows[0])
+        self.assertEqual(
+            sorted(voucher_set.vouchers.values_list('code', flat=True)),
+            sorted(rows[1:]))
@@ -0,0 +1,112 @@
+import mock
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from oscar.apps.analytics.buffer import EventBuffer, _create_records
+from oscar.apps.analytics.models import (
+    ProductRecord, UserProductView, UserRecord, UserSearch)
+from oscar.test import factories
+
+
+@override_settings(OSCAR_ANALYTICS_FLUSH_INTERVAL=60,
+                   OSCAR_ANALYTICS_MAX_BUFFERED_EVENTS=100)
+class TestEventBuffer(TestCase):
+
+    def setUp(self):
+        self.buffer = EventBuffer()
+        self.product = factories.create_product()
+        self.user = factories.UserFactory()
+
+    def test_holds_events_until_flushed(self):
+        self.buffer.record_product_view(self.product, self.user)
+        self.assertFalse(ProductRecord.objects.exists())
+        self.assertEqual(1, self.buffer.get_metrics()['buffered_events'])
+
+        self.buffer.flush()
+        self.assertEqual(1, ProductRecord.objects.get().num_views)
+        self.assertEqual(1, UserRecord.objects.get().num_product_views)
+        self.assertEqual(1, UserProductView.objects.count())
+        metrics = self.buffer.get_metrics()
+        self.assertEqual(0, metrics['buffered_events'])
+        self.assertEqual(1, metrics['flushed_events'])
+
+    def test_sums_up_increments(self):
+        other = factories.create_product()
+        ProductRecord.objects.create(product=self.product, num_views=2)
+        for __ in range(3):
+            self.buffer.record_product_view(self.product)
+            self.buffer.record_product_view(other)
+        self.buffer.record_basket_addition(other, self.user)
+        with self.assertNumQueries(13):
+            self.buffer.flush()
+
+        self.assertEqual(5, ProductRecord.objects.get(
+            product=self.product).num_views)
+        record = ProductRecord.objects.get(product=other)
+        self.assertEqual(3, record.num_views)
+        self.assertEqual(1, record.num_basket_additions)
+        self.assertEqual(1, UserRecord.objects.get().num_basket_additions)
+
+    def test_drops_the_events_of_deleted_products_and_users(self):
+        product, user = factories.create_product(), factories.UserFactory()
+        self.buffer.record_product_view(product, user)
+        self.buffer.record_product_view(self.product, self.user)
+        self.buffer.record_search(user, 'books')
+        product.delete()
+        user.delete()
+        self.buffer.flush()
+
+        self.assertEqual(1, ProductRecord.objects.get(
+            product=self.product).num_views)
+        self.assertEqual(1, ProductRecord.objects.count())
+        self.assertEqual(1, UserRecord.objects.count())
+        self.assertEqual(1, UserProductView.objects.count())
+        self.assertFalse(UserSearch.objects.exists())
+        self.assertEqual(0, self.buffer.get_metrics()['lost_events'])
+
+    def test_records_searches(self):
+        self.buffer.record_search(self.user, 'books')
+        self.buffer.flush()
+        self.assertEqual('books', UserSearch.objects.get().query)
+
+    @override_settings(OSCAR_ANALYTICS_MAX_BUFFERED_EVENTS=2)
+    @mock.patch('django.db.transaction.on_commit', lambda func: func(),
+                create=True)
+    def test_flushes_once_full(self):
+        self.buffer.record_product_view(self.product)
+        self.buffer.record_product_view(self.product)
+        self.assertEqual(2, ProductRecord.objects.get().num_views)
+
+    @override_settings(OSCAR_ANALYTICS_FLUSH_INTERVAL=0)
+    @mock.patch('django.db.transaction.on_commit', lambda func: func(),
+                create=True)
+    def test_can_write_every_event(self):
+        self.buffer.record_basket_addition(self.product)
+        self.assertEqual(
+            1, ProductRecord.objects.get().num_basket_additions)
+
+    @override_settings(OSCAR_ANALYTICS_FLUSH_INTERVAL=0)
+    def test_flushes_after_the_transaction_is_committed(self):
+        callbacks = []
+        with mock.patch('django.db.transaction.on_commit', callbacks.append,
+                        create=True):
+            self.buffer.record_product_view(self.product)
+        self.assertFalse(ProductRecord.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(1, ProductRecord.objects.get().num_views)
+
+
+class TestCreatingRecords(TestCase):
+
+    def test_falls_back_to_updating_records_created_meanwhile(self):
+        # As if another process created the first record after the
+        # existing records were looked up
+        taken, new = factories.create_product(), factories.create_product()
+        ProductRecord.objects.create(product=taken, num_views=2)
+        increments = {taken.id: {'num_views': 1}, new.id: {'num_views': 3}}
+        _create_records(ProductRecord, 'product_id', [taken.id, new.id],
+                        increments, {})
+
+        self.assertEqual(3, ProductRecord.objects.get(product=taken).num_views)
+        self.assertEqual(3, ProductRecord.objects.get(product=new).num_views)
@@ -0,0 +1,55 @@
+from decimal import Decimal as D
+from unittest import skipIf
+
+import mock
+from django import VERSION as DJANGO_VERSION
+from django.test import TestCase
+
+from oscar.apps.analytics.models import ProductRecord, UserRecord
+from oscar.test import factories
+from oscar.test.basket import add_product
+
+
+class TestRecordingAnOrder(TestCase):
+
+    def setUp(self):
+        self.user = factories.UserFactory()
+        self.basket = factories.create_basket(empty=True)
+        self.products = [factories.create_product(price=D('5.00'))
+                         for __ in range(2)]
+        add_product(self.basket, product=self.products[0], quantity=3)
+        add_product(self.basket, product=self.products[1])
+
+    def place_order(self):
+        with mock.patch('django.db.transaction.on_commit',
+                        lambda func: func(), create=True):
+            return factories.create_order(basket=self.basket, user=self.user)
+
+    @skipIf(DJANGO_VERSION < (1, 9),
+            "on_commit() is not supported by Django<1.9")
+    def test_waits_for_the_transaction_to_be_committed(self):
+        factories.create_order(basket=self.basket, user=self.user)
+        self.assertFalse(ProductRecord.objects.exists())
+
+    def test_counts_purchases_of_each_product(self):
+        ProductRecord.objects.create(product=self.products[0],
+                                     num_purchases=2)
+        self.place_order()
+        self.assertEqual(5, ProductRecord.objects.get(
+            product=self.products[0]).num_purchases)
+        self.assertEqual(1, ProductRecord.objects.get(
+            product=self.products[1]).num_purchases)
+
+    def test_updates_the_record_of_the_user(self):
+        orders = [self.place_order()]
+        self.basket = factories.create_basket()
+        orders.append(self.place_order())
+
+        record = UserRecord.objects.get(user=self.user)
+        self.assertEqual(2, record.num_orders)
+        self.assertEqual(3, record.num_order_lines)
+        self.assertEqual(5, record.num_order_items)
+        self.assertEqual(
+            sum(order.total_incl_tax for order in orders),
+            record.total_spent)
+        self.assertEqual(orders[1].date_placed, record.date_last_order)
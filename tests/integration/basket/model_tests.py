@@ -175,3 +175,34 @@ class TestMergingAVoucherBasket(TestCase):
         baskets[1].merge(baskets[0])
 
         self.assertEqual(1, baskets[1].vouchers.all().count())
+
+
+class TestLoadingBasketLines(TestCase):
+
+    def setUp(self):
+        self.basket = factories.create_basket(empty=True)
+        parent = factories.create_product(structure='parent')
+        for __ in range(3):
+            self.basket.add(factories.create_product(
+                parent=parent, price=D('5.00'), num_in_stock=10))
+            self.basket.add(factories.create_product(
+                price=D('8.00'), num_in_stock=10))
+
+    def load_basket(self):
+        basket = Basket.objects.get(pk=self.basket.pk)
+        basket.strategy = strategy.Default()
+        return basket
+
+    def test_uses_a_fixed_number_of_queries(self):
+        basket = self.load_basket()
+        with self.assertNumQueries(4):
+            lines = list(basket.all_lines())
+        with self.assertNumQueries(0):
+            for line in lines:
+                line.is_tax_known
+                line.purchase_info.availability.is_available_to_buy
+                line.stockrecord.partner
+
+    def test_resolves_purchase_info_for_every_line(self):
+        basket = self.load_basket()
+        self.assertEqual(D('39.00'), basket.total_excl_tax)
@@ -0,0 +1,75 @@
+from decimal import Decimal as D
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.signing import Signer
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from oscar.apps.basket.middleware import BasketMiddleware
+from oscar.apps.basket.summary import BasketSummary
+from oscar.test import factories
+from oscar.test.basket import add_product
+
+
+class TestBasketSummary(TestCase):
+
+    def setUp(self):
+        self.middleware = BasketMiddleware()
+        self.user = factories.UserFactory()
+        self.basket = factories.BasketFactory(owner=self.user)
+        add_product(self.basket, D('10.00'), 2)
+
+    def get_request(self, user=None, cookies=None):
+        factory = RequestFactory()
+        for key, value in (cookies or {}).items():
+            factory.cookies[key] = value
+        request = factory.get('/')
+        request.user = user or AnonymousUser()
+        self.middleware.process_request(request)
+        return request
+
+    def test_is_empty_for_anonymous_users_without_a_basket(self):
+        request = self.get_request()
+        with self.assertNumQueries(0):
+            self.assertTrue(request.basket_summary.is_empty)
+
+    def test_summarises_the_basket(self):
+        summary = self.get_request(self.user).basket_summary
+        self.assertEqual(self.basket.id, summary.basket_id)
+        self.assertEqual(1, summary.num_lines)
+        self.assertEqual(2, summary.num_items)
+        self.assertEqual(D('20.00'), summary.total_incl_tax)
+        self.assertEqual(1, len(summary.lines))
+
+    def test_is_served_from_the_cache_on_later_requests(self):
+        self.get_request(self.user).basket_summary.num_lines
+        request = self.get_request(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(2, request.basket_summary.num_items)
+
+    def test_is_served_from_the_cache_for_cookie_baskets(self):
+        basket = factories.BasketFactory()
+        add_product(basket, D('5.00'))
+        cookies = {'oscar_open_basket': Signer().sign(basket.id)}
+        self.get_request(cookies=cookies).basket_summary.num_lines
+        request = self.get_request(cookies=cookies)
+        with self.assertNumQueries(0):
+            self.assertEqual(D('5.00'), request.basket_summary.total_incl_tax)
+
+    def test_is_invalidated_when_a_line_is_added(self):
+        self.get_request(self.user).basket_summary.num_lines
+        add_product(self.basket, D('5.00'))
+        summary = self.get_request(self.user).basket_summary
+        self.assertEqual(2, summary.num_lines)
+        self.assertEqual(D('25.00'), summary.total_incl_tax)
+
+    def test_is_invalidated_when_the_basket_is_submitted(self):
+        self.get_request(self.user).basket_summary.num_lines
+        self.basket.submit()
+        self.assertTrue(self.get_request(self.user).basket_summary.is_empty)
+
+    def test_is_not_stored_when_the_basket_was_loaded_by_the_view(self):
+        request = self.get_request(self.user)
+        request.basket.num_lines
+        self.assertEqual(1, request.basket_summary.num_lines)
+        self.assertIsNone(BasketSummary.get_cached(owner_id=self.user.id))
@@ -8,6 +8,7 @@ from django.test.utils import override_settings
 from oscar.apps.catalogue.models import Category
 from oscar.apps.catalogue.categories import create_from_breadcrumbs
 from oscar.templatetags.category_tags import get_annotated_list
+from oscar.test import factories
 
 
 class TestCategory(TestCase):
@@ -39,6 +40,21 @@ class TestCategory(TestCase):
         more_books = Category.add_root(name=self.books.name)
         self.assertEqual(more_books.slug, self.books.slug)
 
+    def test_reads_ancestors_from_the_cached_tree(self):
+        self.books.full_name
+        books = Category.objects.get(pk=self.books.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(u"Pröducts > Bücher", books.full_name)
+            self.assertEqual(
+                '/'.join([self.products.slug, self.books.slug]),
+                books.full_slug)
+
+    def test_full_name_reflects_renamed_ancestors(self):
+        self.books.full_name
+        self.products.name = u"Things"
+        self.products.save()
+        self.assertEqual(u"Things > Bücher", self.books.full_name)
+
     @skipIf(DJANGO_VERSION < (1, 9),
             "unicode slugs not supported by Django<1.9")
     def test_unicode_slug(self):
@@ -245,3 +261,32 @@ class TestCategoryTemplateTags(TestCase):
         actual_categories = self.get_category_names(depth=1, parent=parent)
         expected_categories = {'Horror', 'Comedy'}
         self.assertEqual(expected_categories, actual_categories)
+
+    def test_reads_the_tree_from_the_cache(self):
+        self.get_category_names()
+        with self.assertNumQueries(0):
+            self.get_category_names(depth=2)
+
+    def test_tree_is_invalidated_when_a_category_is_saved(self):
+        self.get_category_names()
+        Category.add_root(name='Toys')
+        self.assertIn('Toys', self.get_category_names(depth=1))
+
+    def test_tree_is_invalidated_when_a_category_is_moved(self):
+        self.get_category_names()
+        Category.objects.get(name='Children').move(
+            Category.objects.get(name='Fiction'), 'last-child')
+        parent = Category.objects.get(name='Fiction')
+        self.assertIn('Children', self.get_category_names(parent=parent))
+
+    def test_can_annotate_categories_with_product_counts(self):
+        product = factories.create_product()
+        for name in ('Teen', 'Gothic'):
+            factories.ProductCategoryFactory(
+                product=product, category=Category.objects.get(name=name))
+        counts = dict(
+            (category.name, category.num_products) for category, __ in
+            get_annotated_list(product_counts=True))
+        self.assertEqual(1, counts['Books'])
+        self.assertEqual(1, counts['Teen'])
+        self.assertEqual(0, counts['Comedy'])
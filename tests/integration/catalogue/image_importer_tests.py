@@ -0,0 +1,77 @@
+import logging
+import os
+import shutil
+import tempfile
+
+import mock
+from django.db import DatabaseError
+from django.test import TestCase
+from django.test.utils import override_settings
+from PIL import Image
+
+from oscar.apps.catalogue.utils import Importer
+from oscar.core.loading import get_model
+from oscar.test import factories
+
+ProductImage = get_model('catalogue', 'ProductImage')
+
+logger = logging.getLogger('oscar.catalogue.import')
+
+
+class TestImageImporter(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.image_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.addCleanup(shutil.rmtree, self.image_dir)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.product = factories.create_product(upc='123')
+        self.write_image('123.png', 'red')
+        self.write_image('456.png', 'blue')
+        with open(os.path.join(self.image_dir, '789.png'), 'w') as f:
+            f.write('not an image')
+
+    def write_image(self, filename, colour):
+        Image.new('RGB', (2, 2), colour).save(
+            os.path.join(self.image_dir, filename))
+
+    def test_links_images_to_matching_products(self):
+        stats = Importer(logger, field='upc').handle(self.image_dir)
+        self.assertEqual(1, stats['num_processed'])
+        self.assertEqual(1, stats['num_skipped'])
+        self.assertEqual(1, stats['num_invalid'])
+        self.assertEqual(1, self.product.images.count())
+
+    def test_skips_images_a_product_already_has(self):
+        Importer(logger, field='upc').handle(self.image_dir)
+        with self.assertNumQueries(2):
+            stats = Importer(logger, field='upc').handle(self.image_dir)
+        self.assertEqual(0, stats['num_processed'])
+        self.assertEqual(1, self.product.images.count())
+
+    def test_adds_changed_images(self):
+        Importer(logger, field='upc').handle(self.image_dir)
+        self.write_image('123.png', 'green')
+        Importer(logger, field='upc').handle(self.image_dir)
+        self.assertEqual(
+            [0, 1], [image.display_order
+                     for image in self.product.images.all()])
+
+    def test_can_verify_images_in_worker_processes(self):
+        stats = Importer(logger, field='upc', processes=2).handle(
+            self.image_dir)
+        self.assertEqual(1, stats['num_processed'])
+        self.assertEqual(1, stats['num_invalid'])
+
+    def test_deletes_stored_files_when_a_batch_fails(self):
+        with mock.patch.object(ProductImage.objects, 'bulk_create',
+                               side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                Importer(logger, field='upc').handle(self.image_dir)
+        stored = [filename for __, __, filenames in os.walk(self.media_root)
+                  for filename in filenames]
+        self.assertEqual([], stored)
@@ -6,6 +6,7 @@ from django.core.exceptions import ValidationError
 from oscar.apps.catalogue.models import (Product, ProductClass,
                                          ProductAttribute,
                                          AttributeOption)
+from oscar.apps.catalogue.product_attributes import prefetch_attribute_values
 from oscar.test import factories
 from oscar.test.decorators import ignore_deprecation_warnings
 
@@ -154,3 +155,89 @@ class ProductAttributeCreationTests(TestCase):
             attribute=attribute, value_entity=unrelated_object)
 
         self.assertEqual(attribute_value.value, unrelated_object)
+
+
+class TestLoadingAttributesInBulk(TestCase):
+
+    def setUp(self):
+        product_class = factories.ProductClassFactory()
+        option_group = factories.AttributeOptionGroupFactory()
+        self.option = factories.AttributeOptionFactory(group=option_group)
+        weight = factories.ProductAttributeFactory(
+            product_class=product_class, code='weight', type='float')
+        colour = factories.ProductAttributeFactory(
+            product_class=product_class, code='colour', name='Colour',
+            type='option', option_group=option_group)
+        for i in range(3):
+            product = factories.ProductFactory(product_class=product_class)
+            factories.ProductAttributeValueFactory(
+                product=product, attribute=weight, value_float=i)
+            factories.ProductAttributeValueFactory(
+                product=product, attribute=colour, value_option=self.option)
+
+    def test_loads_the_values_of_a_queryset_in_one_query(self):
+        with self.assertNumQueries(2):
+            products = list(Product.objects.with_attributes().order_by('pk'))
+            self.assertEqual([0, 1, 2], [p.attr.weight for p in products])
+            self.assertEqual(self.option, products[0].attr.colour)
+            products[0].attribute_summary
+
+    def test_populates_the_containers_of_a_list(self):
+        products = list(Product.objects.order_by('pk'))
+        with self.assertNumQueries(1):
+            prefetch_attribute_values(products)
+            self.assertEqual(2.0, products[2].attr.weight)
+
+    def test_discards_the_prefetched_values_on_save(self):
+        product = Product.objects.with_attributes().get(
+            pk=Product.objects.order_by('pk')[0].pk)
+        self.assertEqual(0.0, product.attr.weight)
+        product.attr.weight = 5.0
+        product.save()
+        self.assertIn('weight: 5.0', product.attribute_summary)
+
+
+class TestAttributeSchema(TestCase):
+
+    def setUp(self):
+        self.product_class = factories.ProductClassFactory()
+        factories.ProductAttributeFactory(
+            product_class=self.product_class, code='weight', type='integer')
+        self.product = factories.ProductFactory(
+            product_class=self.product_class)
+
+    def test_reads_attributes_from_the_cache(self):
+        self.product.attr.get_all_attributes()
+        product = Product.objects.get(pk=self.product.pk)
+        product.attr.weight = 3
+        with self.assertNumQueries(1):
+            # Only the product class is loaded
+            product.attr.validate_attributes()
+            self.assertEqual(
+                'weight', product.attr.get_attribute_by_code('weight').code)
+
+    def test_is_invalidated_when_an_attribute_is_added(self):
+        self.product.attr.get_all_attributes()
+        factories.ProductAttributeFactory(
+            product_class=self.product_class, code='size', type='text')
+        self.assertEqual(
+            ['size', 'weight'],
+            [a.code for a in self.product.attr.get_all_attributes()])
+
+    def test_raises_for_unknown_codes(self):
+        with self.assertRaises(ProductAttribute.DoesNotExist):
+            self.product.attr.get_attribute_by_code('colour')
+
+    def test_validates_options_against_cached_option_groups(self):
+        group = factories.AttributeOptionGroupFactory()
+        option = factories.AttributeOptionFactory(group=group)
+        factories.ProductAttributeFactory(
+            product_class=self.product_class, code='colour', type='option',
+            option_group=group)
+        attribute = self.product.attr.get_attribute_by_code('colour')
+        attribute.validate_value(option)
+        other = factories.AttributeOptionFactory(
+            group=factories.AttributeOptionGroupFactory())
+        with self.assertRaises(ValidationError):
+            self.product.attr.get_attribute_by_code(
+                'colour').validate_value(other)
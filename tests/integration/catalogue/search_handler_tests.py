@@ -0,0 +1,42 @@
+from django.test import TestCase
+
+from oscar.apps.catalogue.categories import create_from_breadcrumbs
+from oscar.apps.catalogue.search_handlers import SimpleProductSearchHandler
+from oscar.test import factories
+
+
+class TestSimpleProductSearchHandler(TestCase):
+
+    def setUp(self):
+        self.horror = create_from_breadcrumbs('Books > Fiction > Horror')
+        self.comedy = create_from_breadcrumbs('Books > Fiction > Comedy')
+        self.fiction = self.horror.get_parent()
+        self.biography = create_from_breadcrumbs('Books > Biography')
+
+    def add_product(self, *categories):
+        product = factories.create_product()
+        for category in categories:
+            factories.ProductCategoryFactory(
+                product=product, category=category)
+        return product
+
+    def get_products(self, categories):
+        handler = SimpleProductSearchHandler({}, '/', categories)
+        return list(handler.get_queryset())
+
+    def test_includes_products_of_descendant_categories(self):
+        horror = self.add_product(self.horror)
+        comedy = self.add_product(self.comedy)
+        self.add_product(self.biography)
+        self.assertEqual(
+            {horror, comedy}, set(self.get_products([self.fiction])))
+
+    def test_returns_products_in_several_categories_once(self):
+        product = self.add_product(self.horror, self.comedy)
+        self.assertEqual([product], self.get_products(
+            self.fiction.get_descendants_and_self()))
+
+    def test_returns_all_products_without_categories(self):
+        self.add_product(self.horror)
+        self.add_product()
+        self.assertEqual(2, len(self.get_products(None)))
@@ -0,0 +1,92 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import InvalidPage
+from django.test import TestCase
+from django.utils import timezone
+
+from oscar.apps.catalogue.search_handlers import SimpleProductSearchHandler
+from oscar.core.loading import get_model
+from oscar.core.pagination import KeysetPaginator
+from oscar.test import factories
+
+Product = get_model('catalogue', 'Product')
+
+
+class TestKeysetPaginator(TestCase):
+
+    def setUp(self):
+        self.products = [factories.create_product() for __ in range(7)]
+        # Give some products the same date, so the primary key has to
+        # break ties
+        date = timezone.now()
+        Product.objects.filter(pk__in=[p.pk for p in self.products[2:5]]) \
+            .update(date_created=date)
+        self.expected = list(Product.objects.order_by('-date_created', '-pk'))
+        self.paginator = KeysetPaginator(
+            Product.objects.order_by('-date_created'), 3)
+
+    def walk_forwards(self):
+        pages = [self.paginator.page(1)]
+        while pages[-1].has_next():
+            pages.append(self.paginator.page(pages[-1].next_page_number()))
+        return pages
+
+    def test_walks_forwards_through_all_objects(self):
+        pages = self.walk_forwards()
+        self.assertEqual([1, 2, 3], [page.number for page in pages])
+        self.assertEqual(
+            self.expected, [obj for page in pages for obj in page])
+
+    def test_walks_backwards(self):
+        last = self.walk_forwards()[-1]
+        page = self.paginator.page(last.previous_page_number())
+        self.assertEqual(self.expected[3:6], list(page))
+        page = self.paginator.page(page.previous_page_number())
+        self.assertEqual(self.expected[:3], list(page))
+        self.assertEqual(1, page.number)
+        self.assertFalse(page.has_previous())
+
+    def test_does_not_count_to_find_the_next_page(self):
+        page = self.paginator.page(1)
+        with self.assertNumQueries(1):
+            page = self.paginator.page(page.next_page_number())
+            self.assertTrue(page.has_next())
+
+    def test_supports_page_numbers(self):
+        page = self.paginator.page('2')
+        self.assertEqual(self.expected[3:6], list(page))
+        self.assertEqual(4, page.start_index())
+
+    def test_rejects_tampered_cursors(self):
+        cursor = self.paginator.page(1).next_page_number()
+        with self.assertRaises(InvalidPage):
+            self.paginator.page(cursor[:-2] + 'xx')
+
+    def test_can_limit_the_count(self):
+        paginator = KeysetPaginator(Product.objects.all(), 3, count_limit=5)
+        self.assertEqual(5, paginator.count)
+        self.assertFalse(paginator.count_is_exact)
+        self.assertEqual(2, paginator.num_pages)
+
+    def test_rejects_orderings_on_related_fields(self):
+        with self.assertRaises(ImproperlyConfigured):
+            KeysetPaginator(Product.objects.order_by('parent__title'), 3)
+
+
+class KeysetProductSearchHandler(SimpleProductSearchHandler):
+    keyset_pagination = True
+    paginate_by = 2
+
+
+class TestKeysetPaginationMixin(TestCase):
+
+    def test_pages_with_cursors(self):
+        for __ in range(3):
+            factories.create_product()
+        context = KeysetProductSearchHandler(
+            {}, '/').get_search_context_data('products')
+        self.assertEqual(2, len(context['products']))
+        cursor = context['page_obj'].next_page_number()
+        context = KeysetProductSearchHandler(
+            {'page': cursor}, '/').get_search_context_data('products')
+        self.assertEqual(1, len(context['products']))
+        self.assertFalse(context['page_obj'].has_next())
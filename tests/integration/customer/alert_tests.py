@@ -0,0 +1,127 @@
+from decimal import Decimal as D
+
+import mock
+from django.contrib.sites.models import Site
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase
+
+from oscar.apps.customer.alerts.utils import (
+    AlertQueue, AlertSender, send_alerts)
+from oscar.apps.customer.models import Notification, ProductAlert
+from oscar.test import factories
+
+
+class SynchronousAlertQueue(AlertQueue):
+
+    def start(self):
+        self.process()
+
+
+class TestSendingAlerts(TestCase):
+
+    def setUp(self):
+        self.product = factories.create_product()
+        self.stockrecord = factories.create_stockrecord(
+            self.product, D('12.00'), num_in_stock=0)
+
+    def create_alert(self, product=None, **kwargs):
+        if 'email' not in kwargs:
+            kwargs.setdefault('user', factories.UserFactory())
+        return ProductAlert.objects.create(
+            product=product or self.product, **kwargs)
+
+    def restock(self, num_in_stock=5):
+        self.stockrecord.num_in_stock = num_in_stock
+        self.stockrecord.save()
+
+    def test_does_not_send_alerts_for_products_out_of_stock(self):
+        alert = self.create_alert()
+        send_alerts()
+        self.assertEqual(0, len(mail.outbox))
+        alert.refresh_from_db()
+        self.assertTrue(alert.is_active)
+
+    def test_sends_alerts_and_closes_them(self):
+        alerts = [self.create_alert() for __ in range(3)]
+        anonymous = self.create_alert(email='anonymous@example.com')
+        anonymous.confirm()
+        alerts.append(anonymous)
+        self.restock()
+        send_alerts()
+
+        self.assertEqual(4, len(mail.outbox))
+        self.assertEqual(
+            set(alert.get_email_address() for alert in alerts),
+            set(email.to[0] for email in mail.outbox))
+        self.assertEqual(4, ProductAlert.objects.filter(
+            status=ProductAlert.CLOSED, date_closed__isnull=False).count())
+        self.assertEqual(3, Notification.objects.count())
+
+    def test_sends_emails_in_batches(self):
+        for __ in range(5):
+            self.create_alert()
+        self.restock()
+        self.assertEqual(5, AlertSender(batch_size=2).send())
+        self.assertEqual(5, len(mail.outbox))
+
+    def test_keeps_the_alerts_of_batches_which_failed_to_send(self):
+        for __ in range(5):
+            self.create_alert()
+        self.restock()
+        send_messages = EmailBackend.send_messages
+
+        def fail_after_first_batch(backend, emails):
+            if mail.outbox:
+                raise IOError("Connection lost")
+            return send_messages(backend, emails)
+
+        with mock.patch.object(EmailBackend, 'send_messages',
+                               fail_after_first_batch):
+            with self.assertRaises(IOError):
+                AlertSender(batch_size=2).send()
+
+        self.assertEqual(2, len(mail.outbox))
+        self.assertEqual(2, ProductAlert.objects.filter(
+            status=ProductAlert.CLOSED).count())
+        self.assertEqual(3, ProductAlert.objects.filter(
+            status=ProductAlert.ACTIVE).count())
+        self.assertEqual(2, Notification.objects.count())
+
+    def test_adds_a_hurry_note_when_stock_is_low(self):
+        for __ in range(2):
+            self.create_alert()
+        self.restock(num_in_stock=5)
+        send_alerts()
+        self.assertIn('Beware', mail.outbox[0].body)
+
+    def test_sends_alerts_for_parent_products_once(self):
+        parent = factories.create_product(structure='parent')
+        children = []
+        for __ in range(2):
+            child = factories.create_product(parent=parent)
+            factories.create_stockrecord(child, D('12.00'), num_in_stock=5)
+            children.append(child)
+        self.create_alert(product=parent)
+        self.create_alert(product=children[1])
+        send_alerts()
+        self.assertEqual(2, len(mail.outbox))
+
+    def test_queries_do_not_grow_with_the_number_of_alerts(self):
+        for __ in range(5):
+            self.create_alert()
+        self.restock()
+        Site.objects.get_current()
+        with self.assertNumQueries(7):
+            send_alerts()
+
+
+class TestAlertQueue(TestCase):
+
+    def test_sends_alerts_of_queued_products(self):
+        product = factories.create_product()
+        factories.create_stockrecord(product, D('12.00'), num_in_stock=5)
+        ProductAlert.objects.create(
+            product=product, user=factories.UserFactory())
+        SynchronousAlertQueue().put(product.id)
+        self.assertEqual(1, len(mail.outbox))
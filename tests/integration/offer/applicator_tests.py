@@ -1,16 +1,21 @@
 from decimal import Decimal as D
 
 from django.test import TestCase
+from django.test.utils import override_settings
 from mock import Mock
 
 from oscar.apps.offer import models
 from oscar.apps.offer.utils import Applicator
+from oscar.core.loading import get_model
+from oscar.test import factories
 from oscar.test.factories import (
     BasketFactory, RangeFactory, BenefitFactory, ConditionFactory,
     ConditionalOfferFactory)
 
 from oscar.test.basket import add_product
 
+Basket = get_model('basket', 'Basket')
+
 
 class TestOfferApplicator(TestCase):
 
@@ -42,6 +47,33 @@ class TestOfferApplicator(TestCase):
         applications = self.basket.offer_applications.applications
         self.assertEqual(1, applications[1]['freq'])
 
+    def test_respects_the_applications_left_for_the_user(self):
+        self.basket.owner = factories.UserFactory()
+        add_product(self.basket, D('100'), 5)
+        offer = ConditionalOfferFactory(
+            pk=1, condition=self.condition, benefit=self.benefit,
+            max_user_applications=3)
+        offer.record_user_usage(
+            factories.OrderFactory(user=self.basket.owner), 1)
+        self.applicator.apply_offers(self.basket, [offer])
+        applications = self.basket.offer_applications.applications
+        self.assertEqual(2, applications[1]['freq'])
+
+    def test_loads_the_user_applications_of_all_offers_in_one_query(self):
+        user = factories.UserFactory()
+        offers = [
+            ConditionalOfferFactory(name="Offer %d" % i,
+                                    max_user_applications=2)
+            for i in range(3)]
+        offers[0].record_user_usage(factories.OrderFactory(user=user), 1)
+        offers = list(models.ConditionalOffer.objects.all())
+        with self.assertNumQueries(1):
+            self.applicator.prefetch_user_applications(user, offers)
+        with self.assertNumQueries(0):
+            counts = [offer.get_num_user_applications(user)
+                      for offer in offers]
+        self.assertEqual(1, sum(counts))
+
     def test_uses_offers_in_order_of_descending_priority(self):
         self.applicator.get_site_offers = Mock(
             return_value=[models.ConditionalOffer(
@@ -56,3 +88,148 @@ class TestOfferApplicator(TestCase):
         offers = self.applicator.get_offers(self.basket)
         priorities = [offer.priority for offer in offers]
         self.assertEqual(sorted(priorities, reverse=True), priorities)
+
+
+class CountingRange(object):
+    name = "Counting range"
+    tested_products = []
+
+    def contains_product(self, product):
+        self.tested_products.append(product.id)
+        return True
+
+    def num_products(self):
+        return None
+
+
+class TestBatchOfferEvaluation(TestCase):
+
+    def setUp(self):
+        self.applicator = Applicator()
+        self.basket = BasketFactory()
+        self.range = RangeFactory()
+
+    def add_child_product(self):
+        parent = factories.ProductFactory(structure='parent')
+        child = factories.ProductFactory(
+            structure='child', parent=parent, product_class=None)
+        self.range.add_product(parent)
+        add_product(self.basket, D('10.00'), product=child)
+
+    def test_tests_each_product_once_per_range(self):
+        rng = RangeFactory(
+            proxy_class='tests.integration.offer.applicator_tests.'
+                        'CountingRange')
+        # An unsatisfiable condition, so that every line gets tested
+        condition = ConditionFactory(
+            range=rng, type=models.Condition.COUNT, value=100,
+            proxy_class=None)
+        for i in range(3):
+            factories.create_offer(
+                name="Offer %d" % i, range=rng, condition=condition)
+        for __ in range(4):
+            self.add_child_product()
+
+        CountingRange.tested_products = []
+        self.applicator.apply_offers(
+            self.basket, self.applicator.get_site_offers())
+        self.assertEqual(4, len(CountingRange.tested_products))
+
+    def test_loads_the_parents_of_child_products_in_one_query(self):
+        for __ in range(4):
+            self.add_child_product()
+        lines = list(self.basket.lines.select_related('product'))
+        with self.assertNumQueries(1):
+            self.applicator.prefetch_parents(
+                [line.product for line in lines])
+        with self.assertNumQueries(0):
+            for line in lines:
+                line.product.get_is_discountable()
+                line.product.get_product_class()
+
+    def test_child_products_are_matched_via_their_parent(self):
+        factories.create_offer(range=self.range)
+        self.add_child_product()
+        self.applicator.apply_offers(
+            self.basket, self.applicator.get_site_offers())
+        self.assertEqual(1, len(self.basket.offer_applications))
+
+
+@override_settings(OSCAR_OFFER_APPLICATION_CACHE_TIMEOUT=900)
+class TestOfferApplicationMemoisation(TestCase):
+
+    def setUp(self):
+        self.basket = factories.create_basket(empty=True)
+        add_product(self.basket, D('10.00'), 2)
+        factories.create_offer()
+        Applicator().apply(self.basket)
+
+    def reload_basket(self):
+        basket = Basket.objects.get(pk=self.basket.pk)
+        basket.strategy = self.basket.strategy
+        return basket
+
+    def test_replays_discounts_for_an_unchanged_basket(self):
+        basket = self.reload_basket()
+        applicator = Applicator()
+        applicator.apply_offers = Mock()
+        applicator.apply(basket)
+        self.assertFalse(applicator.apply_offers.called)
+        self.assertEqual(self.basket.total_discount, basket.total_discount)
+        self.assertEqual(
+            [application['freq'] for application in
+             self.basket.offer_applications],
+            [application['freq'] for application in
+             basket.offer_applications])
+        line = basket.all_lines()[0]
+        self.assertEqual(0, line.quantity_without_discount)
+
+    def test_reapplies_offers_when_the_basket_changes(self):
+        basket = self.reload_basket()
+        add_product(basket, D('5.00'), 1)
+        Applicator().apply(basket)
+        self.assertEqual(D('5.00'), basket.total_discount)
+
+    def test_reapplies_offers_when_an_offer_changes(self):
+        models.ConditionalOffer.objects.get().suspend()
+        basket = self.reload_basket()
+        Applicator().apply(basket)
+        self.assertEqual(D('0.00'), basket.total_discount)
+
+    def test_reapplies_offers_when_the_owner_uses_a_limited_offer(self):
+        offer = models.ConditionalOffer.objects.get()
+        offer.max_user_applications = 1
+        offer.save()
+        self.basket.owner = factories.UserFactory()
+        self.basket.save()
+        Applicator().apply(self.basket)
+        offer.record_user_usage(
+            factories.OrderFactory(user=self.basket.owner), 1)
+        basket = self.reload_basket()
+        Applicator().apply(basket)
+        self.assertEqual(D('0.00'), basket.total_discount)
+
+    def test_reapplies_offers_when_the_products_of_a_range_change(self):
+        models.ConditionalOffer.objects.get().suspend()
+        category = factories.CategoryFactory()
+        rng = RangeFactory()
+        rng.included_categories.add(category)
+        link = factories.ProductCategoryFactory(
+            product=self.basket.all_lines()[0].product, category=category)
+        factories.create_offer(name="Category offer", range=rng)
+        basket = self.reload_basket()
+        Applicator().apply(basket)
+        self.assertEqual(D('4.00'), basket.total_discount)
+
+        link.delete()
+        basket = self.reload_basket()
+        Applicator().apply(basket)
+        self.assertEqual(D('0.00'), basket.total_discount)
+
+    def test_can_be_disabled(self):
+        basket = self.reload_basket()
+        applicator = Applicator()
+        applicator.apply_offers = Mock()
+        with self.settings(OSCAR_OFFER_APPLICATION_CACHE_TIMEOUT=None):
+            applicator.apply(basket)
+        self.assertTrue(applicator.apply_offers.called)
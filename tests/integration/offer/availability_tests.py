@@ -1,16 +1,22 @@
+from decimal import Decimal as D
+
 from django.test import TestCase
 
 from oscar.apps.offer import models
 from oscar.test.factories import (
-    create_order, OrderDiscountFactory, UserFactory)
+    ConditionalOfferFactory, OrderFactory, UserFactory)
 
 
 class TestAPerUserConditionalOffer(TestCase):
 
     def setUp(self):
-        self.offer = models.ConditionalOffer(max_user_applications=1)
+        self.offer = ConditionalOfferFactory(max_user_applications=1)
         self.user = UserFactory()
 
+    def record_usage(self, frequency):
+        self.offer.record_usage({'freq': frequency, 'discount': D('5.00')})
+        self.offer.record_user_usage(OrderFactory(user=self.user), frequency)
+
     def test_is_available_with_no_applications(self):
         self.assertTrue(self.offer.is_available())
 
@@ -18,13 +24,29 @@ class TestAPerUserConditionalOffer(TestCase):
         self.assertEqual(1, self.offer.get_max_applications(self.user))
 
     def test_max_applications_is_correct_when_equal_applications(self):
-        order = create_order(user=self.user)
-        OrderDiscountFactory(
-            order=order, offer_id=self.offer.id, frequency=1)
+        self.record_usage(1)
         self.assertEqual(0, self.offer.get_max_applications(self.user))
 
     def test_max_applications_is_correct_when_more_applications(self):
-        order = create_order(user=self.user)
-        OrderDiscountFactory(
-            order=order, offer_id=self.offer.id, frequency=5)
+        self.record_usage(5)
         self.assertEqual(0, self.offer.get_max_applications(self.user))
+
+    def test_sums_up_the_applications_of_several_orders(self):
+        self.record_usage(1)
+        self.record_usage(2)
+        usage = models.UserOfferUsage.objects.get(
+            offer=self.offer, user=self.user)
+        self.assertEqual(3, usage.num_applications)
+
+    def test_counts_are_per_user(self):
+        self.record_usage(1)
+        self.assertEqual(1, self.offer.get_max_applications(UserFactory()))
+
+    def test_does_not_count_anonymous_orders(self):
+        self.offer.record_user_usage(OrderFactory(user=None), 1)
+        self.assertFalse(models.UserOfferUsage.objects.exists())
+
+    def test_memoises_the_number_of_user_applications(self):
+        self.offer.get_num_user_applications(self.user)
+        with self.assertNumQueries(0):
+            self.offer.get_max_applications(self.user)
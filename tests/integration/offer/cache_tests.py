@@ -0,0 +1,198 @@
+import datetime
+from decimal import Decimal as D
+
+import mock
+from django.test import TestCase
+from django.utils import timezone
+
+from oscar.apps.offer.applicator import Applicator
+from oscar.apps.offer.cache import RangeProductIndex, SiteOfferSet
+from oscar.core.loading import get_model
+from oscar.test import factories
+from oscar.test.basket import add_product
+
+ConditionalOffer = get_model('offer', 'ConditionalOffer')
+Range = get_model('offer', 'Range')
+
+
+class TestSiteOfferSet(TestCase):
+
+    def setUp(self):
+        self.offer_set = SiteOfferSet()
+        self.range = factories.RangeFactory()
+        self.product = factories.ProductFactory()
+        self.range.add_product(self.product)
+        self.offer = factories.create_offer(range=self.range)
+
+    def test_returns_open_site_offers(self):
+        offers = self.offer_set.get_offers()
+        self.assertEqual([self.offer.pk], [offer.pk for offer in offers])
+
+    def test_does_not_hit_the_database_once_compiled(self):
+        self.offer_set.get_offers()[0].condition.range.contains(self.product)
+        with self.assertNumQueries(0):
+            offer = self.offer_set.get_offers()[0]
+            self.assertTrue(offer.condition.range.contains(self.product))
+            self.assertEqual(self.range, offer.benefit.range)
+
+    def test_stores_resolved_proxies(self):
+        offer = self.offer_set.get_offers()[0]
+        self.assertIs(offer.condition, offer.condition.proxy())
+        self.assertIs(offer.benefit, offer.benefit.proxy())
+
+    def test_returns_fresh_instances_on_each_call(self):
+        offer = self.offer_set.get_offers()[0]
+        offer.set_voucher(object())
+        self.assertIsNone(self.offer_set.get_offers()[0].get_voucher())
+
+    def test_filters_offers_by_date(self):
+        tomorrow = timezone.now() + datetime.timedelta(days=1)
+        factories.create_offer(name="Future offer", start=tomorrow)
+        offers = self.offer_set.get_offers()
+        self.assertEqual(1, len(offers))
+        offers = self.offer_set.get_offers(
+            test_date=tomorrow + datetime.timedelta(hours=1))
+        self.assertEqual(2, len(offers))
+
+    def test_is_invalidated_when_an_offer_is_saved(self):
+        self.offer_set.get_offers()
+        self.offer.suspend()
+        self.assertEqual([], self.offer_set.get_offers())
+
+    def test_is_not_invalidated_when_usage_is_recorded(self):
+        self.offer_set.get_offers()
+        version = self.offer_set.get_version('')
+        self.offer.record_usage({'freq': 2, 'discount': D('5.00')})
+        self.assertEqual(version, self.offer_set.get_version(''))
+        offer = ConditionalOffer.objects.get(pk=self.offer.pk)
+        self.assertEqual(2, offer.num_applications)
+        self.assertEqual(D('5.00'), offer.total_discount)
+        self.assertEqual(1, offer.num_orders)
+
+    def test_is_invalidated_when_a_limited_offer_is_used_up(self):
+        self.offer.max_global_applications = 2
+        self.offer.save()
+        self.offer_set.get_offers()
+        self.offer.record_usage({'freq': 2, 'discount': D('5.00')})
+        self.assertEqual([], self.offer_set.get_offers())
+
+    def test_is_invalidated_again_once_the_change_is_committed(self):
+        callbacks = []
+        with mock.patch('django.db.transaction.on_commit', callbacks.append,
+                        create=True):
+            self.offer.suspend()
+        # Another request rebuilds the offers before the commit
+        self.offer_set.get_offers()
+        version = self.offer_set.get_version('')
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(version, self.offer_set.get_version(''))
+
+    def test_is_invalidated_when_a_range_changes(self):
+        self.offer_set.get_offers()
+        self.range.remove_product(self.product)
+        offer = self.offer_set.get_offers()[0]
+        self.assertFalse(offer.condition.range.contains(self.product))
+
+    def test_is_shared_between_processes_through_the_cache(self):
+        self.offer_set.get_offers()
+        other_process = SiteOfferSet()
+        with self.assertNumQueries(0):
+            self.assertEqual(1, len(other_process.get_offers()))
+
+
+class TestRangeProductIndex(TestCase):
+
+    def setUp(self):
+        self.range = factories.RangeFactory()
+        self.parent = factories.ProductFactory(structure='parent')
+        self.child = factories.ProductFactory(
+            structure='child', parent=self.parent, product_class=None)
+        self.other = factories.ProductFactory()
+        self.category = factories.CategoryFactory()
+
+    def get_range(self):
+        return Range.objects.get(pk=self.range.pk)
+
+    def test_indexes_included_products_and_their_children(self):
+        self.range.add_product(self.parent)
+        self.assertEqual(
+            {self.parent.pk, self.child.pk},
+            Range.product_index.get_product_ids(self.get_range()))
+
+    def test_answers_membership_tests_from_memory(self):
+        self.range.add_product(self.parent)
+        Range.product_index.get_product_ids(self.range)
+        rng = self.get_range()
+        with self.assertNumQueries(0):
+            self.assertTrue(rng.contains_product(self.child))
+            self.assertFalse(rng.contains_product(self.other))
+
+    def test_is_invalidated_when_products_are_excluded(self):
+        self.range.add_product(self.parent)
+        Range.product_index.get_product_ids(self.range)
+        self.range.remove_product(self.parent)
+        self.assertFalse(self.get_range().contains_product(self.child))
+
+    def test_is_rebuilt_when_a_product_is_added_to_a_category(self):
+        self.range.included_categories.add(self.category)
+        self.assertFalse(self.get_range().contains_product(self.child))
+        factories.ProductCategoryFactory(
+            product=self.parent, category=self.category)
+        self.assertTrue(self.get_range().contains_product(self.child))
+
+    def test_is_rebuilt_when_a_category_is_moved(self):
+        other = factories.CategoryFactory(name="Other")
+        factories.ProductCategoryFactory(product=self.parent, category=other)
+        self.range.included_categories.add(self.category)
+        self.assertFalse(self.get_range().contains_product(self.child))
+        other.move(self.category, pos='first-child')
+        self.assertTrue(self.get_range().contains_product(self.child))
+
+    def test_is_rebuilt_when_a_product_changes_class(self):
+        self.range.classes.add(self.other.product_class)
+        self.assertFalse(self.get_range().contains_product(self.parent))
+        self.parent.product_class = self.other.product_class
+        self.parent.save()
+        self.assertTrue(self.get_range().contains_product(self.parent))
+        self.assertTrue(self.get_range().contains_product(self.child))
+
+    def test_is_rebuilt_when_a_product_is_deleted(self):
+        self.range.add_product(self.other)
+        Range.product_index.get_product_ids(self.range)
+        pk = self.other.pk
+        self.other.delete()
+        self.assertNotIn(
+            pk, Range.product_index.get_product_ids(self.get_range()))
+
+    def test_is_kept_when_an_unrelated_product_is_saved(self):
+        self.range.add_product(self.parent)
+        Range.product_index.get_product_ids(self.range)
+        self.other.save()
+        rng = self.get_range()
+        with self.assertNumQueries(0):
+            self.assertTrue(rng.contains_product(self.child))
+
+    def test_splits_large_indexes_into_several_cache_items(self):
+        self.range.add_product(self.parent)
+        self.range.add_product(self.other)
+        index = RangeProductIndex()
+        index.chunk_size = 2
+        index.get_product_ids(self.range)
+        other_process = RangeProductIndex()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                {self.parent.pk, self.child.pk, self.other.pk},
+                other_process.get_product_ids(self.range))
+
+
+class TestApplicatorWithCompiledOffers(TestCase):
+
+    def test_applies_site_offers(self):
+        factories.create_offer()
+        basket = factories.create_basket(empty=True)
+        add_product(basket, D('10.00'), 2)
+        Applicator().apply(basket)
+        self.assertEqual(1, len(basket.offer_applications))
+        # 20% off both items
+        self.assertEqual(D('4.00'), basket.total_discount)
@@ -1,21 +1,30 @@
 from decimal import Decimal as D
 
+import mock
+from django.contrib.sites.models import Site
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.test.utils import override_settings
 
 from oscar.apps.catalogue.models import ProductClass, Product
 from oscar.apps.checkout import calculators
 from oscar.apps.offer.utils import Applicator
+from oscar.apps.order.exceptions import UnableToPlaceOrder
 from oscar.apps.order.models import Order
 from oscar.apps.order.utils import OrderCreator
+from oscar.apps.partner.models import StockAlert
+from oscar.apps.partner.strategy import Selector
 from oscar.apps.shipping.methods import Free, FixedPrice
 from oscar.apps.shipping.repository import Repository
-from oscar.core.loading import get_class
+from oscar.core.loading import get_class, get_model
 from oscar.test import factories
 from oscar.test.basket import add_product
 
 Range = get_class('offer.models', 'Range')
 Benefit = get_class('offer.models', 'Benefit')
+ConditionalOffer = get_class('offer.models', 'ConditionalOffer')
+StockRecord = get_model('partner', 'StockRecord')
 
 
 def place_order(creator, **kwargs):
@@ -110,6 +119,142 @@ class TestSuccessfulOrderCreation(TestCase):
             partner = product.stockrecords.all()[0].partner
             self.assertTrue(partner_name == line.partner_name == partner.name)
 
+    def test_records_the_offer_usage_of_the_user(self):
+        user = factories.UserFactory()
+        add_product(self.basket, D('12.00'))
+        offer = factories.create_offer()
+        offer.max_user_applications = 5
+        offer.save()
+        Applicator().apply_offers(self.basket, [offer])
+        place_order(self.creator, basket=self.basket, order_number='1234',
+                    user=user)
+        offer = ConditionalOffer.objects.get(pk=offer.pk)
+        self.assertEqual(1, offer.get_num_user_applications(user))
+        self.assertEqual(4, offer.get_max_applications(user))
+
+    def test_supports_creators_overriding_record_discount(self):
+        class CustomCreator(OrderCreator):
+            def record_discount(self, discount):
+                super(CustomCreator, self).record_discount(discount)
+
+        user = factories.UserFactory()
+        add_product(self.basket, D('12.00'))
+        offer = factories.create_offer()
+        Applicator().apply_offers(self.basket, [offer])
+        place_order(CustomCreator(), basket=self.basket, order_number='1234',
+                    user=user)
+        self.assertEqual(1, offer.get_num_user_applications(user))
+
+
+class BulkOrderCreator(OrderCreator):
+    bulk_create_lines = True
+
+
+class TestPlacingOrdersInBulk(TestCase):
+
+    def setUp(self):
+        self.creator = BulkOrderCreator()
+        self.basket = factories.create_basket(empty=True)
+        self.option = factories.OptionFactory(code='colour')
+
+    def add_products(self, num_products):
+        products = []
+        for __ in range(num_products):
+            product = factories.create_product(
+                price=D('12.00'), num_in_stock=10)
+            self.basket.add_product(product, quantity=2, options=[
+                {'option': self.option, 'value': 'red'}])
+            products.append(product)
+        self.basket.reset_offer_applications()
+        return products
+
+    def test_creates_lines_prices_and_attributes(self):
+        products = self.add_products(2)
+        order = place_order(self.creator, basket=self.basket)
+        lines = list(order.lines.order_by('pk'))
+        self.assertEqual(products, [line.product for line in lines])
+        for line in lines:
+            self.assertEqual(2, line.quantity)
+            self.assertEqual(D('24.00'), line.line_price_incl_tax)
+            price = line.prices.get()
+            self.assertEqual((2, D('12.00')),
+                             (price.quantity, price.price_incl_tax))
+            attribute = line.attributes.get()
+            self.assertEqual(('colour', 'red'),
+                             (attribute.type, attribute.value))
+
+    def test_allocates_stock(self):
+        product = self.add_products(1)[0]
+        stockrecord = product.stockrecords.get()
+        stockrecord.low_stock_threshold = 9
+        stockrecord.save()
+        place_order(self.creator, basket=self.basket)
+
+        stockrecord = product.stockrecords.get()
+        self.assertEqual(2, stockrecord.num_allocated)
+        self.assertEqual(1, StockAlert.objects.filter(
+            stockrecord=stockrecord, status=StockAlert.OPEN).count())
+
+    def test_calls_the_additional_line_models_hook(self):
+        self.add_products(2)
+        with mock.patch.object(
+                self.creator, 'create_additional_line_models') as hook:
+            order = place_order(self.creator, basket=self.basket)
+        self.assertEqual(2, hook.call_count)
+        self.assertEqual(
+            list(order.lines.order_by('pk')),
+            [call[0][1] for call in hook.call_args_list])
+
+    def test_number_of_queries_does_not_grow_with_the_lines(self):
+        def count_queries(num_products):
+            self.basket = factories.create_basket(empty=True)
+            self.add_products(num_products)
+            self.basket.strategy = Selector().strategy()
+            self.basket.all_lines()
+            Site.objects.get_current()
+            with CaptureQueriesContext(connection) as queries:
+                place_order(self.creator, basket=self.basket)
+            return len(queries)
+
+        self.assertEqual(count_queries(1), count_queries(5))
+
+
+class StockCheckingOrderCreator(OrderCreator):
+    require_available_stock = True
+
+
+class TestPlacingOrdersRequiringAvailableStock(TestCase):
+
+    def setUp(self):
+        self.creator = StockCheckingOrderCreator()
+        self.basket = factories.create_basket(empty=True)
+        self.products = [
+            factories.create_product(price=D('12.00'), num_in_stock=3)
+            for __ in range(2)]
+        for product in self.products:
+            add_product(self.basket, product=product, quantity=2)
+
+    def test_allocates_stock(self):
+        place_order(self.creator, basket=self.basket)
+        for product in self.products:
+            self.assertEqual(2, product.stockrecords.get().num_allocated)
+
+    def test_allocates_stock_of_orders_placed_in_bulk(self):
+        self.creator.bulk_create_lines = True
+        place_order(self.creator, basket=self.basket)
+        for product in self.products:
+            self.assertEqual(2, product.stockrecords.get().num_allocated)
+
+    def test_does_not_place_orders_for_sold_out_products(self):
+        StockRecord.objects.filter(
+            product=self.products[1]).update(num_allocated=2)
+        with self.assertRaises(UnableToPlaceOrder) as cm:
+            place_order(self.creator, basket=self.basket)
+
+        self.assertIn(self.products[1].get_title(), str(cm.exception))
+        self.assertFalse(Order.objects.exists())
+        self.assertIsNone(self.products[0].stockrecords.get().num_allocated)
+
 
 class TestPlacingOrderForDigitalGoods(TestCase):
 
@@ -0,0 +1,45 @@
+from django.test import TestCase
+
+from oscar.apps.partner.allocation import StockAllocator
+from oscar.test import factories
+
+
+class TestStockAllocator(TestCase):
+
+    def setUp(self):
+        self.allocator = StockAllocator()
+        self.stockrecords = [
+            factories.create_stockrecord(
+                factories.create_product(), num_in_stock=num_in_stock)
+            for num_in_stock in (5, 2)]
+
+    def reload(self):
+        for stockrecord in self.stockrecords:
+            stockrecord.refresh_from_db()
+
+    def test_allocates_all_lines(self):
+        results = self.allocator.allocate(
+            [(self.stockrecords[1], 2), (self.stockrecords[0], 3)])
+        self.assertEqual([True, True], results)
+        self.reload()
+        self.assertEqual(
+            [2, 0], [record.net_stock_level for record in self.stockrecords])
+
+    def test_reports_lines_without_enough_stock(self):
+        results = self.allocator.allocate(
+            [(self.stockrecords[0], 3), (self.stockrecords[1], 3)])
+        self.assertEqual([True, False], results)
+        # Nothing is allocated, on the instances or in the database
+        self.assertEqual(5, self.stockrecords[0].net_stock_level)
+        self.reload()
+        self.assertEqual(
+            [5, 2], [record.net_stock_level for record in self.stockrecords])
+
+    def test_can_allocate_the_lines_with_enough_stock(self):
+        results = self.allocator.allocate(
+            [(self.stockrecords[0], 3), (self.stockrecords[1], 3)],
+            all_or_nothing=False)
+        self.assertEqual([True, False], results)
+        self.reload()
+        self.assertEqual(
+            [2, 2], [record.net_stock_level for record in self.stockrecords])
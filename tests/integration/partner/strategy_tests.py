@@ -107,3 +107,141 @@ class TestDefaultStrategyForParentProductWithOutOfStockVariant(TestCase):
 
     def test_specifies_product_has_correct_price(self):
         self.assertEqual(D('10.00'), self.info.price.incl_tax)
+
+
+class TestFetchingPurchaseInfoForLines(TestCase):
+
+    def setUp(self):
+        self.strategy = strategy.Default()
+        basket = factories.create_basket(empty=True)
+        basket.strategy = self.strategy
+        for price in (D('1.00'), D('2.00'), D('3.00')):
+            basket.add(factories.create_product(price=price, num_in_stock=5))
+
+    def test_returns_purchase_info_for_each_line_in_order(self):
+        lines = list(Line.objects.order_by('pk'))
+        infos = self.strategy.fetch_for_lines(lines)
+        self.assertEqual([D('1.00'), D('2.00'), D('3.00')],
+                         [info.price.excl_tax for info in infos])
+
+    def test_loads_related_objects_in_bulk(self):
+        lines = list(Line.objects.all())
+        with self.assertNumQueries(4):
+            self.strategy.fetch_for_lines(lines)
+
+
+class TestFetchingPurchaseInfoForProducts(TestCase):
+
+    def setUp(self):
+        self.strategy = strategy.Default()
+        self.products = [
+            factories.create_product(price=D('1.00'), num_in_stock=5),
+            factories.create_product(price=D('2.00'), num_in_stock=0)]
+        self.parent = factories.create_product(structure='parent')
+        factories.create_product(parent=self.parent, price=D('3.00'),
+                                 num_in_stock=1)
+
+    def load_products(self):
+        return list(models.Product.objects.filter(parent=None))
+
+    def test_returns_purchase_info_by_product_id(self):
+        infos = self.strategy.fetch_for_products(self.load_products())
+        self.assertEqual(D('1.00'), infos[self.products[0].id].price.excl_tax)
+        self.assertFalse(
+            infos[self.products[1].id].availability.is_available_to_buy)
+        self.assertEqual(D('3.00'), infos[self.parent.id].price.excl_tax)
+        self.assertTrue(
+            infos[self.parent.id].availability.is_available_to_buy)
+
+    def test_uses_a_fixed_number_of_queries(self):
+        products = self.load_products()
+        # Product classes, children, and stockrecords
+        with self.assertNumQueries(3):
+            self.strategy.fetch_for_products(products)
+
+
+class TestPurchaseInfoMemo(TestCase):
+
+    def setUp(self):
+        self.strategy = strategy.Default()
+        self.product = factories.create_product(
+            price=D('1.00'), num_in_stock=1)
+
+    def test_memoises_purchase_info_for_a_product(self):
+        info = self.strategy.fetch_for_product(self.product)
+        with self.assertNumQueries(0):
+            self.assertIs(info, self.strategy.fetch_for_product(self.product))
+        self.assertEqual(1, self.strategy.memo_misses)
+        self.assertEqual(1, self.strategy.memo_hits)
+
+    def test_keys_by_stockrecord(self):
+        stockrecord = self.product.stockrecords.all()[0]
+        self.strategy.fetch_for_product(self.product)
+        self.strategy.fetch_for_product(self.product, stockrecord)
+        self.assertEqual(2, self.strategy.memo_misses)
+
+    def test_is_discarded_when_stock_is_allocated(self):
+        info = self.strategy.fetch_for_product(self.product)
+        self.assertTrue(info.availability.is_available_to_buy)
+        info.stockrecord.allocate(1)
+        info = self.strategy.fetch_for_product(self.product)
+        self.assertFalse(info.availability.is_available_to_buy)
+
+    def test_is_bounded(self):
+        self.strategy.memo_size = 1
+        other = factories.create_product(price=D('2.00'))
+        self.strategy.fetch_for_product(self.product)
+        self.strategy.fetch_for_product(other)
+        self.strategy.fetch_for_product(self.product)
+        self.assertEqual(3, self.strategy.memo_misses)
+
+
+class CachedDefault(strategy.UseSharedCache, strategy.Default):
+    pass
+
+
+class TestSharedPurchaseInfoCache(TestCase):
+
+    def setUp(self):
+        self.product = factories.create_product(
+            price=D('1.00'), num_in_stock=1)
+        self.stockrecord = self.product.stockrecords.all()[0]
+        CachedDefault().fetch_for_product(self.product)
+
+    def test_shares_purchase_info_between_strategies(self):
+        product = models.Product.objects.get(pk=self.product.pk)
+        with self.assertNumQueries(0):
+            info = CachedDefault().fetch_for_product(product)
+        self.assertEqual(D('1.00'), info.price.excl_tax)
+        self.assertEqual(self.stockrecord.pk, info.stockrecord.pk)
+
+    def test_is_invalidated_when_a_stockrecord_is_saved(self):
+        self.stockrecord.price_excl_tax = D('2.00')
+        self.stockrecord.save()
+        info = CachedDefault().fetch_for_product(self.product)
+        self.assertEqual(D('2.00'), info.price.excl_tax)
+
+    def test_is_invalidated_when_stock_is_allocated(self):
+        self.stockrecord.allocate(1)
+        infos = CachedDefault().fetch_for_products([self.product])
+        self.assertFalse(
+            infos[self.product.id].availability.is_available_to_buy)
+
+    def test_listings_accept_stale_availability_within_budget(self):
+        CachedDefault().fetch_for_products([self.product])
+        self.stockrecord.allocate(1)
+        with self.settings(OSCAR_PURCHASE_INFO_STALENESS=60):
+            infos = CachedDefault().fetch_for_products([self.product])
+            self.assertTrue(
+                infos[self.product.id].availability.is_available_to_buy)
+            info = CachedDefault().fetch_for_product(self.product)
+            self.assertFalse(info.availability.is_available_to_buy)
+
+    def test_parents_are_invalidated_when_their_children_change(self):
+        parent = factories.create_product(structure='parent')
+        child = factories.create_product(
+            parent=parent, price=D('3.00'), num_in_stock=1)
+        CachedDefault().fetch_for_parent(parent)
+        child.stockrecords.all()[0].allocate(1)
+        info = CachedDefault().fetch_for_parent(parent)
+        self.assertFalse(info.availability.is_available_to_buy)
@@ -0,0 +1,35 @@
+from decimal import Decimal as D
+
+from django import template
+from django.test import TestCase
+
+from oscar.apps.partner import strategy
+from oscar.core.loading import get_model
+from oscar.test import factories
+from oscar.test.utils import RequestFactory
+
+Product = get_model('catalogue', 'Product')
+
+
+class TestPrefetchPurchaseInfo(TestCase):
+
+    def setUp(self):
+        self.template = template.Template(
+            "{% load purchase_info_tags %}"
+            "{% prefetch_purchase_info request products %}"
+            "{% for product in products %}"
+            "{% purchase_info_for_product request product as session %}"
+            "{{ session.price.excl_tax }} "
+            "{% endfor %}")
+        self.request = RequestFactory().get('/')
+        self.request.strategy = strategy.Default()
+
+    def test_fetches_purchase_info_for_all_products_at_once(self):
+        for price in ('1.00', '2.00', '3.00'):
+            factories.create_product(price=D(price))
+        products = list(Product.objects.all())
+        with self.assertNumQueries(2):
+            out = self.template.render(template.Context({
+                'request': self.request, 'products': products}))
+        for price in ('1.00', '2.00', '3.00'):
+            self.assertIn(price, out)
@@ -0,0 +1,60 @@
+import mock
+from django.test import TestCase
+
+from oscar.apps.voucher.models import Voucher
+from oscar.apps.voucher.utils import VoucherGenerator
+from oscar.test.factories import (
+    VoucherFactory, VoucherSetFactory, create_offer)
+
+
+class TestVoucherGenerator(TestCase):
+
+    def setUp(self):
+        self.offer = create_offer(offer_type='Voucher')
+        self.voucher_set = VoucherSetFactory(offer=self.offer, count=25)
+        self.generator = VoucherGenerator()
+
+    def test_creates_the_vouchers_of_the_set(self):
+        self.generator.generate(self.voucher_set)
+        vouchers = self.voucher_set.vouchers.all()
+        self.assertEqual(25, len(vouchers))
+        for voucher in vouchers:
+            self.assertEqual(12, len(voucher.code))
+            self.assertEqual(voucher.code.upper(), voucher.code)
+            self.assertEqual(Voucher.SINGLE_USE, voucher.usage)
+            self.assertEqual(self.voucher_set.end_datetime,
+                             voucher.end_datetime)
+
+    def test_links_all_vouchers_to_the_offer_of_the_set(self):
+        self.generator.generate(self.voucher_set)
+        self.assertEqual(25, self.offer.vouchers.count())
+
+    def test_inserts_the_vouchers_in_chunks(self):
+        self.generator.chunk_size = 10
+        # Per chunk: the collision check, the vouchers, their IDs, the
+        # links to the offer and a savepoint
+        with self.assertNumQueries(1 + 3 * (4 + 2)):
+            self.generator.generate(self.voucher_set)
+        self.assertEqual(25, self.voucher_set.vouchers.count())
+
+    def test_skips_codes_which_are_taken(self):
+        VoucherFactory(code='TAKEN')
+        codes = iter(['TAKEN', 'FREE1', 'TAKEN', 'FREE2'])
+        self.voucher_set.count = 2
+        with mock.patch.object(self.generator, 'generate_code',
+                               lambda length: next(codes)):
+            self.generator.generate(self.voucher_set)
+        self.assertEqual(
+            ['FREE1', 'FREE2'],
+            sorted(self.voucher_set.vouchers.values_list('code', flat=True)))
+
+    def test_only_creates_missing_vouchers(self):
+        self.generator.generate(self.voucher_set)
+        self.generator.generate(self.voucher_set)
+        self.assertEqual(25, Voucher.objects.count())
+
+    def test_vouchers_can_be_looked_up_by_code(self):
+        self.generator.generate(self.voucher_set)
+        code = self.voucher_set.vouchers.all()[0].code
+        with self.assertNumQueries(1):
+            Voucher.objects.get(code=code)
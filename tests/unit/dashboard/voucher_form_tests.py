@@ -1,4 +1,5 @@
 from django import test
+from django.test.utils import override_settings
 
 from oscar.apps.dashboard.vouchers import forms
 
@@ -28,3 +29,16 @@ class TestVoucherForm(test.TestCase):
             self.fail(
                 "Exception raised while validating voucher form: %s\n\n%s" % (
                     e.message, traceback.format_exc()))
+
+
+class TestVoucherSetForm(test.TestCase):
+
+    @override_settings(OSCAR_VOUCHER_SET_MAX_COUNT=100)
+    def test_limits_the_number_of_vouchers(self):
+        form = forms.VoucherSetForm(data={'count': 101})
+        self.assertFalse(form.is_valid())
+        self.assertIn('count', form.errors)
+
+        form = forms.VoucherSetForm(data={'count': 100})
+        form.is_valid()
+        self.assertNotIn('count', form.errors)
@@ -1,13 +1,18 @@
 import os
+import tempfile
 from decimal import Decimal as D
 from django.test import TestCase
 import logging
 
+import mock
+
+from oscar.apps.customer.alerts.utils import alert_queue
+from oscar.apps.offer.cache import RangeProductIndex
 from oscar.apps.partner.importers import CatalogueImporter
 from oscar.apps.partner.exceptions import ImportingError
-from oscar.apps.catalogue.models import ProductClass, Product
-from oscar.apps.partner.models import Partner
-from oscar.test.factories import create_product
+from oscar.apps.catalogue.models import Category, ProductClass, Product
+from oscar.apps.partner.models import Partner, StockAlert
+from oscar.test.factories import RangeFactory, create_product
 
 from tests._site.apps.partner.models import StockRecord
 
@@ -125,3 +130,102 @@ class ImportWithFlushTest(TestCase):
 
         with self.assertRaises(Product.DoesNotExist):
             Product.objects.get(upc=upc)
+
+
+class ImportInChunksTest(TestCase):
+
+    def test_all_rows_are_imported(self):
+        CatalogueImporter(logger, chunk_size=3).handle(TEST_BOOKS_CSV)
+        self.assertEqual(10, Product.objects.all().count())
+        self.assertEqual(1, Category.objects.filter(name="Fiction").count())
+
+
+class ReimportTest(TestCase):
+
+    def setUp(self):
+        CatalogueImporter(logger).handle(TEST_BOOKS_CSV)
+
+    def write_feed(self, rows):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as feed:
+            feed.write('\n'.join(rows))
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_unchanged_rows_are_not_written(self):
+        stats = CatalogueImporter(logger).handle(TEST_BOOKS_CSV)
+        self.assertEqual(10, stats['unchanged_items'])
+        self.assertEqual(0, stats['updated_items'])
+        self.assertEqual(0, stats['updated_stockrecords'])
+
+    def test_changed_rows_are_updated(self):
+        path = self.write_feed([
+            'Book,Books > Fiction,"9780115531446","Driving Test",NULL,'
+            '"Gardners","9780115531446","11.00","6"'])
+        stats = CatalogueImporter(logger).handle(path)
+        self.assertEqual(1, stats['updated_items'])
+        self.assertEqual(1, stats['updated_stockrecords'])
+        product = Product.objects.get(upc='9780115531446')
+        self.assertEqual("Driving Test", product.title)
+        self.assertEqual(
+            D('11.00'), product.stockrecords.get().price_excl_tax)
+
+    def test_dry_run_does_not_write(self):
+        path = self.write_feed([
+            'Toy,Toys,"123","Kite",NULL,"Kites Ltd","K1","5.00","1"',
+            'Book,Books > Fiction,"9780115531446","Driving Test",NULL'])
+        stats = CatalogueImporter(logger, dry_run=True).handle(path)
+        self.assertEqual(1, stats['new_items'])
+        self.assertEqual(1, stats['updated_items'])
+        self.assertEqual(1, stats['new_stockrecords'])
+        self.assertFalse(Product.objects.filter(upc='123').exists())
+        self.assertFalse(ProductClass.objects.filter(name='Toy').exists())
+        self.assertEqual(
+            "Prepare for Your Practical Driving Test",
+            Product.objects.get(upc='9780115531446').title)
+
+    def test_range_indexes_are_kept_when_only_stock_changes(self):
+        rng = RangeFactory()
+        rng.classes.add(ProductClass.objects.get(name='Book'))
+        path = self.write_feed([
+            'Book,Books > Fiction,"9780115531446",'
+            '"Prepare for Your Practical Driving Test",NULL,'
+            '"Gardners","9780115531446","11.00","6"'])
+        with mock.patch.object(RangeProductIndex, 'invalidate') as invalidate:
+            CatalogueImporter(logger).handle(path)
+        self.assertFalse(invalidate.called)
+
+    def test_range_indexes_are_dropped_when_products_are_added(self):
+        rng = RangeFactory()
+        rng.classes.add(ProductClass.objects.get(name='Book'))
+        path = self.write_feed([
+            'Book,Books > Fiction,"123","Kite Flying",NULL'])
+        with mock.patch.object(RangeProductIndex, 'invalidate') as invalidate:
+            CatalogueImporter(logger).handle(path)
+        invalidate.assert_called_once_with(rng.pk)
+
+    @mock.patch('django.db.transaction.on_commit', lambda func: func(),
+                create=True)
+    def test_queues_the_alerts_of_restocked_products(self):
+        path = self.write_feed([
+            'Book,Books > Fiction,"9780115531446",'
+            '"Prepare for Your Practical Driving Test",NULL,'
+            '"Gardners","9780115531446","10.32","7"',
+            'Toy,Toys,"123","Kite",NULL,"Kites Ltd","K1","5.00","1"'])
+        with mock.patch.object(alert_queue, 'put') as put:
+            CatalogueImporter(logger).handle(path)
+        self.assertEqual(
+            set(Product.objects.filter(
+                upc__in=['9780115531446', '123']).values_list(
+                    'pk', flat=True)),
+            set(call[0][0] for call in put.call_args_list))
+
+    def test_opens_low_stock_alerts_for_new_stockrecords(self):
+        field = StockRecord._meta.get_field('low_stock_threshold')
+        path = self.write_feed([
+            'Toy,Toys,"123","Kite",NULL,"Kites Ltd","K1","5.00","1"'])
+        with mock.patch.object(field, 'default', 2):
+            CatalogueImporter(logger).handle(path)
+        alert = StockAlert.objects.get()
+        self.assertEqual('K1', alert.stockrecord.partner_sku)
+        self.assertEqual(2, alert.threshold)
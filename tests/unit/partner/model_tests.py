@@ -3,9 +3,11 @@ from oscar.core.loading import get_model
 
 from django.test import TestCase
 
+from oscar.apps.partner.exceptions import InvalidStockAdjustment
 from oscar.test import factories
 
 Partner = get_model('partner', 'Partner')
+StockRecord = get_model('partner', 'StockRecord')
 PartnerAddress = get_model('partner', 'PartnerAddress')
 Country = get_model('address', 'Country')
 
@@ -54,6 +56,36 @@ class TestStockRecord(TestCase):
         self.assertEqual(0, self.stockrecord.num_allocated)
         self.assertEqual(10, self.stockrecord.num_in_stock)
 
+    def test_allocation_does_not_overwrite_concurrent_allocations(self):
+        StockRecord.objects.get(pk=self.stockrecord.pk).allocate(3)
+        self.stockrecord.allocate(5)
+        self.assertEqual(8, self.stockrecord.num_allocated)
+
+    def test_allocating_saves_an_unsaved_stockrecord(self):
+        stockrecord = StockRecord(
+            product=self.product, partner=self.stockrecord.partner,
+            partner_sku='unsaved', price_excl_tax=D('10.00'),
+            num_in_stock=10)
+        stockrecord.allocate(5)
+        self.assertIsNotNone(stockrecord.pk)
+        self.assertEqual(5, StockRecord.objects.get(
+            pk=stockrecord.pk).num_allocated)
+
+    def test_allocating_if_available(self):
+        self.assertTrue(self.stockrecord.allocate_if_available(6))
+        self.assertFalse(self.stockrecord.allocate_if_available(5))
+        self.assertEqual(6, self.stockrecord.num_allocated)
+        self.assertTrue(self.stockrecord.allocate_if_available(4))
+        self.assertEqual(0, self.stockrecord.net_stock_level)
+
+    def test_consuming_more_than_allocated_in_the_database_fails(self):
+        self.stockrecord.allocate(5)
+        StockRecord.objects.get(pk=self.stockrecord.pk).cancel_allocation(5)
+        with self.assertRaises(InvalidStockAdjustment):
+            self.stockrecord.consume_allocation(3)
+        self.stockrecord.refresh_from_db()
+        self.assertEqual(10, self.stockrecord.num_in_stock)
+
 
 class TestPartnerAddress(TestCase):
 
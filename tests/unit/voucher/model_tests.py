@@ -1,6 +1,7 @@
 import datetime
 from decimal import Decimal as D
 
+from django.contrib.auth.models import AnonymousUser
 from django.test import TestCase
 from django.core import exceptions
 from django.utils.timezone import utc
@@ -57,6 +58,29 @@ class TestAVoucher(TestCase):
         self.voucher.record_discount({'discount': D('10.00')})
         self.assertEqual(self.voucher.total_discount, D('20.00'))
 
+    def test_keeps_the_usage_recorded_through_other_instances(self):
+        other = Voucher.objects.get(pk=self.voucher.pk)
+        other.record_discount({'discount': D('10.00')})
+        other.record_usage(OrderFactory(), UserFactory())
+        self.voucher.record_discount({'discount': D('5.00')})
+        self.voucher.record_usage(OrderFactory(), UserFactory())
+        voucher = Voucher.objects.get(pk=self.voucher.pk)
+        self.assertEqual(D('15.00'), voucher.total_discount)
+        self.assertEqual(2, voucher.num_orders)
+
+
+class TestSingleUseVoucher(TestCase):
+
+    def setUp(self):
+        self.voucher = VoucherFactory(usage=Voucher.SINGLE_USE)
+
+    def test_is_unavailable_once_used(self):
+        user = UserFactory()
+        self.voucher.record_usage(OrderFactory(), AnonymousUser())
+        is_voucher_available_to_user, __ = \
+            self.voucher.is_available_to_user(user=user)
+        self.assertFalse(is_voucher_available_to_user)
+
 
 class TestMultiuseVoucher(TestCase):
 
@@ -94,3 +118,15 @@ class TestOncePerCustomerVoucher(TestCase):
             self.voucher.record_usage(order, user)
             is_voucher_available_to_user, __ = self.voucher.is_available_to_user(user=user)
             self.assertFalse(is_voucher_available_to_user)
+
+    def test_marks_the_user_once(self):
+        user = UserFactory()
+        for __ in range(2):
+            self.voucher.record_usage(OrderFactory(), user)
+        self.assertEqual(1, self.voucher.user_usages.count())
+
+    def test_memoises_the_availability(self):
+        user = UserFactory()
+        self.voucher.is_available_to_user(user=user)
+        with self.assertNumQueries(0):
+            self.voucher.is_available_to_user(user=user)